@@ -1,47 +1,109 @@
+import os
+import math
 import logging
+import operator
 import pandas as pd
 import numpy as np
 import json
 from datetime import datetime
+from sqlalchemy import and_, or_
 from app import db
-from models import TechnicalIndicator
+from models import TechnicalIndicator, IndicatorState, IndicatorSnapshot
+from agents.indicator_series import IndicatorSeries
+from agents.indicator_state import seed_state, advance_state
+from agents.indicators import INDICATORS, plan, plan_requests, expand_grid, evaluate, warm_up
+from utils.cache import LRUCache, fingerprint
+from utils.database import bulk_upsert
+from utils.ohlcv import OHLCV_COLUMNS, normalize_frame
+from utils.resample import resampled_views
 
 logger = logging.getLogger(__name__)
 
+# Comparison operators available to screen()
+SCREEN_OPERATORS = {
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+}
+
+# Calculated series shared by all agents of the process, keyed by their inputs
+indicator_cache = LRUCache(
+    max_size=int(os.environ.get("INDICATOR_CACHE_SIZE", 2048)),
+    ttl=float(os.environ.get("INDICATOR_CACHE_TTL", 900))
+)
+
+# Keys of the cached series already written to the indicator tables; series calculated
+# without persisting them are cached too, so a cache hit alone doesn't mean they're stored
+persisted_series = LRUCache(max_size=indicator_cache.max_size, ttl=indicator_cache.ttl)
+
+# Largest parameter sweep: values of one parameter, and combinations (each one a full series)
+SWEEP_MAX_VALUES = int(os.environ.get("SWEEP_MAX_VALUES", 500))
+SWEEP_MAX_COMBINATIONS = int(os.environ.get("SWEEP_MAX_COMBINATIONS", 2000))
+
+def check_sweep_grid(grid):
+    """
+    Check that a parameter grid is within the sweep limits
+    
+    Args:
+        grid (dict): Parameter name to list of values
+    
+    Raises:
+        ValueError: If a parameter has more than SWEEP_MAX_VALUES values or
+            the grid more than SWEEP_MAX_COMBINATIONS combinations
+    """
+    for name, values in grid.items():
+        if len(values) > SWEEP_MAX_VALUES:
+            raise ValueError(f"Too many values for {name}: {len(values)}, at most {SWEEP_MAX_VALUES}")
+    size = math.prod(len(values) for values in grid.values())
+    if size > SWEEP_MAX_COMBINATIONS:
+        raise ValueError(f"Too many parameter combinations: {size}, at most {SWEEP_MAX_COMBINATIONS}")
+
 class AnalysisAgent:
     """
     Agent responsible for performing technical and fundamental analysis
     on financial data. Calculates various technical indicators and ratios.
     """
     
-    def __init__(self):
-        """Initialize the analysis agent"""
+    def __init__(self, cache=None, views=None):
+        """
+        Initialize the analysis agent
+        
+        Args:
+            cache (LRUCache, optional): Cache of calculated series, defaults to the process-wide cache
+            views (ResampledViews, optional): Cache of timeframe views, defaults to the process-wide one
+        """
+        self.cache = indicator_cache if cache is None else cache
+        # A cache of its own gets its own record of the stored series
+        self.persisted = persisted_series if cache is None else LRUCache(max_size=cache.max_size, ttl=cache.ttl)
+        self.views = resampled_views if views is None else views
         logger.info("Analysis Agent initialized")
     
-    def calculate_indicators(self, market_data, indicators=None, params=None):
+    def calculate_indicators(self, market_data, indicators=None, params=None, persist=True, timeframe=None):
         """
         Calculate technical indicators for market data
         
+        With a timeframe the market data are base bars (see utils/resample.py),
+        aggregated to the timeframe before calculating. The indicator tables
+        hold the series of the daily bars only, so these series are cached
+        but not stored.
+        
         Args:
-            market_data (list): List of market data records
+            market_data (list or DataFrame): List of market data records or an OHLCV frame
             indicators (list): List of indicators to calculate
             params (dict): Parameters for indicators
-            
+            persist (bool): Whether to store the calculated series in the database
+            timeframe (str, optional): Bar size to calculate on, e.g. 5m or 1h
+        
         Returns:
-            dict: Dictionary with calculated indicators
+            dict: Dictionary mapping indicator names to IndicatorSeries
         """
         logger.info(f"Calculating indicators: {indicators}")
         
         if not indicators:
             indicators = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
         
-        if not params:
-            params = {}
-        elif isinstance(params, str):
-            try:
-                params = json.loads(params)
-            except:
-                params = {}
+        params = self._parse_params(params)
         
         # Convert market data to pandas DataFrame for easier calculations
         df = self._convert_to_dataframe(market_data)
@@ -50,43 +112,452 @@ class AnalysisAgent:
             logger.warning("Empty market data, can't calculate indicators")
             return {indicator: [] for indicator in indicators}
         
-        # Calculate each requested indicator
+        if timeframe is not None:
+            df = self._resample(df, timeframe)
+        
+        # Calculate the requested indicators, sharing common intermediate results
+        results, keys = self._calculate(df, [indicator.upper() for indicator in indicators], params)
+        
+        # Persist the series not stored before in a single transaction
+        if persist and timeframe is None:
+            unstored = [indicator for indicator, key in keys.items() if results[indicator] and self.persisted.get(key) is None]
+            if unstored and self._store_indicators([results[indicator] for indicator in unstored], closes=df['close']):
+                for indicator in unstored:
+                    self.persisted.set(keys[indicator], True)
+        
+        return results
+    
+    def update_indicators(self, symbol, market_data, indicators=None, params=None, calculated=None):
+        """
+        Extend the stored indicator series of a symbol with new bars
+        
+        Uses the persisted IndicatorState of each (symbol, indicator, params) so
+        only bars after the last processed one are calculated and stored. When
+        there is no state yet, the market data does not reach back to the last
+        processed bar, or the stored series starts later than the market data
+        allow (e.g. it was seeded from a shorter window), the series is
+        recalculated from the market data and its missing points are stored.
+        
+        Args:
+            symbol (str): Stock symbol
+            market_data (list or DataFrame): List of market data records or an OHLCV frame, ending with the newest bars
+            indicators (list): List of indicators to update
+            params (dict): Parameters for indicators
+            calculated (dict, optional): IndicatorSeries already calculated over the same market data,
+                e.g. a symbol's part of calculate_panel, used instead of recalculating them
+        
+        Returns:
+            dict: Dictionary mapping indicator names to IndicatorSeries of the appended points
+        """
+        logger.info(f"Updating indicators for {symbol}: {indicators}")
+        
+        if not indicators:
+            indicators = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
+        
+        params = self._parse_params(params)
+        
+        df = self._convert_to_dataframe(market_data)
+        
+        if df.empty:
+            logger.warning("Empty market data, can't update indicators")
+            return {indicator: [] for indicator in indicators}
+        
+        # Compare bars by wall-clock time, as the database stores naive timestamps
+        bar_times = df.index.tz_localize(None) if df.index.tz is not None else df.index
+        
+        # Load the state of every indicator of the symbol in one query
+        states = {
+            (record.indicator_type, record.parameters): record
+            for record in IndicatorState.query.filter_by(symbol=symbol).all()
+        }
+        
+        indicator_plan = plan([indicator.upper() for indicator in indicators], params)
+        covered = self._stored_from(symbol, indicator_plan, bar_times)
         results = {}
+        state_rows = []
+        reseed = []
         
-        for indicator in indicators:
-            indicator = indicator.upper()
+        for indicator, parameters in indicator_plan.parameters.items():
+            parameters_json = json.dumps(parameters)
+            record = states.get((indicator, parameters_json))
+            
+            if record is None or bar_times[0] > record.last_timestamp or indicator not in covered:
+                # No usable state or stored points missing, recalculate from the market data below
+                reseed.append(indicator)
+                continue
             
-            if indicator == 'SMA':
-                results[indicator] = self._calculate_sma(df, params.get('sma_period', 20))
-            elif indicator == 'EMA':
-                results[indicator] = self._calculate_ema(df, params.get('ema_period', 20))
-            elif indicator == 'RSI':
-                results[indicator] = self._calculate_rsi(df, params.get('rsi_period', 14))
-            elif indicator == 'MACD':
-                results[indicator] = self._calculate_macd(
-                    df, 
-                    params.get('macd_fast_period', 12),
-                    params.get('macd_slow_period', 26),
-                    params.get('macd_signal_period', 9)
+            try:
+                # Extend the series over the bars after the stored state only
+                new_bars = bar_times > record.last_timestamp
+                fields, state = advance_state(
+                    indicator, parameters, json.loads(record.state), df['close'].to_numpy()[new_bars]
                 )
-            elif indicator == 'BBANDS':
-                results[indicator] = self._calculate_bollinger_bands(
-                    df, 
-                    params.get('bb_period', 20),
-                    params.get('bb_std_dev', 2)
+                results[indicator] = IndicatorSeries.from_columns(
+                    symbol, indicator, parameters, df.index[new_bars], fields
                 )
+                
+                # Already up to date
+                if not new_bars.any():
+                    continue
+                
+                state_rows.append(self._state_row(symbol, indicator, parameters_json, bar_times[-1], state))
+                
+            except Exception as e:
+                logger.error(f"Error updating {indicator} for {symbol}: {str(e)}")
+                results[indicator] = []
+        
+        if reseed:
+            given = {indicator: calculated[indicator] for indicator in reseed if calculated and calculated.get(indicator)}
+            remaining = [indicator for indicator in reseed if indicator not in given]
+            if remaining:
+                given.update(self._calculate(df, remaining, params, symbol)[0])
+            # Cached series are stored as well, the store may lack the points of a reseeded indicator
+            for indicator, series in given.items():
+                results[indicator] = series
+                if not series:
+                    continue
+                
+                # A backfill from older bars keeps the newer state
+                record = states.get((indicator, series.parameters_json))
+                if record is not None and record.last_timestamp > bar_times[-1]:
+                    continue
+                
+                state = seed_state(indicator, series.parameters, df['close'].to_numpy())
+                state_rows.append(self._state_row(symbol, indicator, series.parameters_json, bar_times[-1], state))
+        
+        # Persist the appended points together with the new states
+        self._store_indicators(list(results.values()), state_rows, df['close'])
         
         return results
     
-    def _convert_to_dataframe(self, market_data):
-        """Convert market data list to pandas DataFrame"""
-        if not market_data:
+    def load_indicators(self, symbol, indicator, params=None, start_date=None, end_date=None):
+        """
+        Load a stored indicator series from the database without recalculating it
+        
+        Args:
+            symbol (str): Stock symbol
+            indicator (str): Indicator name
+            params (dict): Parameters for indicators
+            start_date (datetime, optional): First timestamp to load
+            end_date (datetime, optional): Last timestamp to load
+        
+        Returns:
+            IndicatorSeries: Stored points, with NaN for output fields that weren't stored
+        """
+        indicator = indicator.upper()
+        indicator_plan = plan([indicator], self._parse_params(params))
+        if indicator not in indicator_plan.parameters:
+            return []
+        
+        parameters = indicator_plan.parameters[indicator]
+        fields = list(indicator_plan.outputs[indicator])
+        
+        query = db.session.query(
+            TechnicalIndicator.timestamp,
+            *[getattr(TechnicalIndicator, field) for field in fields]
+        ).filter(
+            TechnicalIndicator.symbol == symbol,
+            TechnicalIndicator.indicator_type == indicator,
+            TechnicalIndicator.parameters == json.dumps(parameters)
+        )
+        if start_date is not None:
+            query = query.filter(TechnicalIndicator.timestamp >= start_date)
+        if end_date is not None:
+            query = query.filter(TechnicalIndicator.timestamp <= end_date)
+        
+        rows = query.order_by(TechnicalIndicator.timestamp).all()
+        columns = list(zip(*rows)) if rows else [[] for _ in range(len(fields) + 1)]
+        
+        return IndicatorSeries(
+            symbol,
+            indicator,
+            parameters,
+            pd.DatetimeIndex(columns[0]),
+            {field: np.array(values, dtype=float) for field, values in zip(fields, columns[1:])}
+        )
+    
+    def screen(self, conditions, params=None, since=None):
+        """
+        Find the symbols whose latest indicator values meet all conditions
+        
+        Reads the IndicatorSnapshot table only, so the cost does not depend
+        on the length of the stored histories.
+        
+        Args:
+            conditions (list): Condition dictionaries with the keys
+                indicator (e.g. RSI), field (e.g. value), op (lt, le, gt or ge),
+                value (a number, or "close" to compare with the latest close) and
+                optionally parameters (request parameters, e.g. {"sma_period": 20})
+            params (dict): Default parameters for indicators
+            since (datetime, optional): Ignore snapshots older than this
+        
+        Returns:
+            list: One dictionary per matching symbol with the latest close and the snapshot of every screened indicator
+        """
+        params = self._parse_params(params)
+        query = IndicatorSnapshot.query
+        keys = set()
+        
+        for condition in conditions:
+            indicator = condition['indicator'].upper()
+            if indicator not in INDICATORS:
+                raise ValueError(f"Unknown indicator: {condition['indicator']}")
+            
+            spec = INDICATORS[indicator]
+            parameters = spec.resolve_parameters(dict(params, **condition.get('parameters', {})))
+            field = condition.get('field', 'value')
+            if field not in spec.outputs(parameters):
+                raise ValueError(f"{indicator} has no {field} field")
+            if condition['op'] not in SCREEN_OPERATORS:
+                raise ValueError(f"Unknown comparison: {condition['op']}")
+            
+            operand = IndicatorSnapshot.close if condition['value'] == 'close' else float(condition['value'])
+            matching = db.session.query(IndicatorSnapshot.symbol).filter(
+                IndicatorSnapshot.indicator_type == indicator,
+                IndicatorSnapshot.parameters == json.dumps(parameters),
+                SCREEN_OPERATORS[condition['op']](getattr(IndicatorSnapshot, field), operand)
+            )
+            if since is not None:
+                matching = matching.filter(IndicatorSnapshot.timestamp >= since)
+            
+            query = query.filter(IndicatorSnapshot.symbol.in_(matching))
+            keys.add((indicator, json.dumps(parameters)))
+        
+        if not keys:
+            return []
+        
+        # Return the screened snapshots of the matching symbols
+        query = query.filter(or_(*[
+            and_(IndicatorSnapshot.indicator_type == indicator, IndicatorSnapshot.parameters == parameters)
+            for indicator, parameters in sorted(keys)
+        ]))
+        results = {}
+        for snapshot in query.order_by(IndicatorSnapshot.symbol).all():
+            result = results.setdefault(snapshot.symbol, {"symbol": snapshot.symbol, "indicators": []})
+            if result.get("timestamp") is None or snapshot.timestamp.isoformat() > result["timestamp"]:
+                result["timestamp"] = snapshot.timestamp.isoformat()
+                result["close"] = snapshot.close
+            result["indicators"].append(snapshot.to_dict())
+        
+        return list(results.values())
+    
+    def _stored_from(self, symbol, indicator_plan, bar_times):
+        """
+        Find the indicators whose stored series reach back to the first point the bars allow
+        
+        Stored series are contiguous up to their state, so a series covers the
+        bars when it holds the point right after the indicator's warm-up bars.
+        
+        Args:
+            symbol (str): Stock symbol
+            indicator_plan (IndicatorPlan): Indicators to check
+            bar_times (DatetimeIndex): Naive timestamps of the bars
+        
+        Returns:
+            set: Names of the covering indicators, including those the bars are too short for
+        """
+        covered = set()
+        expected = {}
+        for indicator, parameters in indicator_plan.parameters.items():
+            bars = warm_up(indicator, parameters)
+            if bars >= len(bar_times):
+                covered.add(indicator)
+            else:
+                expected[(indicator, json.dumps(parameters))] = bar_times[bars].to_pydatetime()
+        
+        if not expected:
+            return covered
+        
+        try:
+            # One lookup of the unique index per indicator
+            stored = db.session.query(TechnicalIndicator.indicator_type).filter(
+                TechnicalIndicator.symbol == symbol,
+                or_(*[
+                    and_(
+                        TechnicalIndicator.timestamp == timestamp,
+                        TechnicalIndicator.indicator_type == indicator,
+                        TechnicalIndicator.parameters == parameters
+                    )
+                    for (indicator, parameters), timestamp in expected.items()
+                ])
+            ).all()
+            covered.update(indicator for indicator, in stored)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error checking stored indicators of {symbol}: {str(e)}")
+        
+        return covered
+    
+    def _state_row(self, symbol, indicator, parameters_json, last_timestamp, state):
+        """Build an IndicatorState row for the bulk upsert"""
+        return {
+            "symbol": symbol,
+            "indicator_type": indicator,
+            "parameters": parameters_json,
+            "last_timestamp": last_timestamp.to_pydatetime(),
+            "state": json.dumps(state),
+            "updated_at": datetime.utcnow()
+        }
+    
+    def calculate_panel(self, close_prices, indicators=None, params=None):
+        """
+        Calculate technical indicators for many symbols in one vectorized pass
+        
+        Each indicator is computed once over the whole close price matrix
+        instead of once per symbol. Missing prices (e.g. a symbol listed later
+        than the others) produce gaps in that symbol's series. Panels bypass
+        the series cache: a lookup per symbol and indicator costs more than
+        the vectorized pass and would evict the single-symbol entries.
+        
+        Args:
+            close_prices (DataFrame): Close prices with one row per timestamp and one column per symbol
+            indicators (list): List of indicators to calculate
+            params (dict): Parameters for indicators
+        
+        Returns:
+            dict: Dictionary mapping symbols to {indicator name: IndicatorSeries}
+        """
+        logger.info(f"Calculating indicators {indicators} for {len(close_prices.columns)} symbols")
+        
+        if not indicators:
+            indicators = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
+        
+        params = self._parse_params(params)
+        close_prices = close_prices.sort_index().astype(float)
+        symbols = list(close_prices.columns)
+        results = {symbol: {} for symbol in symbols}
+        
+        indicator_plan = plan([indicator.upper() for indicator in indicators], params)
+        
+        try:
+            fields = evaluate(indicator_plan, np.asfortranarray(close_prices.to_numpy()))
+        except Exception as e:
+            logger.error(f"Error calculating indicator panel: {str(e)}")
+            fields = {}
+        
+        for indicator, parameters in indicator_plan.parameters.items():
+            # Split the matrices into per-symbol columnar results
+            for j, symbol in enumerate(symbols):
+                if indicator not in fields:
+                    results[symbol][indicator] = []
+                    continue
+                results[symbol][indicator] = IndicatorSeries.from_columns(
+                    symbol, indicator, parameters, close_prices.index,
+                    {name: values[:, j] for name, values in fields[indicator].items()}
+                )
+        
+        return results
+    
+    def calculate_panel_fields(self, close_prices, indicators=None, params=None):
+        """
+        Calculate technical indicators for many symbols as aligned matrices
+        
+        Unlike calculate_panel the results are not split per symbol, which
+        suits vectorized consumers such as the backtesting engine.
+        
+        Args:
+            close_prices (DataFrame): Close prices with one row per timestamp and one column per symbol
+            indicators (list): List of indicators to calculate
+            params (dict): Parameters for indicators
+        
+        Returns:
+            dict: Indicator name to {field name: 2-D array shaped like close_prices}
+        """
+        if not indicators:
+            indicators = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
+        
+        indicator_plan = plan([indicator.upper() for indicator in indicators], self._parse_params(params))
+        return evaluate(indicator_plan, close_prices.to_numpy(dtype=float))
+    
+    def build_close_panel(self, market_data):
+        """
+        Pivot market data of several symbols into a close price matrix
+        
+        Args:
+            market_data (list or dict): Market data records with a symbol field, or symbol to OHLCV frame
+        
+        Returns:
+            DataFrame: Close prices with one row per timestamp and one column per symbol
+        """
+        if isinstance(market_data, dict):
+            frames = {symbol: frame['close'] for symbol, frame in market_data.items() if not frame.empty}
+            return pd.DataFrame(frames) if frames else pd.DataFrame()
+        
+        df = pd.DataFrame(market_data)
+        
+        if df.empty:
             return pd.DataFrame()
         
+        if 'close' not in df.columns and 'close_price' in df.columns:
+            df['close'] = df['close_price']
+        
+        if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+        
+        return df.pivot_table(index='timestamp', columns='symbol', values='close')
+    
+    def sweep_indicator(self, market_data, indicator, grid):
+        """
+        Calculate one indicator for every combination of a parameter grid
+        
+        All combinations are planned together, so shared intermediates are
+        computed once and rolling windows of every length come from the same
+        cumulative sums: SMA for every period from 5 to 200 costs one pass
+        over the prices plus one array difference per period.
+        
+        Args:
+            market_data (list or DataFrame): List of market data records or an OHLCV frame
+            indicator (str): Indicator name
+            grid (dict): Parameter name to list of values, e.g. {"period": [5, 10, 20]}
+        
+        Returns:
+            list: IndicatorSeries, one per parameter combination
+        
+        Raises:
+            ValueError: If the grid is larger than the sweep limits
+        """
+        indicator = indicator.upper()
+        grid = {name: list(values) for name, values in grid.items()}
+        check_sweep_grid(grid)
+        combinations = expand_grid(indicator, grid)
+        logger.info(f"Sweeping {indicator} over {len(combinations)} parameter combinations")
+        
+        df = self._convert_to_dataframe(market_data)
+        
+        if df.empty:
+            logger.warning("Empty market data, can't sweep indicator")
+            return []
+        
+        symbol = df['symbol'].iloc[0] if 'symbol' in df.columns else 'Unknown'
+        
+        indicator_plan = plan_requests([(i, indicator, parameters) for i, parameters in enumerate(combinations)])
+        fields = evaluate(indicator_plan, df['close'].to_numpy(dtype=float))
+        
+        return [
+            IndicatorSeries.from_columns(symbol, indicator, parameters, df.index, fields[i])
+            for i, parameters in enumerate(combinations)
+        ]
+    
+    def _parse_params(self, params):
+        """Parse indicator parameters given as a dictionary or JSON string"""
+        if not params:
+            return {}
+        elif isinstance(params, str):
+            try:
+                return json.loads(params)
+            except:
+                return {}
+        return params
+    
+    def _convert_to_dataframe(self, market_data):
+        """Convert market data list to pandas DataFrame"""
         # If market_data is already a DataFrame, return it
         if isinstance(market_data, pd.DataFrame):
             return market_data
         
+        if not market_data:
+            return pd.DataFrame()
+        
         # Convert list of dictionaries to DataFrame
         df = pd.DataFrame(market_data)
         
@@ -123,276 +594,140 @@ class AnalysisAgent:
         
         return df
     
-    def _calculate_sma(self, df, period=20):
-        """
-        Calculate Simple Moving Average
-        
-        Args:
-            df (DataFrame): Market data
-            period (int): Period for SMA calculation
-            
-        Returns:
-            list: SMA values as dictionaries
-        """
-        try:
-            symbol = df['symbol'].iloc[0] if 'symbol' in df.columns else 'Unknown'
-            
-            # Calculate SMA
-            sma = df['close'].rolling(window=period).mean()
-            
-            # Convert to list of dictionaries
-            result = []
-            for idx, value in sma.items():
-                if not np.isnan(value):
-                    data_point = {
-                        "timestamp": idx.to_pydatetime(),
-                        "value": value,
-                        "indicator_type": "SMA",
-                        "symbol": symbol,
-                        "parameters": json.dumps({"period": period})
-                    }
-                    result.append(data_point)
-                    
-                    # Store in database
-                    self._store_indicator(data_point)
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error calculating SMA: {str(e)}")
-            return []
+    def _resample(self, df, timeframe):
+        """Aggregate base bars to a timeframe through the shared views"""
+        symbol = df['symbol'].iloc[0] if 'symbol' in df.columns else 'Unknown'
+        return self.views.get(symbol, normalize_frame(df[OHLCV_COLUMNS], symbol), timeframe)
     
-    def _calculate_ema(self, df, period=20):
+    def _calculate(self, df, indicators, params, symbol=None):
         """
-        Calculate Exponential Moving Average
+        Calculate indicators over the whole DataFrame as one plan
         
         Args:
             df (DataFrame): Market data
-            period (int): Period for EMA calculation
-            
-        Returns:
-            list: EMA values as dictionaries
-        """
-        try:
-            symbol = df['symbol'].iloc[0] if 'symbol' in df.columns else 'Unknown'
-            
-            # Calculate EMA
-            ema = df['close'].ewm(span=period, adjust=False).mean()
-            
-            # Convert to list of dictionaries
-            result = []
-            for idx, value in ema.items():
-                if not np.isnan(value):
-                    data_point = {
-                        "timestamp": idx.to_pydatetime(),
-                        "value": value,
-                        "indicator_type": "EMA",
-                        "symbol": symbol,
-                        "parameters": json.dumps({"period": period})
-                    }
-                    result.append(data_point)
-                    
-                    # Store in database
-                    self._store_indicator(data_point)
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error calculating EMA: {str(e)}")
-            return []
-    
-    def _calculate_rsi(self, df, period=14):
-        """
-        Calculate Relative Strength Index
+            indicators (list): Indicator names
+            params (dict): Parameters for indicators
+            symbol (str, optional): Symbol to label the series with, defaults to the symbol column
         
-        Args:
-            df (DataFrame): Market data
-            period (int): Period for RSI calculation
-            
         Returns:
-            list: RSI values as dictionaries
+            tuple: Dictionary mapping indicator names to IndicatorSeries, and the one mapping
+                them to their cache keys
         """
-        try:
+        if symbol is None:
             symbol = df['symbol'].iloc[0] if 'symbol' in df.columns else 'Unknown'
-            
-            # Calculate RSI
-            delta = df['close'].diff()
-            gain = delta.where(delta > 0, 0)
-            loss = -delta.where(delta < 0, 0)
-            
-            avg_gain = gain.rolling(window=period).mean()
-            avg_loss = loss.rolling(window=period).mean()
-            
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-            
-            # Convert to list of dictionaries
-            result = []
-            for idx, value in rsi.items():
-                if not np.isnan(value):
-                    data_point = {
-                        "timestamp": idx.to_pydatetime(),
-                        "value": value,
-                        "indicator_type": "RSI",
-                        "symbol": symbol,
-                        "parameters": json.dumps({"period": period})
-                    }
-                    result.append(data_point)
-                    
-                    # Store in database
-                    self._store_indicator(data_point)
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error calculating RSI: {str(e)}")
-            return []
-    
-    def _calculate_macd(self, df, fast_period=12, slow_period=26, signal_period=9):
-        """
-        Calculate Moving Average Convergence Divergence
         
-        Args:
-            df (DataFrame): Market data
-            fast_period (int): Fast period for MACD
-            slow_period (int): Slow period for MACD
-            signal_period (int): Signal period for MACD
-            
-        Returns:
-            list: MACD values as dictionaries
-        """
+        indicator_plan = plan(indicators, params)
+        close = df['close'].to_numpy(dtype=float)
+        input_hash = self._input_hash(df.index, close)
+        
+        # Reuse series calculated before from identical inputs
+        results = {}
+        keys = {}
+        missing = []
+        for indicator, parameters in indicator_plan.parameters.items():
+            keys[indicator] = self._cache_key(symbol, indicator, parameters, input_hash)
+            results[indicator] = self.cache.get(keys[indicator])
+            if results[indicator] is None:
+                missing.append(indicator)
+        
+        if not missing:
+            return results, keys
+        
+        missing_plan = plan(missing, params)
         try:
-            symbol = df['symbol'].iloc[0] if 'symbol' in df.columns else 'Unknown'
-            
-            # Calculate MACD
-            exp1 = df['close'].ewm(span=fast_period, adjust=False).mean()
-            exp2 = df['close'].ewm(span=slow_period, adjust=False).mean()
-            macd = exp1 - exp2
-            signal = macd.ewm(span=signal_period, adjust=False).mean()
-            histogram = macd - signal
-            
-            # Convert to list of dictionaries
-            result = []
-            for idx in macd.index:
-                macd_val = macd[idx]
-                signal_val = signal[idx]
-                hist_val = histogram[idx]
-                
-                if not (np.isnan(macd_val) or np.isnan(signal_val) or np.isnan(hist_val)):
-                    data_point = {
-                        "timestamp": idx.to_pydatetime(),
-                        "value": float(macd_val),  # Convert numpy float to Python float
-                        "signal": float(signal_val),
-                        "histogram": float(hist_val),
-                        "indicator_type": "MACD",
-                        "symbol": symbol,
-                        "parameters": json.dumps({
-                            "fast_period": fast_period, 
-                            "slow_period": slow_period,
-                            "signal_period": signal_period
-                        })
-                    }
-                    result.append(data_point)
-                    
-                    # Store in database
-                    self._store_indicator(data_point)
-            
-            return result
-            
+            fields = evaluate(missing_plan, close)
         except Exception as e:
-            logger.error(f"Error calculating MACD: {str(e)}")
-            return []
+            logger.error(f"Error calculating indicators {indicators}: {str(e)}")
+            # Without a series there is nothing to store under the keys
+            return {indicator: results[indicator] or [] for indicator in results}, {}
+        
+        for indicator in missing_plan.parameters:
+            series = IndicatorSeries.from_columns(
+                symbol, indicator, missing_plan.parameters[indicator], df.index, fields[indicator]
+            )
+            self.cache.set(keys[indicator], series)
+            results[indicator] = series
+        
+        return results, keys
+    
+    def _input_hash(self, index, close):
+        """Fingerprint the prices the indicators are calculated from"""
+        return fingerprint(index.asi8, np.array(str(index.tz)), close)
     
-    def _calculate_bollinger_bands(self, df, period=20, std_dev=2):
+    def _cache_key(self, symbol, indicator, parameters, input_hash):
+        """Build the cache key of a calculated series"""
+        return (symbol, indicator, json.dumps(parameters, sort_keys=True), input_hash)
+    
+    def _store_indicators(self, series_list, states=None, closes=None):
         """
-        Calculate Bollinger Bands
+        Store calculated indicator series in the database in one transaction
+        
+        The latest point of every series also replaces its IndicatorSnapshot,
+        unless the snapshot already holds a newer point.
         
         Args:
-            df (DataFrame): Market data
-            period (int): Period for Bollinger Bands
-            std_dev (float): Standard deviation multiplier
-            
+            series_list (list): IndicatorSeries built from the output fields of evaluate() or
+                advance_state(), without their warm-up points; empty entries are skipped
+            states (list): IndicatorState rows to write in the same transaction
+            closes (Series): Close prices by timestamp, stored with the snapshots
+        
         Returns:
-            list: Bollinger Bands values as dictionaries
+            bool: Whether the series were stored
         """
+        fields = TechnicalIndicator.output_fields
+        rows = []
+        snapshots = []
+        for series in series_list:
+            if not series:
+                continue
+            
+            # Every output field has its own column; the ones the indicator doesn't produce stay NULL
+            columns = [
+                series.fields[field].tolist() if field in series.fields else [None] * len(series)
+                for field in fields
+            ]
+            for timestamp, *values in zip(series.timestamps.to_pydatetime(), *columns):
+                row = {
+                    "symbol": series.symbol,
+                    "timestamp": timestamp,
+                    "indicator_type": series.indicator_type,
+                    "parameters": series.parameters_json
+                }
+                row.update(zip(fields, values))
+                rows.append(row)
+            
+            snapshot = dict(rows[-1], updated_at=datetime.utcnow(), close=None)
+            if closes is not None and series.timestamps[-1] in closes.index:
+                snapshot["close"] = float(closes[series.timestamps[-1]])
+            snapshots.append(snapshot)
+        
+        if not rows and not states:
+            return True
+        
         try:
-            symbol = df['symbol'].iloc[0] if 'symbol' in df.columns else 'Unknown'
-            
-            # Calculate Bollinger Bands
-            middle_band = df['close'].rolling(window=period).mean()
-            std = df['close'].rolling(window=period).std()
-            
-            upper_band = middle_band + (std * std_dev)
-            lower_band = middle_band - (std * std_dev)
-            
-            # Convert to list of dictionaries
-            result = []
-            for idx in middle_band.index:
-                middle = middle_band[idx]
-                upper = upper_band[idx]
-                lower = lower_band[idx]
-                
-                if not (np.isnan(middle) or np.isnan(upper) or np.isnan(lower)):
-                    data_point = {
-                        "timestamp": idx.to_pydatetime(),
-                        "middle": float(middle),  # Convert numpy float to Python float
-                        "upper": float(upper),
-                        "lower": float(lower),
-                        "indicator_type": "BBANDS",
-                        "symbol": symbol,
-                        "parameters": json.dumps({"period": period, "std_dev": std_dev})
-                    }
-                    result.append(data_point)
-                    
-                    # Store in database
-                    self._store_indicator(data_point)
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error calculating Bollinger Bands: {str(e)}")
-            return []
-    
-    def _store_indicator(self, indicator_data):
-        """Store technical indicator in the database"""
-        try:
-            # Check if this indicator already exists
-            existing = TechnicalIndicator.query.filter_by(
-                symbol=indicator_data["symbol"],
-                timestamp=indicator_data["timestamp"],
-                indicator_type=indicator_data["indicator_type"],
-                parameters=indicator_data["parameters"]
-            ).first()
-            
-            if existing:
-                # Update existing record
-                if "value" in indicator_data:
-                    # Convert numpy.float64 to native Python float if needed
-                    if hasattr(indicator_data["value"], "item"):
-                        existing.value = float(indicator_data["value"])
-                    else:
-                        existing.value = indicator_data["value"]
-                db.session.commit()
-                return
-            
-            # Create new record
-            indicator = TechnicalIndicator(
-                symbol=indicator_data["symbol"],
-                timestamp=indicator_data["timestamp"],
-                indicator_type=indicator_data["indicator_type"],
-                parameters=indicator_data["parameters"]
+            bulk_upsert(
+                TechnicalIndicator,
+                rows,
+                index_elements=['symbol', 'timestamp', 'indicator_type', 'parameters'],
+                update_columns=list(fields)
+            )
+            bulk_upsert(
+                IndicatorState,
+                states or [],
+                index_elements=['symbol', 'indicator_type', 'parameters'],
+                update_columns=['last_timestamp', 'state', 'updated_at']
+            )
+            bulk_upsert(
+                IndicatorSnapshot,
+                snapshots,
+                index_elements=['symbol', 'indicator_type', 'parameters'],
+                update_columns=['timestamp', 'close', 'updated_at'] + list(fields),
+                newer_column='timestamp'
             )
-            
-            if "value" in indicator_data:
-                # Convert numpy.float64 to native Python float if needed
-                if hasattr(indicator_data["value"], "item"):
-                    indicator.value = float(indicator_data["value"])
-                else:
-                    indicator.value = indicator_data["value"]
-            
-            db.session.add(indicator)
             db.session.commit()
+            return True
             
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Error storing indicator: {str(e)}")
+            logger.error(f"Error storing indicators: {str(e)}")
+            return False
@@ -0,0 +1,231 @@
+import logging
+import json
+import numpy as np
+import pandas as pd
+from models import MarketData
+from agents.analysis_agent import AnalysisAgent
+from agents.data_agent import columnar_store
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+
+def _hold(signal):
+    """
+    Turn sparse target positions into held positions
+    
+    NaN means "keep the previous position": each NaN is forward filled
+    along the time axis, positions before the first signal are flat.
+    """
+    rows = np.arange(len(signal))[:, None]
+    last = np.maximum.accumulate(np.where(np.isnan(signal), 0, rows), axis=0)
+    held = np.take_along_axis(signal, last, axis=0)
+    return np.nan_to_num(held, nan=0.0)
+
+def _rsi_reversion(close, fields, params, allow_short):
+    """Buy when RSI falls below the lower bound, sell (or go short) when it rises above the upper bound"""
+    rsi = fields['RSI']['value']
+    exit_position = -1.0 if allow_short else 0.0
+    signal = np.where(
+        rsi < params.get('rsi_lower', 30), 1.0,
+        np.where(rsi > params.get('rsi_upper', 70), exit_position, np.nan)
+    )
+    return _hold(signal)
+
+def _macd_crossover(close, fields, params, allow_short):
+    """Long while MACD is above its signal line, flat (or short) while below"""
+    macd = fields['MACD']
+    below = -1.0 if allow_short else 0.0
+    positions = np.where(macd['value'] > macd['signal'], 1.0, below)
+    return _hold(np.where(np.isnan(macd['histogram']), np.nan, positions))
+
+def _sma_trend(close, fields, params, allow_short):
+    """Long while the close is above its simple moving average, flat (or short) while below"""
+    sma = fields['SMA']['value']
+    below = -1.0 if allow_short else 0.0
+    positions = np.where(close > sma, 1.0, below)
+    # Flat until the average is defined, then held while a price gap leaves it undefined
+    return _hold(np.where(np.isnan(sma), np.nan, positions))
+
+# Strategy name to (required indicators, position function)
+STRATEGIES = {
+    'rsi_reversion': (['RSI'], _rsi_reversion),
+    'macd_crossover': (['MACD'], _macd_crossover),
+    'sma_trend': (['SMA'], _sma_trend),
+}
+
+def _performance(returns, held, valid):
+    """
+    Calculate performance statistics column-wise
+    
+    Args:
+        returns (ndarray): Strategy returns, one column per series
+        held (ndarray): Positions held over each period
+        valid (ndarray): Mask of the periods each series has prices for
+    
+    Returns:
+        dict: Statistic name to array with one value per column
+    """
+    equity = np.cumprod(1 + returns, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+    periods = np.maximum(valid.sum(axis=0), 1)
+    years = periods / TRADING_DAYS_PER_YEAR
+    
+    mean = np.where(valid, returns, 0.0).sum(axis=0) / periods
+    variance = np.where(valid, (returns - mean) ** 2, 0.0).sum(axis=0) / np.maximum(periods - 1, 1)
+    volatility = np.sqrt(variance)
+    changes = np.abs(np.diff(held, axis=0, prepend=0.0))
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            "total_return": equity[-1] - 1,
+            "annualized_return": equity[-1] ** (1 / years) - 1,
+            "annualized_volatility": volatility * np.sqrt(TRADING_DAYS_PER_YEAR),
+            "sharpe_ratio": np.where(volatility > 0, mean / volatility * np.sqrt(TRADING_DAYS_PER_YEAR), 0.0),
+            "max_drawdown": drawdown.min(axis=0),
+            "turnover": changes.sum(axis=0) / years,
+            "trades": (changes > 0).sum(axis=0),
+            "exposure": np.where(valid, np.abs(held), 0.0).sum(axis=0) / periods
+        }
+
+class BacktestAgent:
+    """
+    Agent responsible for backtesting trading rules on indicator signals.
+    Evaluates a rule over a whole symbol universe at once, with every
+    symbol as one column of the price and position matrices.
+    """
+    
+    def __init__(self, analysis_agent=None, store=None):
+        """
+        Initialize the backtest agent
+        
+        Args:
+            analysis_agent (AnalysisAgent, optional): Agent calculating the indicator signals
+            store (ParquetStore, optional): Columnar store to read close prices from, defaults to the configured one
+        """
+        self.analysis_agent = analysis_agent or AnalysisAgent()
+        self.store = columnar_store if store is None else store
+        logger.info("Backtest Agent initialized")
+    
+    def run_backtest(self, close_prices, strategy, params=None, allow_short=False, cost_bps=0.0):
+        """
+        Backtest a strategy on a close price matrix
+        
+        Positions are decided at the close of each bar and earn the return
+        of the next bar. Bars a symbol has no price for keep its position,
+        and the next price's return is taken from the last close before the
+        gap. Trading costs are charged on every change of position.
+        
+        Args:
+            close_prices (DataFrame): Close prices with one row per timestamp and one column per symbol
+            strategy (str): Strategy name, one of STRATEGIES
+            params (dict): Indicator parameters and strategy thresholds, e.g. {"rsi_period": 14, "rsi_lower": 30}
+            allow_short (bool): Whether exit signals open short positions instead of going flat
+            cost_bps (float): Trading cost per unit of turnover, in basis points
+        
+        Returns:
+            dict: Per-symbol and equal-weighted portfolio statistics plus the portfolio equity curve
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        
+        params = params or {}
+        if isinstance(params, str):
+            params = json.loads(params)
+        
+        close_prices = close_prices.sort_index().astype(float)
+        symbols = list(close_prices.columns)
+        logger.info(f"Backtesting {strategy} on {len(symbols)} symbols over {len(close_prices)} bars")
+        
+        if close_prices.empty:
+            return {"strategy": strategy, "parameters": params, "symbols": {}, "portfolio": {}, "equity_curve": []}
+        
+        indicators, position_function = STRATEGIES[strategy]
+        close = close_prices.to_numpy()
+        fields = self.analysis_agent.calculate_panel_fields(close_prices, indicators, params)
+        
+        # Bars without a price keep the position held before them, so a gap is no round trip
+        valid = ~np.isnan(close)
+        positions = _hold(np.where(valid, position_function(close, fields, params, allow_short), np.nan))
+        
+        # Returns run from the last price before each bar, so the move across a gap is earned after it
+        previous = np.vstack([np.full(close.shape[1], np.nan), close_prices.ffill().to_numpy()[:-1]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            asset_returns = np.nan_to_num(close / previous - 1, nan=0.0, posinf=0.0, neginf=0.0)
+        
+        held = np.vstack([np.zeros(close.shape[1]), positions[:-1]])
+        costs = np.abs(np.diff(positions, axis=0, prepend=0.0)) * cost_bps / 10000
+        returns = held * asset_returns - costs
+        
+        statistics = _performance(returns, held, valid)
+        
+        # Equal-weighted portfolio of the symbols trading on each bar
+        listed = np.maximum(valid.sum(axis=1), 1)
+        portfolio_returns = (np.where(valid, returns, 0.0).sum(axis=1) / listed)[:, None]
+        portfolio_held = (np.where(valid, held, 0.0).sum(axis=1) / listed)[:, None]
+        portfolio = _performance(portfolio_returns, portfolio_held, valid.any(axis=1)[:, None])
+        equity = np.cumprod(1 + portfolio_returns[:, 0])
+        
+        return {
+            "strategy": strategy,
+            "parameters": params,
+            "allow_short": allow_short,
+            "cost_bps": cost_bps,
+            "start": close_prices.index[0].isoformat(),
+            "end": close_prices.index[-1].isoformat(),
+            "symbols": {
+                symbol: {name: float(values[i]) for name, values in statistics.items()}
+                for i, symbol in enumerate(symbols)
+            },
+            "portfolio": {name: float(values[0]) for name, values in portfolio.items()},
+            "equity_curve": [
+                {"timestamp": timestamp.isoformat(), "equity": float(value)}
+                for timestamp, value in zip(close_prices.index.to_pydatetime(), equity)
+            ]
+        }
+    
+    def load_close_prices(self, symbols=None, start_date=None, end_date=None):
+        """
+        Load stored close prices as a matrix
+        
+        Symbols in the columnar store are read from it as arrays; the others
+        come from the MarketData table in a single query.
+        
+        Args:
+            symbols (list, optional): Stock symbols, defaults to every stored symbol
+            start_date (datetime, optional): First timestamp to load
+            end_date (datetime, optional): Last timestamp to load
+        
+        Returns:
+            DataFrame: Close prices with one row per timestamp and one column per symbol, empty for no symbols
+        """
+        if symbols is not None and not len(symbols):
+            return pd.DataFrame()
+        
+        close_prices = {}
+        if symbols and self.store is not None:
+            for symbol in symbols:
+                if self.store.has(symbol):
+                    arrays = self.store.read_arrays(symbol, ('close',), start_date, end_date)
+                    close_prices[symbol] = pd.Series(arrays['close'], index=pd.DatetimeIndex(arrays['timestamp']))
+            symbols = [symbol for symbol in symbols if symbol not in close_prices]
+        
+        if symbols or not close_prices:
+            query = MarketData.query.with_entities(MarketData.timestamp, MarketData.symbol, MarketData.close_price)
+            if symbols:
+                query = query.filter(MarketData.symbol.in_(symbols))
+            if start_date is not None:
+                query = query.filter(MarketData.timestamp >= start_date)
+            if end_date is not None:
+                query = query.filter(MarketData.timestamp <= end_date)
+            
+            rows = query.all()
+            if rows:
+                df = pd.DataFrame(rows, columns=['timestamp', 'symbol', 'close'])
+                table = df.pivot_table(index='timestamp', columns='symbol', values='close')
+                close_prices.update((symbol, table[symbol]) for symbol in table.columns)
+        
+        if not close_prices:
+            return pd.DataFrame()
+        
+        return pd.DataFrame(close_prices).rename_axis('timestamp')
@@ -1,91 +1,545 @@
 import logging
 import os
+import numpy as np
 import pandas as pd
-import requests
 from datetime import datetime, timedelta
 import yfinance as yf
-from app import db
-from models import MarketData, NewsArticle
+from app import app, db
+from sqlalchemy import func
+from models import MarketData, MarketDataCoverage, IntradayBar, NewsArticle, NewsArticleSymbol
+from utils.database import bulk_upsert
+from utils.http_client import HTTPClient
+from utils.parquet_store import ParquetStore
+from utils.response_cache import ResponseCache
+from utils.resample import BASE_TIMEFRAME, TIMEFRAMES, resampled_views
+from utils.trading_calendar import SESSION_CLOSE, exchange_calendar
+from utils.ohlcv import normalize_yfinance, normalize_alpha_vantage, normalize_rows, frame_to_records
 from utils.web_scraper import get_website_text_content
 
 logger = logging.getLogger(__name__)
 
+# Pooled upstream API client shared by all agents of the process
+upstream_client = HTTPClient(
+    timeout=(float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 5)), float(os.environ.get("UPSTREAM_READ_TIMEOUT", 30))),
+    retries=int(os.environ.get("UPSTREAM_RETRIES", 3)),
+    max_queue_wait=float(os.environ.get("UPSTREAM_MAX_QUEUE_WAIT", 60))
+)
+upstream_client.set_rate_limit(
+    'alpha_vantage',
+    float(os.environ.get("ALPHA_VANTAGE_REQUESTS_PER_MINUTE", 5)),
+    int(os.environ.get("ALPHA_VANTAGE_BURST", 1))
+)
+
+# Raw Alpha Vantage payloads, reused for every window and symbol they cover
+upstream_cache = ResponseCache(
+    os.environ.get("RESPONSE_CACHE_DIR", os.path.join(app.instance_path, 'response_cache')),
+    max_bytes=int(float(os.environ.get("RESPONSE_CACHE_MAX_MB", 256)) * 2 ** 20),
+    ttls={
+        'TIME_SERIES_DAILY': float(os.environ.get("ALPHA_VANTAGE_DAILY_TTL", 3600)),
+        'NEWS_SENTIMENT': float(os.environ.get("ALPHA_VANTAGE_NEWS_TTL", 900))
+    }
+)
+
+# Optional columnar copy of the bars for long range reads, None unless OHLCV_STORE_DIR is set
+columnar_store = ParquetStore.from_environment()
+
 class DataAgent:
     """
     Agent responsible for retrieving financial data from external sources
     and storing it in the database for further analysis.
     """
     
-    def __init__(self):
-        """Initialize the data agent with API keys"""
+    # Symbols per multi-ticker download in fetch_historical_data_batch
+    BATCH_SIZE = 50
+    
+    # Ranges of at least this many days are read from the columnar store, when configured
+    COLUMNAR_MIN_DAYS = 366
+    
+    # Yahoo Finance serves one minute bars of the last 30 days, at most 8 days per request
+    INTRADAY_MAX_DAYS = 30
+    INTRADAY_CHUNK_DAYS = 7
+    
+    def __init__(self, downloader=None, client=None, response_cache=None, store=None, calendar=None, views=None):
+        """
+        Initialize the data agent with API keys
+        
+        Args:
+            downloader (callable, optional): Multi-ticker download function with the
+                signature of yfinance.download, e.g. a local stub in tests
+            client (HTTPClient, optional): Client for the upstream APIs, defaults to the shared one
+            response_cache (ResponseCache, optional): Cache of raw API responses, defaults to the shared one
+            store (ParquetStore, optional): Columnar store mirroring the bars, defaults to the configured one
+            calendar (TradingCalendar, optional): Exchange calendar of the expected bars, defaults to the NYSE one
+            views (ResampledViews, optional): Cache of intraday timeframe views, defaults to the shared one
+        """
+        self.downloader = downloader or yf.download
+        self.client = client or upstream_client
+        self.response_cache = upstream_cache if response_cache is None else response_cache
+        self.store = columnar_store if store is None else store
+        self.calendar = calendar or exchange_calendar
+        self.views = resampled_views if views is None else views
         self.alpha_vantage_api_key = os.environ.get("ALPHA_VANTAGE_API_KEY", "demo")
+        # Overridable to point the agent at a local stand-in of the API
+        self.alpha_vantage_url = os.environ.get("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+        # Seconds before bars of the day they were fetched on are fetched again
+        self.live_data_ttl = int(os.environ.get("MARKET_DATA_TTL", 900))
+        # Seconds before the intraday bars of a symbol are checked for new ones again
+        self.intraday_ttl = int(os.environ.get("INTRADAY_DATA_TTL", 60))
+        self._intraday_checked = {}
         logger.info("Data Agent initialized")
     
-    def fetch_historical_data(self, symbol, start_date, end_date):
+    def fetch_historical_data(self, symbol, start_date, end_date, as_frame=False):
         """
         Fetch historical market data for a symbol
         
+        Only the parts of the range not fetched before are requested from the
+        sources; they are merged with the stored bars, so repeated requests
+        for the same range make no network calls.
+        
         Args:
             symbol (str): Stock symbol
             start_date (datetime): Start date
             end_date (datetime): End date
-            
+            as_frame (bool): Return the normalized OHLCV frame (see utils/ohlcv.py) instead of records
+        
         Returns:
-            list: List of market data records
+            list or DataFrame: List of market data records, or the OHLCV frame
         """
         logger.info(f"Fetching historical data for {symbol} from {start_date} to {end_date}")
         
         try:
-            # Try first with yfinance
-            data = self._fetch_from_yfinance(symbol, start_date, end_date)
-            
-            # If yfinance fails, try Alpha Vantage
-            if not data:
-                data = self._fetch_from_alpha_vantage(symbol, start_date, end_date)
+            for missing_start, missing_end in self._missing_ranges(symbol, start_date.date(), self._last_day(end_date)):
+                if self.calendar.session_count(missing_start, missing_end) == 0:
+                    # The exchange was closed on every day of the range, there are no bars to fetch
+                    self._record_coverage(symbol, missing_start, missing_end)
+                    continue
+                
+                logger.info(f"Fetching missing range {missing_start} - {missing_end} for {symbol}")
+                
+                # The Yahoo Finance end date is exclusive
+                range_start = datetime.combine(missing_start, datetime.min.time())
+                range_end = datetime.combine(missing_end, datetime.min.time()) + timedelta(days=1)
+                
+                # Try first with yfinance
+                data = self._fetch_from_yfinance(symbol, range_start, range_end)
                 
-            # Store data in the database
-            self._store_market_data(data, symbol)
+                # If yfinance fails, try Alpha Vantage
+                if data is None or data.empty:
+                    fallback = self._fetch_from_alpha_vantage(symbol, range_start, range_end - timedelta(seconds=1))
+                    data = fallback if fallback is not None else data
+                
+                # Don't record the range as covered when both sources failed, or returned nothing
+                # for its trading sessions (yfinance reports some failures as empty results)
+                if data is None or data.empty:
+                    continue
+                
+                # Store data in the database
+                self._store_market_data(data, symbol)
+                self._record_coverage(symbol, missing_start, missing_end)
             
-            return data
+            frame = self._load_market_data(symbol, start_date, end_date)
+            return frame if as_frame else frame_to_records(frame)
             
         except Exception as e:
             logger.error(f"Error fetching historical data: {str(e)}")
             raise Exception(f"Failed to retrieve data for {symbol}: {str(e)}")
     
-    def _fetch_from_yfinance(self, symbol, start_date, end_date):
-        """Fetch data from Yahoo Finance API"""
+    def fetch_historical_data_batch(self, symbols, start_date, end_date, as_frame=False):
+        """
+        Fetch historical market data for several symbols
+        
+        Symbols missing the same date ranges are downloaded together, up to
+        BATCH_SIZE symbols per request, and all fetched bars are stored in a
+        single transaction. Symbols the batch download returns nothing for
+        fall back to fetch_historical_data.
+        
+        Args:
+            symbols (list): Stock symbols
+            start_date (datetime): Start date
+            end_date (datetime): End date
+            as_frame (bool): Return normalized OHLCV frames instead of records
+        
+        Returns:
+            dict: Symbol to list of market data records, or to OHLCV frame
+        """
+        logger.info(f"Fetching historical data for {len(symbols)} symbols from {start_date} to {end_date}")
+        
+        # Group the symbols by the date ranges they are missing
+        groups = {}
+        last_day = self._last_day(end_date)
+        for symbol in symbols:
+            missing = tuple(self._missing_ranges(symbol, start_date.date(), last_day))
+            if missing:
+                groups.setdefault(missing, []).append(symbol)
+        
+        fallback = set()
+        staged = []
+        try:
+            for missing, group in groups.items():
+                for missing_start, missing_end in missing:
+                    range_start = datetime.combine(missing_start, datetime.min.time())
+                    range_end = datetime.combine(missing_end, datetime.min.time()) + timedelta(days=1)
+                    
+                    if self.calendar.session_count(missing_start, missing_end) == 0:
+                        # Nothing to fetch when the exchange was closed, same rule as fetch_historical_data
+                        for symbol in group:
+                            self._stage_coverage(symbol, missing_start, missing_end)
+                        continue
+                    
+                    for i in range(0, len(group), self.BATCH_SIZE):
+                        batch = group[i:i + self.BATCH_SIZE]
+                        logger.info(f"Downloading {len(batch)} symbols for {missing_start} - {missing_end}")
+                        data = self._fetch_from_yfinance_batch(batch, range_start, range_end)
+                        
+                        for symbol in batch:
+                            if not data or symbol not in data:
+                                fallback.add(symbol)
+                                continue
+                            self._stage_market_data(data[symbol], symbol)
+                            self._stage_coverage(symbol, missing_start, missing_end)
+                            staged.append((symbol, data[symbol]))
+            
+            # Store the bars of all symbols in one transaction
+            db.session.commit()
+            
+            for symbol, frame in staged:
+                self._mirror_to_store(frame, symbol)
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error storing batch market data: {str(e)}")
+            fallback.update(symbol for group in groups.values() for symbol in group)
+        
+        result = {}
+        for symbol in symbols:
+            if symbol in fallback:
+                # Fetches the symbol on its own, with Alpha Vantage as a second source
+                result[symbol] = self.fetch_historical_data(symbol, start_date, end_date, as_frame)
+            else:
+                frame = self._load_market_data(symbol, start_date, end_date)
+                result[symbol] = frame if as_frame else frame_to_records(frame)
+        
+        return result
+    
+    def fetch_intraday_data(self, symbol, start_date, end_date, timeframe=BASE_TIMEFRAME, as_frame=False):
+        """
+        Fetch intraday market data for a symbol at a timeframe
+        
+        One minute bars of the range not stored yet are fetched and stored;
+        the requested timeframe is aggregated from the stored bars (see
+        utils/resample.py), reusing the closed buckets of earlier requests.
+        
+        Args:
+            symbol (str): Stock symbol
+            start_date (datetime): Start date, extended to the start of its day
+            end_date (datetime): End date
+            timeframe (str): Bar size, one of 1m, 5m, 15m, 1h and 1d
+            as_frame (bool): Return the normalized OHLCV frame instead of records
+        
+        Returns:
+            list or DataFrame: List of market data records, or the OHLCV frame
+        
+        Raises:
+            ValueError: If the timeframe is unknown
+        """
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        
+        logger.info(f"Fetching {timeframe} intraday data for {symbol} from {start_date} to {end_date}")
+        
+        # Whole days, so the window the cached views were built from stays the same during the day
+        start = datetime.combine(start_date.date(), datetime.min.time())
+        
+        try:
+            self._update_intraday_data(symbol, start, end_date)
+            
+            frame = self.load_intraday_data(symbol, start, end_date, timeframe)
+            return frame if as_frame else frame_to_records(frame)
+            
+        except Exception as e:
+            logger.error(f"Error fetching intraday data: {str(e)}")
+            raise Exception(f"Failed to retrieve intraday data for {symbol}: {str(e)}")
+    
+    def load_intraday_data(self, symbol, start_date, end_date, timeframe=BASE_TIMEFRAME):
+        """
+        Load the stored intraday bars of a symbol at a timeframe, without fetching
+        
+        Args:
+            symbol (str): Stock symbol
+            start_date (datetime): First timestamp of the one minute bars to aggregate
+            end_date (datetime): Last timestamp of the one minute bars to aggregate
+            timeframe (str): Bar size, one of 1m, 5m, 15m, 1h and 1d
+        
+        Returns:
+            DataFrame: Normalized OHLCV frame
+        """
+        base = self._query_market_data(symbol, start_date, end_date, IntradayBar)
+        return self.views.get(symbol, base, timeframe)
+    
+    def _update_intraday_data(self, symbol, start_date, end_date):
+        """Fetch and store the one minute bars of a range before the first or after the last stored bar"""
+        now = datetime.now()
+        checked = self._intraday_checked.get(symbol)
+        if checked is not None and (now - checked).total_seconds() < self.intraday_ttl:
+            return
+        self._intraday_checked[symbol] = now
+        
+        first, last = db.session.query(
+            func.min(IntradayBar.timestamp), func.max(IntradayBar.timestamp)
+        ).filter(IntradayBar.symbol == symbol).one()
+        start = max(start_date, now - timedelta(days=self.INTRADAY_MAX_DAYS))
+        end = min(end_date, now)
+        
+        ranges = []
+        if first is None:
+            ranges.append((start, end))
+        else:
+            # Days before the first stored bar, if the exchange was open on any of them
+            if start < first and self.calendar.session_count(start, first.date() - timedelta(days=1)) > 0:
+                ranges.append((start, first))
+            
+            # Bars after the last stored one, which is fetched again as it may have been incomplete;
+            # nothing is missing once its session closed and no other one opened since
+            session_closed = last >= datetime.combine(last.date(), SESSION_CLOSE) - timedelta(minutes=1)
+            if end > last and not (session_closed and self.calendar.session_count(last.date() + timedelta(days=1), end) == 0):
+                ranges.append((last, end))
+        
+        for range_start, range_end in ranges:
+            chunk_start = range_start
+            while chunk_start < range_end:
+                chunk_end = min(chunk_start + timedelta(days=self.INTRADAY_CHUNK_DAYS), range_end)
+                if self.calendar.session_count(chunk_start, chunk_end) > 0:
+                    logger.info(f"Fetching intraday bars {chunk_start} - {chunk_end} for {symbol}")
+                    data = self._fetch_from_yfinance(symbol, chunk_start, chunk_end, interval=BASE_TIMEFRAME)
+                    self._store_intraday_data(data, symbol)
+                chunk_start = chunk_end
+    
+    def _store_intraday_data(self, data, symbol):
+        """Store an OHLCV frame of one minute bars, updating bars that were fetched again"""
+        if data is None or data.empty:
+            return
+        
+        try:
+            self._stage_market_data(data, symbol, IntradayBar)
+            db.session.commit()
+            logger.info(f"Stored {len(data)} intraday bars for {symbol}")
+            
+            # Views whose closed buckets got bars are aggregated again on their next use
+            self.views.invalidate(symbol, data.index[0])
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error storing intraday data: {str(e)}")
+    
+    def _last_day(self, end_date):
+        """
+        Clip the end of a requested range to the last session that has opened
+        
+        Sessions that haven't opened yet in exchange time, e.g. today before
+        the open or tomorrow on a server whose local date is ahead, have no
+        bars; a fetch would return nothing and never be recorded as covered.
+        """
+        return min(end_date.date(), self.calendar.last_session())
+    
+    def _missing_ranges(self, symbol, start_day, end_day):
+        """
+        Compute the sub-ranges of a date range not covered by earlier fetches
+        
+        Args:
+            symbol (str): Stock symbol
+            start_day (date): First day of the range
+            end_day (date): Last day of the range (inclusive)
+        
+        Returns:
+            list: (first day, last day) tuples of the missing sub-ranges
+        """
+        now = datetime.now()
+        intervals = []
+        for coverage in MarketDataCoverage.query.filter_by(symbol=symbol).all():
+            covered_end = coverage.end_date
+            
+            # Bars of a session fetched before its close may have been incomplete; refetch
+            # them once they are stale. Closed days and sessions fetched after the close
+            # have no bars that could still change.
+            fetched = self.calendar.exchange_time(coverage.fetched_at)
+            fetched_day = fetched.date()
+            stale = (now - coverage.fetched_at).total_seconds() > self.live_data_ttl
+            if stale and covered_end >= fetched_day and self.calendar.is_session_open(fetched):
+                covered_end = fetched_day - timedelta(days=1)
+            
+            intervals.append((coverage.start_date, covered_end))
+        
+        missing = []
+        cursor = start_day
+        for covered_start, covered_end in sorted(intervals):
+            if cursor > end_day:
+                break
+            if covered_end < cursor:
+                continue
+            if covered_start > end_day:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, covered_start - timedelta(days=1)))
+            cursor = max(cursor, covered_end + timedelta(days=1))
+        
+        if cursor <= end_day:
+            missing.append((cursor, end_day))
+        
+        return missing
+    
+    def _record_coverage(self, symbol, start_day, end_day):
+        """Record a fetched date range, merging it with overlapping or adjacent ones"""
+        try:
+            self._stage_coverage(symbol, start_day, end_day)
+            db.session.commit()
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recording market data coverage: {str(e)}")
+    
+    def _stage_coverage(self, symbol, start_day, end_day):
+        """Add the coverage changes of a fetched date range to the session without committing"""
+        now = datetime.now()
+        records = MarketDataCoverage.query.filter_by(symbol=symbol).all()
+        intervals = sorted(
+            [(record.start_date, record.end_date, record.fetched_at) for record in records]
+            + [(start_day, end_day, now)]
+        )
+        
+        merged = []
+        for interval_start, interval_end, fetched_at in intervals:
+            if merged and interval_start <= merged[-1][1] + timedelta(days=1):
+                last_start, last_end, last_fetched_at = merged[-1]
+                # The fetch time belongs to the interval providing the end of the merged range
+                if interval_end > last_end or (interval_end == last_end and fetched_at > last_fetched_at):
+                    merged[-1] = (last_start, interval_end, fetched_at)
+            else:
+                merged.append((interval_start, interval_end, fetched_at))
+        
+        for record in records:
+            db.session.delete(record)
+        for interval_start, interval_end, fetched_at in merged:
+            db.session.add(MarketDataCoverage(
+                symbol=symbol,
+                start_date=interval_start,
+                end_date=interval_end,
+                fetched_at=fetched_at
+            ))
+    
+    def _load_market_data(self, symbol, start_date, end_date):
+        """Load the stored bars of a symbol as a normalized OHLCV frame"""
+        start = datetime.combine(start_date.date(), datetime.min.time())
+        
+        # Long ranges are read from the columnar store, short ones from the table
+        if self.store is not None and (end_date - start).days >= self.COLUMNAR_MIN_DAYS and self.store.has(symbol):
+            try:
+                return self.store.read(symbol, start, end_date)
+            except Exception as e:
+                logger.error(f"Error reading {symbol} from the columnar store: {str(e)}")
+        
+        return self._query_market_data(symbol, start, end_date)
+    
+    def _query_market_data(self, symbol, start_date=None, end_date=None, model=MarketData):
+        """Query the bars of a symbol from the MarketData (or IntradayBar) table as a normalized OHLCV frame"""
+        query = db.session.query(
+            model.timestamp,
+            model.open_price,
+            model.high_price,
+            model.low_price,
+            model.close_price,
+            model.volume
+        ).filter(model.symbol == symbol)
+        if start_date is not None:
+            query = query.filter(model.timestamp >= start_date)
+        if end_date is not None:
+            query = query.filter(model.timestamp <= end_date)
+        
+        return normalize_rows(query.order_by(model.timestamp).all(), symbol)
+    
+    def _mirror_to_store(self, data, symbol):
+        """
+        Copy stored bars to the columnar store, if one is configured
+        
+        A symbol written for the first time gets all of its bars from the
+        table, so its partitions hold everything the table holds.
+        """
+        if self.store is None or data is None or data.empty:
+            return
+        
+        try:
+            if not self.store.has(symbol):
+                data = self._query_market_data(symbol)
+            self.store.write(data, symbol)
+            
+        except Exception as e:
+            logger.error(f"Error writing {symbol} to the columnar store: {str(e)}")
+    
+    def _fetch_from_yfinance(self, symbol, start_date, end_date, interval='1d'):
+        """Fetch data from Yahoo Finance API as an OHLCV frame, returning None if the request failed"""
         try:
             ticker = yf.Ticker(symbol)
-            df = ticker.history(start=start_date, end=end_date)
+            df = ticker.history(start=start_date, end=end_date, interval=interval)
             
             if df.empty:
                 logger.warning(f"No data returned from Yahoo Finance for {symbol}")
-                return []
             
-            # Convert to list of dictionaries format
-            result = []
-            for index, row in df.iterrows():
-                result.append({
-                    "symbol": symbol,
-                    "timestamp": index.to_pydatetime(),
-                    "open": row['Open'],
-                    "high": row['High'],
-                    "low": row['Low'],
-                    "close": row['Close'],
-                    "volume": row['Volume']
-                })
+            return normalize_yfinance(df, symbol)
+            
+        except Exception as e:
+            logger.error(f"Error fetching from Yahoo Finance: {str(e)}")
+            return None
+    
+    def _fetch_from_yfinance_batch(self, symbols, start_date, end_date):
+        """
+        Fetch data for several symbols from Yahoo Finance with one multi-ticker download
+        
+        Args:
+            symbols (list): Stock symbols
+            start_date (datetime): Start date
+            end_date (datetime): End date (exclusive)
+        
+        Returns:
+            dict: Symbol to OHLCV frame, or None if the request failed
+        """
+        try:
+            df = self.downloader(
+                symbols,
+                start=start_date,
+                end=end_date,
+                group_by='ticker',
+                auto_adjust=True,
+                progress=False
+            )
+            
+            if df is None or df.empty:
+                logger.warning(f"No data returned from Yahoo Finance for {symbols}")
+                return {}
+            
+            # Split the multi-ticker frame into one frame per symbol
+            result = {}
+            for symbol in symbols:
+                if isinstance(df.columns, pd.MultiIndex):
+                    if symbol not in df.columns.get_level_values(0):
+                        continue
+                    frame = df[symbol]
+                elif len(symbols) == 1:
+                    frame = df
+                else:
+                    continue
+                
+                frame = normalize_yfinance(frame, symbol)
+                if not frame.empty:
+                    result[symbol] = frame
             
             return result
             
         except Exception as e:
-            logger.error(f"Error fetching from Yahoo Finance: {str(e)}")
-            return []
+            logger.error(f"Error fetching batch from Yahoo Finance: {str(e)}")
+            return None
     
     def _fetch_from_alpha_vantage(self, symbol, start_date, end_date):
-        """Fetch data from Alpha Vantage API"""
+        """Fetch data from Alpha Vantage API as an OHLCV frame, returning None if the request failed"""
         try:
-            base_url = "https://www.alphavantage.co/query"
-            
             params = {
                 "function": "TIME_SERIES_DAILY",
                 "symbol": symbol,
@@ -93,79 +547,78 @@ class DataAgent:
                 "outputsize": "full"
             }
             
-            response = requests.get(base_url, params=params, verify=False)
+            data = self._query_alpha_vantage(params, "Time Series (Daily)")
             
-            if response.status_code != 200:
-                logger.error(f"Alpha Vantage API error: {response.status_code}")
-                return []
-            
-            data = response.json()
+            if data is None:
+                return None
             
             if "Error Message" in data:
                 logger.error(f"Alpha Vantage API error: {data['Error Message']}")
-                return []
+                return None
+            
+            if self._alpha_vantage_throttled(data):
+                return None
             
             if "Time Series (Daily)" not in data:
                 logger.error("Unexpected Alpha Vantage API response format")
-                return []
+                return None
             
-            time_series = data["Time Series (Daily)"]
-            
-            result = []
-            for date_str, values in time_series.items():
-                date = datetime.strptime(date_str, "%Y-%m-%d")
-                
-                # Only include data within our date range
-                if start_date <= date <= end_date:
-                    result.append({
-                        "symbol": symbol,
-                        "timestamp": date,
-                        "open": float(values["1. open"]),
-                        "high": float(values["2. high"]),
-                        "low": float(values["3. low"]),
-                        "close": float(values["4. close"]),
-                        "volume": int(values["5. volume"])
-                    })
-            
-            # Sort by date
-            result.sort(key=lambda x: x["timestamp"])
-            return result
+            # Parse the full history at once and slice the requested range
+            return normalize_alpha_vantage(data["Time Series (Daily)"], symbol, start_date, end_date)
             
         except Exception as e:
             logger.error(f"Error fetching from Alpha Vantage: {str(e)}")
-            return []
+            return None
     
     def _store_market_data(self, data, symbol):
-        """Store market data in the database"""
+        """Store an OHLCV frame in the database, updating bars that were fetched again"""
+        if data is None or data.empty:
+            return
+        
         try:
-            # Get existing data timestamps to avoid duplicates
-            existing_timestamps = set()
-            existing_records = MarketData.query.filter_by(symbol=symbol).all()
-            for record in existing_records:
-                existing_timestamps.add(record.timestamp.strftime("%Y-%m-%d"))
-            
-            # Add new records
-            for item in data:
-                timestamp_str = item["timestamp"].strftime("%Y-%m-%d")
-                if timestamp_str not in existing_timestamps:
-                    record = MarketData(
-                        symbol=symbol,
-                        timestamp=item["timestamp"],
-                        open_price=item["open"],
-                        high_price=item["high"],
-                        low_price=item["low"],
-                        close_price=item["close"],
-                        volume=item["volume"]
-                    )
-                    db.session.add(record)
-            
+            self._stage_market_data(data, symbol)
             db.session.commit()
             logger.info(f"Stored {len(data)} market data records for {symbol}")
             
+            self._mirror_to_store(data, symbol)
+            
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error storing market data: {str(e)}")
     
+    def _stage_market_data(self, data, symbol, model=MarketData):
+        """Upsert the bars of an OHLCV frame into MarketData (or IntradayBar) in the current transaction without committing"""
+        created_at = datetime.utcnow()
+        volume = data['volume'].to_numpy(dtype='float64', na_value=np.nan)
+        rows = [
+            {
+                "symbol": symbol,
+                "timestamp": timestamp,
+                "open_price": open_price,
+                "high_price": high,
+                "low_price": low,
+                "close_price": close,
+                "volume": None if np.isnan(bar_volume) else int(bar_volume),
+                "created_at": created_at
+            }
+            for timestamp, open_price, high, low, close, bar_volume in zip(
+                data.index.to_pydatetime(),
+                data['open'].tolist(),
+                data['high'].tolist(),
+                data['low'].tolist(),
+                data['close'].tolist(),
+                volume
+            )
+        ]
+        
+        # Bars of days fetched again (e.g. the current day) are refreshed
+        bulk_upsert(
+            model,
+            rows,
+            index_elements=['symbol', 'timestamp'],
+            update_columns=['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+        )
+    
     def fetch_news(self, symbol, days=7):
         """
         Fetch news articles related to a symbol
@@ -182,10 +635,10 @@ class DataAgent:
         try:
             # Check for existing news articles in our database
             start_date = datetime.now() - timedelta(days=days)
-            existing_news = NewsArticle.query.filter(
-                NewsArticle.symbols.contains(symbol),
-                NewsArticle.published_at >= start_date
-            ).all()
+            existing_news = NewsArticle.query.join(NewsArticleSymbol).filter(
+                NewsArticleSymbol.symbol == symbol.upper(),
+                NewsArticleSymbol.published_at >= start_date
+            ).order_by(NewsArticleSymbol.published_at.desc()).all()
             
             if len(existing_news) >= 5:  # If we have enough articles
                 logger.info(f"Using {len(existing_news)} cached news articles for {symbol}")
@@ -204,11 +657,22 @@ class DataAgent:
             logger.error(f"Error fetching news: {str(e)}")
             raise Exception(f"Failed to retrieve news for {symbol}: {str(e)}")
     
+    def refresh_news(self, symbol, days=7):
+        """
+        Fetch the latest news of a symbol from the news API, even if enough articles are stored
+        
+        Args:
+            symbol (str): Stock symbol
+            days (int): Number of days of news to fetch
+        
+        Returns:
+            int: Number of articles received
+        """
+        return len(self._fetch_news_from_alpha_vantage(symbol, days))
+    
     def _fetch_news_from_alpha_vantage(self, symbol, days):
         """Fetch news from Alpha Vantage API"""
         try:
-            base_url = "https://www.alphavantage.co/query"
-            
             params = {
                 "function": "NEWS_SENTIMENT",
                 "tickers": symbol,
@@ -216,20 +680,20 @@ class DataAgent:
                 "limit": 50  # Get more articles to filter by date
             }
             
-            response = requests.get(base_url, params=params, verify=False)
+            data = self._query_alpha_vantage(params, "feed")
             
-            if response.status_code != 200:
-                logger.error(f"Alpha Vantage News API error: {response.status_code}")
+            if data is None:
                 return []
             
-            data = response.json()
+            if self._alpha_vantage_throttled(data):
+                return []
             
             if "feed" not in data:
                 logger.error("Unexpected Alpha Vantage News API response format")
                 return []
             
             start_date = datetime.now() - timedelta(days=days)
-            result = []
+            articles = []
             
             for article in data["feed"]:
                 # Parse the time
@@ -237,20 +701,16 @@ class DataAgent:
                 
                 # Only include articles within our date range
                 if time_published >= start_date:
-                    # Store in database
-                    db_article = NewsArticle(
-                        title=article["title"],
-                        source=article.get("source", "Alpha Vantage"),
-                        url=article.get("url", ""),
-                        published_at=time_published,
-                        content=article.get("summary", ""),
-                        symbols=symbol
-                    )
-                    db.session.add(db_article)
-                    db.session.commit()
-                    
-                    # Add to result
-                    result.append(self._news_to_dict(db_article))
+                    articles.append({
+                        "title": article["title"],
+                        "source": article.get("source", "Alpha Vantage"),
+                        "url": article.get("url", ""),
+                        "published_at": time_published,
+                        "content": article.get("summary", "")
+                    })
+            
+            # Store in database, once per article
+            result = self._store_news(articles, symbol)
             
             logger.info(f"Fetched {len(result)} news articles from Alpha Vantage for {symbol}")
             return result
@@ -262,7 +722,7 @@ class DataAgent:
     
     def _fetch_news_from_alternative_source(self, symbol, days):
         """
-        Fetch news from an alternative source 
+        Fetch news from an alternative source
         (simulates scraping from financial websites)
         """
         # In a real implementation, this would use web scraping to get news
@@ -270,25 +730,129 @@ class DataAgent:
         # For this implementation, we'll just add a placeholder message.
         logger.info(f"Using web_scraper to get news for {symbol}")
         try:
-            # Create a placeholder article for demonstration
-            article = NewsArticle(
-                title=f"Latest financial news for {symbol}",
-                source="Financial Web Scraper",
-                url="",
-                published_at=datetime.now(),
-                content=f"This is a placeholder for scraped news content about {symbol}. In a production environment, this would contain actual news scraped from financial websites.",
-                symbols=symbol
-            )
-            db.session.add(article)
-            db.session.commit()
+            # Create a placeholder article for demonstration, stored once per symbol
+            article = {
+                "title": f"Latest financial news for {symbol}",
+                "source": "Financial Web Scraper",
+                "url": "",
+                "published_at": datetime.now(),
+                "content": f"This is a placeholder for scraped news content about {symbol}. In a production environment, this would contain actual news scraped from financial websites."
+            }
             
-            return [self._news_to_dict(article)]
+            return self._store_news([article], symbol)
             
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error creating alternative news source: {str(e)}")
             return []
     
+    def _store_news(self, articles, symbol):
+        """
+        Store a batch of news articles and link them to a symbol
+        
+        Articles are inserted with one upsert keyed by their URL hash; those
+        stored before, e.g. fetched for another symbol, keep their row and id
+        and are only linked to this symbol as well.
+        
+        Args:
+            articles (list): Dictionaries with title, source, url, published_at and content
+            symbol (str): Symbol the articles were fetched for
+        
+        Returns:
+            list: News article records of the stored rows, one per distinct article, in the order given
+        """
+        if not articles:
+            return []
+        
+        created_at = datetime.utcnow()
+        rows = {}
+        for article in articles:
+            url_hash = NewsArticle.compute_url_hash(
+                article["url"], article["source"], article["title"], article["content"]
+            )
+            rows.setdefault(url_hash, dict(article, symbols=symbol, url_hash=url_hash, created_at=created_at))
+        
+        bulk_upsert(NewsArticle, list(rows.values()), index_elements=['url_hash'])
+        stored = {
+            article.url_hash: article
+            for article in NewsArticle.query.filter(NewsArticle.url_hash.in_(list(rows))).all()
+        }
+        
+        bulk_upsert(
+            NewsArticleSymbol,
+            [
+                {"article_id": article.id, "symbol": symbol.upper(), "published_at": article.published_at}
+                for article in stored.values()
+            ],
+            index_elements=['article_id', 'symbol']
+        )
+        
+        # Converted before the commit expires the rows, which would reload every one of them
+        result = [self._news_to_dict(stored[url_hash]) for url_hash in rows]
+        db.session.commit()
+        
+        return result
+    
+    def _query_alpha_vantage(self, params, payload_key):
+        """
+        Get an Alpha Vantage response payload, served from the response cache when possible
+        
+        Fresh cached payloads are returned without a request. Expired ones are
+        revalidated with their validators and still returned when the API
+        fails or is throttled; new payloads holding payload_key are cached.
+        
+        Args:
+            params (dict): Query parameters, including the function
+            payload_key (str): Key of the data in a successful response
+        
+        Returns:
+            dict: Response payload, or None if the request failed
+        """
+        endpoint = params["function"]
+        cached = self.response_cache.get(endpoint, params)
+        if cached is not None and cached.fresh:
+            logger.debug(f"Serving cached Alpha Vantage {endpoint} response ({cached.age:.0f}s old)")
+            return cached.payload
+        
+        try:
+            response = self.client.get(
+                self.alpha_vantage_url, params=params, provider='alpha_vantage',
+                key=self.alpha_vantage_api_key, headers=cached.validators() if cached else None, verify=False
+            )
+        except Exception as e:
+            if cached is None:
+                raise
+            logger.warning(f"Alpha Vantage request failed, serving stale {endpoint} response: {str(e)}")
+            return cached.payload
+        
+        if response.status_code == 304 and cached is not None:
+            self.response_cache.refresh(endpoint, params, cached)
+            return cached.payload
+        
+        if response.status_code != 200:
+            logger.error(f"Alpha Vantage API error: {response.status_code}")
+            return cached.payload if cached is not None else None
+        
+        data = response.json()
+        if payload_key in data:
+            self.response_cache.set(
+                endpoint, params, data,
+                response.headers.get('ETag'), response.headers.get('Last-Modified')
+            )
+        elif cached is not None:
+            logger.warning(f"Unusable Alpha Vantage {endpoint} response, serving stale one")
+            return cached.payload
+        
+        return data
+    
+    def _alpha_vantage_throttled(self, data):
+        """Check whether Alpha Vantage answered with a call frequency or quota notice instead of data"""
+        notice = data.get("Note") or data.get("Information")
+        if notice:
+            logger.warning(f"Alpha Vantage API limit reached: {notice}")
+            return True
+        return False
+    
     def _news_to_dict(self, news_article):
         """Convert a NewsArticle model to a dictionary"""
         return {
@@ -0,0 +1,161 @@
+import json
+import numpy as np
+import pandas as pd
+
+class IndicatorSeries:
+    """
+    Columnar result of a technical indicator calculation.
+    
+    Holds one timestamp index and one float array per output field
+    (e.g. ``value`` or ``upper``/``middle``/``lower``). Row dictionaries in
+    the format the templates and the JSON API expect are only built on
+    demand, through indexing, iteration or to_records().
+    """
+    
+    def __init__(self, symbol, indicator_type, parameters, timestamps, fields, index_key=None):
+        """
+        Initialize the series
+        
+        Args:
+            symbol (str): Stock symbol
+            indicator_type (str): Indicator name, e.g. SMA or MACD
+            parameters (dict): Indicator parameters
+            timestamps (DatetimeIndex): Timestamp of every data point
+            fields (dict): Output field name to array of values
+            index_key (slice or ndarray): Optional selection to apply to timestamps on first access
+        """
+        self.symbol = symbol
+        self.indicator_type = indicator_type
+        self.parameters = parameters
+        self.fields = {name: np.asarray(values, dtype=float) for name, values in fields.items()}
+        self._timestamps = timestamps if isinstance(timestamps, pd.DatetimeIndex) else pd.DatetimeIndex(timestamps)
+        self._index_key = index_key
+        self._length = len(next(iter(self.fields.values()))) if self.fields else len(self._timestamps)
+        self._parameters_json = None
+    
+    @classmethod
+    def from_columns(cls, symbol, indicator_type, parameters, index, columns):
+        """
+        Build a series from aligned columns, dropping points where any field is NaN
+        
+        Args:
+            symbol (str): Stock symbol
+            indicator_type (str): Indicator name
+            parameters (dict): Indicator parameters
+            index (DatetimeIndex): Timestamps shared by all columns
+            columns (dict): Output field name to Series/array of values
+        
+        Returns:
+            IndicatorSeries: Series without warm-up (NaN) points
+        """
+        fields = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        
+        mask = np.ones(len(index), dtype=bool)
+        for values in fields.values():
+            mask &= ~np.isnan(values)
+        
+        # Warm-up points only occur at the start; slice instead of masking when possible
+        valid = np.flatnonzero(mask)
+        if len(valid) == 0:
+            mask = slice(0, 0)
+        elif valid[-1] - valid[0] + 1 == len(valid):
+            mask = slice(valid[0], valid[-1] + 1)
+        
+        # Slicing the shared index is deferred, many series built from one panel never need it
+        return cls(
+            symbol,
+            indicator_type,
+            parameters,
+            index,
+            {name: values[mask] for name, values in fields.items()},
+            index_key=mask
+        )
+    
+    @property
+    def timestamps(self):
+        """Timestamps of the data points as a DatetimeIndex"""
+        if self._index_key is not None:
+            self._timestamps = self._timestamps[self._index_key]
+            self._index_key = None
+        return self._timestamps
+    
+    @property
+    def parameters_json(self):
+        """Parameters serialized once, as stored in TechnicalIndicator.parameters"""
+        if self._parameters_json is None:
+            self._parameters_json = json.dumps(self.parameters)
+        return self._parameters_json
+    
+    def column(self, name):
+        """Return the values of an output field as a numpy array"""
+        return self.fields[name]
+    
+    def to_records(self):
+        """
+        Materialize the series as a list of row dictionaries
+        
+        Returns:
+            list: Data points with timestamp, field values, indicator_type, symbol and parameters
+        """
+        timestamps = self.timestamps.to_pydatetime()
+        columns = {name: values.tolist() for name, values in self.fields.items()}
+        
+        records = []
+        for i, timestamp in enumerate(timestamps):
+            record = {"timestamp": timestamp}
+            for name, values in columns.items():
+                record[name] = values[i]
+            record["indicator_type"] = self.indicator_type
+            record["symbol"] = self.symbol
+            record["parameters"] = self.parameters_json
+            records.append(record)
+        
+        return records
+    
+    def to_columns(self):
+        """
+        Serialize the series column-wise, without building one dictionary per point
+        
+        Returns:
+            dict: Parameters, ISO timestamps and one list per output field
+        """
+        columns = {
+            "indicator_type": self.indicator_type,
+            "symbol": self.symbol,
+            "parameters": self.parameters,
+            "timestamps": [timestamp.isoformat() for timestamp in self.timestamps.to_pydatetime()]
+        }
+        for name, values in self.fields.items():
+            columns[name] = values.tolist()
+        return columns
+    
+    def __len__(self):
+        return self._length
+    
+    def __bool__(self):
+        return self._length > 0
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return IndicatorSeries(
+                self.symbol,
+                self.indicator_type,
+                self.parameters,
+                self.timestamps[key],
+                {name: values[key] for name, values in self.fields.items()}
+            )
+        
+        record = {"timestamp": self.timestamps[key].to_pydatetime()}
+        for name, values in self.fields.items():
+            record[name] = float(values[key])
+        record["indicator_type"] = self.indicator_type
+        record["symbol"] = self.symbol
+        record["parameters"] = self.parameters_json
+        return record
+    
+    def __repr__(self):
+        return f"<IndicatorSeries {self.indicator_type} for {self.symbol} ({len(self)} points)>"
@@ -0,0 +1,150 @@
+"""
+Running state for extending indicator series one bar at a time.
+
+seed_state() derives the state of an indicator from the full close history
+(vectorized), and advance_state() extends it over new bars only. The state is
+a plain JSON-serializable dict so it can be persisted in IndicatorState:
+
+- SMA / BBANDS: tail of the last ``period`` closes
+- EMA: last EMA value
+- RSI: last close plus the last ``period`` gains and losses, the first
+  close counting as a zero gain and loss
+- MACD: last fast, slow and signal EMA values
+
+The results of advance_state() match a full recomputation with the
+formulas in AnalysisAgent.
+"""
+import numpy as np
+import pandas as pd
+
+def seed_state(indicator_type, parameters, close):
+    """
+    Build the running state of an indicator from a close price history
+    
+    Args:
+        indicator_type (str): Indicator name (SMA, EMA, RSI, MACD, BBANDS)
+        parameters (dict): Indicator parameters
+        close (array-like): Close prices in chronological order
+    
+    Returns:
+        dict: State after the last close
+    """
+    close = np.asarray(close, dtype=float)
+    
+    if indicator_type in ('SMA', 'BBANDS'):
+        return {"window": close[-parameters['period']:].tolist()}
+    
+    if indicator_type == 'EMA':
+        ema = pd.Series(close).ewm(span=parameters['period'], adjust=False).mean()
+        return {"ema": float(ema.iloc[-1]) if len(ema) else None}
+    
+    if indicator_type == 'RSI':
+        period = parameters['period']
+        # The first close counts as an unchanged price, like the leading zero gain of a full recompute
+        delta = np.diff(close, prepend=close[:1])
+        return {
+            "last_close": float(close[-1]) if len(close) else None,
+            "gains": np.clip(delta[-period:], 0, None).tolist(),
+            "losses": np.clip(-delta[-period:], 0, None).tolist()
+        }
+    
+    if indicator_type == 'MACD':
+        series = pd.Series(close)
+        fast = series.ewm(span=parameters['fast_period'], adjust=False).mean()
+        slow = series.ewm(span=parameters['slow_period'], adjust=False).mean()
+        signal = (fast - slow).ewm(span=parameters['signal_period'], adjust=False).mean()
+        if not len(close):
+            return {"fast": None, "slow": None, "signal": None}
+        return {"fast": float(fast.iloc[-1]), "slow": float(slow.iloc[-1]), "signal": float(signal.iloc[-1])}
+    
+    raise ValueError(f"Unsupported indicator for incremental updates: {indicator_type}")
+
+def advance_state(indicator_type, parameters, state, close):
+    """
+    Extend an indicator over new bars
+    
+    Args:
+        indicator_type (str): Indicator name (SMA, EMA, RSI, MACD, BBANDS)
+        parameters (dict): Indicator parameters
+        state (dict): State after the last processed bar, as returned by seed_state
+        close (array-like): Close prices of the new bars in chronological order
+    
+    Returns:
+        tuple: (dict of output field arrays for the new bars, new state)
+    """
+    close = np.asarray(close, dtype=float)
+    
+    if indicator_type == 'SMA':
+        period = parameters['period']
+        window = np.concatenate([np.asarray(state["window"], dtype=float), close])
+        sma = pd.Series(window).rolling(window=period).mean().to_numpy()
+        return {"value": sma[len(sma) - len(close):]}, {"window": window[-period:].tolist()}
+    
+    if indicator_type == 'BBANDS':
+        period = parameters['period']
+        std_dev = parameters['std_dev']
+        window = pd.Series(np.concatenate([np.asarray(state["window"], dtype=float), close]))
+        middle = window.rolling(window=period).mean().to_numpy()
+        std = window.rolling(window=period).std().to_numpy()
+        new = slice(len(window) - len(close), None)
+        fields = {
+            "middle": middle[new],
+            "upper": middle[new] + std[new] * std_dev,
+            "lower": middle[new] - std[new] * std_dev
+        }
+        return fields, {"window": window.to_numpy()[-period:].tolist()}
+    
+    if indicator_type == 'EMA':
+        alpha = 2.0 / (parameters['period'] + 1)
+        ema = state["ema"]
+        values = np.empty(len(close))
+        for i, price in enumerate(close):
+            ema = price if ema is None else alpha * price + (1 - alpha) * ema
+            values[i] = ema
+        return {"value": values}, {"ema": None if ema is None else float(ema)}
+    
+    if indicator_type == 'RSI':
+        period = parameters['period']
+        last_close = state["last_close"]
+        gains = list(state["gains"])
+        losses = list(state["losses"])
+        values = np.full(len(close), np.nan)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i, price in enumerate(close):
+                delta = 0.0 if last_close is None else price - last_close
+                gains = (gains + [max(delta, 0.0)])[-period:]
+                losses = (losses + [max(-delta, 0.0)])[-period:]
+                if len(gains) == period:
+                    rs = np.float64(np.mean(gains)) / np.float64(np.mean(losses))
+                    values[i] = 100 - (100 / (1 + rs))
+                last_close = float(price)
+        
+        return {"value": values}, {"last_close": last_close, "gains": gains, "losses": losses}
+    
+    if indicator_type == 'MACD':
+        fast_alpha = 2.0 / (parameters['fast_period'] + 1)
+        slow_alpha = 2.0 / (parameters['slow_period'] + 1)
+        signal_alpha = 2.0 / (parameters['signal_period'] + 1)
+        fast, slow, signal = state["fast"], state["slow"], state["signal"]
+        macd_values = np.empty(len(close))
+        signal_values = np.empty(len(close))
+        
+        for i, price in enumerate(close):
+            if fast is None:
+                fast = slow = price
+                signal = 0.0
+            else:
+                fast = fast_alpha * price + (1 - fast_alpha) * fast
+                slow = slow_alpha * price + (1 - slow_alpha) * slow
+                signal = signal_alpha * (fast - slow) + (1 - signal_alpha) * signal
+            macd_values[i] = fast - slow
+            signal_values[i] = signal
+        
+        fields = {"value": macd_values, "signal": signal_values, "histogram": macd_values - signal_values}
+        new_state = {"fast": fast, "slow": slow, "signal": signal}
+        if fast is not None:
+            new_state = {name: float(value) for name, value in new_state.items()}
+        return fields, new_state
+    
+    raise ValueError(f"Unsupported indicator for incremental updates: {indicator_type}")
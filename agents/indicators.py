@@ -0,0 +1,295 @@
+"""
+Indicator registry and calculation planner.
+
+Every indicator declares its output fields as expressions over shared
+intermediate results, e.g. BBANDS uses ``rolling_mean(close, 20)`` and
+``rolling_std(close, 20)``, MACD uses ``ewm(close, 12)`` and
+``ewm(close, 26)``. An expression node is a tuple ``(op, *args)`` where the
+arguments are other nodes or constants, so identical intermediates compare
+equal. plan() merges the nodes of all requested indicators into one DAG and
+evaluate() computes each node exactly once, in dependency order. Rolling
+windows over the same input share one set of cumulative sums, which also
+makes parameter sweeps (many periods of one indicator) close to one pass.
+
+Nodes evaluate to 1-D arrays for a single symbol or 2-D arrays with one
+column per symbol.
+"""
+import itertools
+import numpy as np
+import pandas as pd
+from utils.rolling import CumulativeMoments
+
+CLOSE = ('close',)
+
+def diff(x):
+    return ('diff', x)
+
+def rolling_mean_of(x, window):
+    return ('rolling_mean', x, window)
+
+def rolling_std_of(x, window):
+    return ('rolling_std', x, window)
+
+def ewm(x, span):
+    return ('ewm', x, span)
+
+class IndicatorSpec:
+    """
+    Declaration of a technical indicator
+    
+    Attributes:
+        name (str): Indicator name, e.g. SMA
+        parameters (dict): Parameter name to (request parameter key, default value)
+        outputs (callable): Builds {field name: expression node} from resolved parameters
+    """
+    
+    def __init__(self, name, parameters, outputs):
+        self.name = name
+        self.parameters = parameters
+        self.outputs = outputs
+    
+    def resolve_parameters(self, params):
+        """
+        Resolve the indicator parameters from request parameters
+        
+        Args:
+            params (dict): Request parameters, e.g. {"sma_period": 50}
+        
+        Returns:
+            dict: Indicator parameters as stored with the series, e.g. {"period": 50}
+        """
+        return {name: params.get(key, default) for name, (key, default) in self.parameters.items()}
+
+def _macd_outputs(p):
+    macd = ('sub', ewm(CLOSE, p['fast_period']), ewm(CLOSE, p['slow_period']))
+    signal = ewm(macd, p['signal_period'])
+    return {"value": macd, "signal": signal, "histogram": ('sub', macd, signal)}
+
+def _bbands_outputs(p):
+    middle = rolling_mean_of(CLOSE, p['period'])
+    width = ('scale', rolling_std_of(CLOSE, p['period']), p['std_dev'])
+    return {"middle": middle, "upper": ('add', middle, width), "lower": ('sub', middle, width)}
+
+def _rsi_outputs(p):
+    delta = diff(CLOSE)
+    avg_gain = rolling_mean_of(('gain', delta, CLOSE), p['period'])
+    avg_loss = rolling_mean_of(('loss', delta, CLOSE), p['period'])
+    return {"value": ('rsi', avg_gain, avg_loss)}
+
+INDICATORS = {
+    'SMA': IndicatorSpec(
+        'SMA',
+        {"period": ('sma_period', 20)},
+        lambda p: {"value": rolling_mean_of(CLOSE, p['period'])}
+    ),
+    'EMA': IndicatorSpec(
+        'EMA',
+        {"period": ('ema_period', 20)},
+        lambda p: {"value": ewm(CLOSE, p['period'])}
+    ),
+    'RSI': IndicatorSpec(
+        'RSI',
+        {"period": ('rsi_period', 14)},
+        _rsi_outputs
+    ),
+    'MACD': IndicatorSpec(
+        'MACD',
+        {
+            "fast_period": ('macd_fast_period', 12),
+            "slow_period": ('macd_slow_period', 26),
+            "signal_period": ('macd_signal_period', 9)
+        },
+        _macd_outputs
+    ),
+    'BBANDS': IndicatorSpec(
+        'BBANDS',
+        {"period": ('bb_period', 20), "std_dev": ('bb_std_dev', 2)},
+        _bbands_outputs
+    ),
+}
+
+class IndicatorPlan:
+    """
+    Calculation plan for a set of indicator requests
+    
+    Attributes:
+        nodes (list): Unique expression nodes in dependency order
+        indicators (dict): Request key to indicator name
+        outputs (dict): Request key to {field name: expression node}
+        parameters (dict): Request key to resolved parameters
+    """
+    
+    def __init__(self, nodes, indicators, outputs, parameters):
+        self.nodes = nodes
+        self.indicators = indicators
+        self.outputs = outputs
+        self.parameters = parameters
+
+def plan_requests(requests):
+    """
+    Plan the calculation of several indicator requests as one DAG
+    
+    Args:
+        requests (list): (request key, indicator name, resolved parameters) tuples
+    
+    Returns:
+        IndicatorPlan: Plan sharing every common intermediate result
+    """
+    nodes = []
+    seen = set()
+    
+    def visit(node):
+        if node in seen:
+            return
+        for arg in node[1:]:
+            if isinstance(arg, tuple):
+                visit(arg)
+        seen.add(node)
+        nodes.append(node)
+    
+    indicators = {}
+    outputs = {}
+    parameters = {}
+    for key, indicator, indicator_parameters in requests:
+        indicators[key] = indicator
+        parameters[key] = indicator_parameters
+        outputs[key] = INDICATORS[indicator].outputs(indicator_parameters)
+        for node in outputs[key].values():
+            visit(node)
+    
+    return IndicatorPlan(nodes, indicators, outputs, parameters)
+
+def plan(indicators, params):
+    """
+    Plan the calculation of several indicators as one DAG
+    
+    Args:
+        indicators (list): Indicator names; unknown names are skipped
+        params (dict): Request parameters, e.g. {"sma_period": 50}
+    
+    Returns:
+        IndicatorPlan: Plan keyed by indicator name
+    """
+    requests = []
+    for indicator in dict.fromkeys(indicators):
+        if indicator in INDICATORS:
+            requests.append((indicator, indicator, INDICATORS[indicator].resolve_parameters(params)))
+    return plan_requests(requests)
+
+def expand_grid(indicator, grid):
+    """
+    Expand a parameter grid into every combination of indicator parameters
+    
+    Args:
+        indicator (str): Indicator name
+        grid (dict): Parameter name to list of values, e.g. {"period": [10, 20, 50]};
+            parameters left out keep their default value
+    
+    Returns:
+        list: Resolved parameter dictionaries, one per combination
+    """
+    spec = INDICATORS[indicator]
+    unknown = set(grid) - set(spec.parameters)
+    if unknown:
+        raise ValueError(f"Unknown {indicator} parameters: {', '.join(sorted(unknown))}")
+    
+    names = list(spec.parameters)
+    values = [list(grid[name]) if name in grid else [spec.parameters[name][1]] for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+def _ewm(values, span):
+    frame = pd.Series(values) if values.ndim == 1 else pd.DataFrame(values)
+    return frame.ewm(span=span, adjust=False).mean().to_numpy()
+
+def _gain(delta, close):
+    # Keep missing prices missing, so panel columns with gaps don't get zero gains
+    return np.where(np.isnan(close), np.nan, np.where(delta > 0, delta, 0.0))
+
+def _loss(delta, close):
+    return np.where(np.isnan(close), np.nan, np.where(delta < 0, -delta, 0.0))
+
+def _rsi(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = np.maximum(avg_gain, 0.0) / np.maximum(avg_loss, 0.0)
+        return 100 - (100 / (1 + rs))
+
+OPERATIONS = {
+    'diff': lambda x: np.diff(x, axis=0, prepend=np.nan),
+    'ewm': _ewm,
+    'gain': _gain,
+    'loss': _loss,
+    'rsi': _rsi,
+    'add': lambda a, b: a + b,
+    'sub': lambda a, b: a - b,
+    'scale': lambda a, factor: a * factor,
+}
+
+def evaluate(indicator_plan, close):
+    """
+    Evaluate a plan over close prices
+    
+    Args:
+        indicator_plan (IndicatorPlan): Plan returned by plan()
+        close (ndarray): 1-D close prices, or 2-D with one column per symbol
+    
+    Returns:
+        dict: Request key to {field name: array of values}
+    """
+    values = {CLOSE: np.asarray(close, dtype=float)}
+    planned = set(indicator_plan.nodes)
+    # Cumulative sums per input, shared by rolling windows of every length
+    moments = {}
+    
+    for node in indicator_plan.nodes:
+        if node in values:
+            continue
+        
+        op = node[0]
+        if op in ('rolling_mean', 'rolling_std'):
+            x, window = node[1], node[2]
+            if x not in moments:
+                moments[x] = CumulativeMoments(values[x])
+            mean_node, std_node = rolling_mean_of(x, window), rolling_std_of(x, window)
+            if std_node in planned:
+                # Mean and standard deviation share the same window sums
+                values[mean_node], values[std_node] = moments[x].mean_std(window)
+            else:
+                values[mean_node] = moments[x].mean(window)
+        else:
+            args = [values[arg] if isinstance(arg, tuple) else arg for arg in node[1:]]
+            values[node] = OPERATIONS[op](*args)
+    
+    return {
+        key: {field: values[node] for field, node in fields.items()}
+        for key, fields in indicator_plan.outputs.items()
+    }
+
+# Prices warm_up() evaluates indicators over
+WARM_UP_PROBE_BARS = 4096
+
+_warm_up_bars = {}
+
+def warm_up(indicator, parameters):
+    """
+    Count the leading bars an indicator produces no point for
+    
+    The indicator is evaluated once per parameter set over synthetic prices
+    that keep rising and falling, so no output is undefined for lack of
+    movement.
+    
+    Args:
+        indicator (str): Indicator name
+        parameters (dict): Resolved indicator parameters
+    
+    Returns:
+        int: Number of warm-up bars, WARM_UP_PROBE_BARS if the probe yields no point
+    """
+    key = (indicator, tuple(sorted(parameters.items())))
+    if key not in _warm_up_bars:
+        close = 100 + np.sin(np.arange(WARM_UP_PROBE_BARS))
+        fields = evaluate(plan_requests([(indicator, indicator, parameters)]), close)[indicator]
+        valid = np.ones(WARM_UP_PROBE_BARS, dtype=bool)
+        for values in fields.values():
+            valid &= ~np.isnan(values)
+        _warm_up_bars[key] = int(np.argmax(valid)) if valid.any() else WARM_UP_PROBE_BARS
+    return _warm_up_bars[key]
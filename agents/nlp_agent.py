@@ -1,10 +1,12 @@
 import logging
 import os
+from datetime import datetime
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 # Using only NLTK for sentiment analysis to avoid dependency on transformers
 from app import db
 from models import SentimentAnalysis
+from utils.database import UPSERT_BATCH_SIZE, bulk_upsert
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +36,10 @@ class NLPAgent:
         """
         Analyze sentiment of news articles
         
+        Stored scores of all articles are loaded with one query per batch of
+        ids, only the articles without one are scored, and their scores are
+        inserted together in a single transaction.
+        
         Args:
             news_articles (list): List of news article dictionaries
             
@@ -42,52 +48,52 @@ class NLPAgent:
         """
         logger.info(f"Analyzing sentiment for {len(news_articles)} news articles")
         
-        results = []
+        article_ids = list({article.get('id') for article in news_articles if article.get('id') is not None})
+        scores = {}
+        try:
+            for start in range(0, len(article_ids), UPSERT_BATCH_SIZE):
+                batch = article_ids[start:start + UPSERT_BATCH_SIZE]
+                scores.update(
+                    db.session.query(SentimentAnalysis.news_id, SentimentAnalysis.sentiment_score)
+                    .filter(SentimentAnalysis.news_id.in_(batch)).all()
+                )
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error loading cached sentiment analyses: {str(e)}")
+        
+        if scores:
+            logger.info(f"Using cached sentiment analysis for {len(scores)} articles")
         
+        created_at = datetime.utcnow()
+        rows = []
+        results = []
         for article in news_articles:
-            try:
-                article_id = article.get('id')
-                title = article.get('title', '')
-                content = article.get('content', '')
-                
-                # Check if we already have a sentiment analysis for this article
-                existing = SentimentAnalysis.query.filter_by(news_id=article_id).first()
-                
-                if existing:
-                    logger.info(f"Using cached sentiment analysis for article {article_id}")
-                    results.append({
-                        'news_id': article_id,
-                        'title': title,
-                        'sentiment_score': existing.sentiment_score,
-                        'sentiment_label': self._score_to_label(existing.sentiment_score)
-                    })
-                    continue
-                
+            article_id = article.get('id')
+            title = article.get('title', '')
+            
+            if article_id is None or article_id not in scores:
                 # Combine title and content for better analysis
-                text = f"{title} {content}"
-                
-                # Get sentiment score
-                sentiment_score = self._get_sentiment_score(text)
-                
-                # Store in database
-                sentiment = SentimentAnalysis(
-                    news_id=article_id,
-                    sentiment_score=sentiment_score
-                )
-                db.session.add(sentiment)
-                db.session.commit()
-                
-                # Add to results
-                results.append({
-                    'news_id': article_id,
-                    'title': title,
-                    'sentiment_score': sentiment_score,
-                    'sentiment_label': self._score_to_label(sentiment_score)
-                })
-                
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"Error analyzing sentiment: {str(e)}")
+                sentiment_score = self._get_sentiment_score(f"{title} {article.get('content', '')}")
+                if article_id is not None:
+                    scores[article_id] = sentiment_score
+                    rows.append({'news_id': article_id, 'sentiment_score': sentiment_score, 'created_at': created_at})
+            else:
+                sentiment_score = scores[article_id]
+            
+            results.append({
+                'news_id': article_id,
+                'title': title,
+                'sentiment_score': sentiment_score,
+                'sentiment_label': self._score_to_label(sentiment_score)
+            })
+        
+        # Articles scored concurrently elsewhere keep their stored row
+        try:
+            bulk_upsert(SentimentAnalysis, rows, index_elements=['news_id'])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error storing sentiment analyses: {str(e)}")
         
         return results
     
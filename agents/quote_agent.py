@@ -0,0 +1,296 @@
+import logging
+import threading
+import numpy as np
+from datetime import datetime
+from agents.indicator_state import seed_state, advance_state
+from agents.indicators import plan
+from utils.ohlcv import empty_frame
+from utils.resample import BASE_TIMEFRAME, TIMEFRAMES, bucket_start
+from utils.ring_buffer import OHLCVRingBuffer
+
+logger = logging.getLogger(__name__)
+
+# Indicators with running state kernels (see agents/indicator_state.py)
+STREAMING_INDICATORS = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
+
+class _LiveSymbol:
+    """Live bars and indicator states of one symbol"""
+    
+    def __init__(self, capacity):
+        self.bars = OHLCVRingBuffer(capacity)
+        self.bar = None  # [start, open, high, low, close, volume] of the bar being built
+        self.states = {}  # Indicator states after the last closed bar
+        self.values = {}  # Indicator values including the bar being built
+        self.price = None
+        self.timestamp = None
+        self.previous_close = None  # Last close of the previous day
+        self.ticks = 0
+
+class QuoteAgent:
+    """
+    Agent responsible for live quotes
+    
+    Ticks of a pluggable source (see utils/quotes.py) are aggregated into
+    bars of one timeframe per symbol. Closed bars are kept in a fixed-size
+    ring buffer, and every tick moves the indicators of the bar being built
+    one step from the states after the last closed bar, so their latest
+    values are current without recalculating any history.
+    """
+    
+    def __init__(self, timeframe=BASE_TIMEFRAME, capacity=500, indicators=None, params=None, history=None):
+        """
+        Initialize the quote agent
+        
+        Args:
+            timeframe (str): Bar size, one of 1m, 5m, 15m, 1h and 1d
+            capacity (int): Closed bars kept per symbol
+            indicators (list, optional): Indicators to keep current, defaults to all streaming ones
+            params (dict, optional): Parameters for indicators
+            history (callable, optional): Called with a symbol and a bar start on the symbol's first
+                tick, returns the normalized OHLCV frame of the closed bars before it to seed from
+        
+        Raises:
+            ValueError: If the timeframe is unknown
+        """
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        
+        self.timeframe = timeframe
+        self.capacity = capacity
+        self.history = history
+        self.parameters = {
+            indicator: parameters
+            for indicator, parameters in plan(indicators or STREAMING_INDICATORS, params or {}).parameters.items()
+            if indicator in STREAMING_INDICATORS
+        }
+        self.ticks = 0
+        self.late = 0
+        self._symbols = {}
+        self._lock = threading.Lock()
+        self._source = None
+        self._thread = None
+        logger.info("Quote Agent initialized")
+    
+    def on_tick(self, symbol, timestamp, price, size=0):
+        """
+        Process one tick
+        
+        Ticks older than the bar being built are counted and dropped.
+        
+        Args:
+            symbol (str): Stock symbol
+            timestamp (datetime): Naive exchange wall-clock time of the tick
+            price (float): Trade price
+            size (float): Traded volume
+        
+        Returns:
+            bool: Whether the tick was applied
+        """
+        start = bucket_start(timestamp, self.timeframe)
+        
+        with self._lock:
+            live = self._symbols.get(symbol)
+        if live is None:
+            # Load the history outside the lock, readers of other symbols don't wait for it
+            seeded = self._seed(symbol, start)
+            with self._lock:
+                live = self._symbols.setdefault(symbol, seeded)
+        
+        with self._lock:
+            if live.bar is not None and start < live.bar[0]:
+                self.late += 1
+                return False
+            
+            if live.bar is None or start > live.bar[0]:
+                if live.bar is not None:
+                    self._close_bar(live, start)
+                live.bar = [start, price, price, price, price, size]
+            else:
+                bar = live.bar
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                bar[5] += size
+            
+            # One step from the closed bars' states; the states themselves move when the bar closes
+            for indicator, parameters in self.parameters.items():
+                fields, _ = advance_state(indicator, parameters, live.states[indicator], [price])
+                live.values[indicator] = {field: values[-1] for field, values in fields.items()}
+            
+            live.price = price
+            live.timestamp = timestamp
+            live.ticks += 1
+            self.ticks += 1
+            return True
+    
+    def consume(self, source):
+        """
+        Process the ticks of a source until it ends or stop() is called
+        
+        Args:
+            source (iterable): Tick tuples, e.g. a ReplaySource or SocketSource
+        
+        Returns:
+            int: Number of ticks processed
+        """
+        count = 0
+        for tick in source:
+            try:
+                self.on_tick(tick.symbol, tick.timestamp, tick.price, tick.size)
+                count += 1
+            except Exception as e:
+                logger.error(f"Error processing tick {tick}: {str(e)}")
+        return count
+    
+    def start(self, source, app=None):
+        """
+        Consume a source in a daemon thread
+        
+        Args:
+            source (iterable): Tick source
+            app (Flask, optional): Application whose context the history is loaded in
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        def run():
+            try:
+                if app is not None:
+                    with app.app_context():
+                        count = self.consume(source)
+                else:
+                    count = self.consume(source)
+                logger.info(f"Live quote source ended after {count} ticks")
+            except Exception as e:
+                logger.error(f"Error reading live quotes: {str(e)}")
+        
+        self._source = source
+        self._thread = threading.Thread(target=run, name='live-quotes', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        """
+        Close the running source and wait for its thread
+        
+        Args:
+            timeout (float, optional): Seconds to wait for the thread
+        """
+        if self._source is not None and hasattr(self._source, 'close'):
+            self._source.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def latest(self, symbol):
+        """
+        Get the live values of a symbol
+        
+        Args:
+            symbol (str): Stock symbol
+        
+        Returns:
+            dict: Last price, the bar being built, the change from the previous day's close and the
+                latest indicator values, or None if no tick of the symbol arrived yet
+        """
+        with self._lock:
+            live = self._symbols.get(symbol)
+            if live is None or live.bar is None:
+                return None
+            
+            start, open_price, high, low, close, volume = live.bar
+            change = None if live.previous_close is None else live.price - live.previous_close
+            return {
+                "symbol": symbol,
+                "timestamp": live.timestamp.isoformat(),
+                "price": live.price,
+                "previous_close": live.previous_close,
+                "change": change,
+                "change_percent": None if not live.previous_close else change / live.previous_close * 100,
+                "timeframe": self.timeframe,
+                "bar": {
+                    "timestamp": start.isoformat(),
+                    "open": open_price,
+                    "high": high,
+                    "low": low,
+                    "close": close,
+                    "volume": volume
+                },
+                "indicators": {
+                    indicator: {field: None if np.isnan(value) else float(value) for field, value in fields.items()}
+                    for indicator, fields in live.values.items()
+                },
+                "ticks": live.ticks
+            }
+    
+    def bars(self, symbol):
+        """
+        Get the closed live bars of a symbol
+        
+        Args:
+            symbol (str): Stock symbol
+        
+        Returns:
+            DataFrame: Normalized OHLCV frame of the ring buffer, without the bar being built
+        """
+        with self._lock:
+            live = self._symbols.get(symbol)
+            return empty_frame(symbol) if live is None else live.bars.to_frame(symbol)
+    
+    def symbols(self):
+        """
+        List the symbols with live values
+        
+        Returns:
+            list: Symbols that received ticks, sorted
+        """
+        with self._lock:
+            return sorted(self._symbols)
+    
+    def stats(self):
+        """
+        Get the tick counters
+        
+        Returns:
+            dict: Whether a source is being consumed, processed and late ticks, and the symbol count
+        """
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "timeframe": self.timeframe,
+                "ticks": self.ticks,
+                "late": self.late,
+                "symbols": len(self._symbols)
+            }
+    
+    def _seed(self, symbol, start):
+        """Set up a symbol from the closed bars before its first tick"""
+        live = _LiveSymbol(self.capacity)
+        
+        history = None
+        if self.history is not None:
+            try:
+                history = self.history(symbol, start)
+                history = history[history.index < start]
+            except Exception as e:
+                logger.error(f"Error loading live quote history for {symbol}: {str(e)}")
+                history = None
+        
+        close = np.array([])
+        if history is not None and not history.empty:
+            live.bars.extend(history)
+            close = history['close'].to_numpy(dtype=float)
+            earlier_days = history[history.index < datetime.combine(start.date(), datetime.min.time())]
+            if not earlier_days.empty:
+                live.previous_close = float(earlier_days['close'].iloc[-1])
+        
+        for indicator, parameters in self.parameters.items():
+            live.states[indicator] = seed_state(indicator, parameters, close)
+        return live
+    
+    def _close_bar(self, live, next_start):
+        """Move the bar being built to the ring buffer and its close into the indicator states"""
+        start, open_price, high, low, close, volume = live.bar
+        live.bars.append(start, open_price, high, low, close, volume)
+        for indicator, parameters in self.parameters.items():
+            _, live.states[indicator] = advance_state(indicator, parameters, live.states[indicator], [close])
+        if next_start.date() > start.date():
+            live.previous_close = close
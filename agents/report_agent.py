@@ -1,6 +1,5 @@
 import logging
 import os
-import json
 from datetime import datetime
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
@@ -166,14 +165,14 @@ class ReportAgent:
         """Generate chart for Moving Averages"""
         try:
             # Prepare data
-            dates = [value['timestamp'] for value in values]
-            ma_values = [value['value'] for value in values]
+            dates = values.timestamps
+            ma_values = values.column('value')
             
             # Create figure
             plt.figure(figsize=(10, 6))
             
             # Plot moving average
-            plt.plot(dates, ma_values, label=f"{indicator} ({self._get_indicator_period(values[0])})")
+            plt.plot(dates, ma_values, label=f"{indicator} ({self._get_indicator_period(values)})")
             
             # Plot price if market data is available
             if market_data:
@@ -205,14 +204,14 @@ class ReportAgent:
         """Generate chart for RSI"""
         try:
             # Prepare data
-            dates = [value['timestamp'] for value in values]
-            rsi_values = [value['value'] for value in values]
+            dates = values.timestamps
+            rsi_values = values.column('value')
             
             # Create figure
             plt.figure(figsize=(10, 6))
             
             # Plot RSI
-            plt.plot(dates, rsi_values, label=f"RSI ({self._get_indicator_period(values[0])})")
+            plt.plot(dates, rsi_values, label=f"RSI ({self._get_indicator_period(values)})")
             
             # Add overbought/oversold lines
             plt.axhline(y=70, color='r', linestyle='--', alpha=0.3, label='Overbought (70)')
@@ -244,10 +243,10 @@ class ReportAgent:
         """Generate chart for MACD"""
         try:
             # Prepare data
-            dates = [value['timestamp'] for value in values]
-            macd_values = [value['value'] for value in values]
-            signal_values = [value['signal'] for value in values]
-            histogram_values = [value['histogram'] for value in values]
+            dates = values.timestamps
+            macd_values = values.column('value')
+            signal_values = values.column('signal')
+            histogram_values = values.column('histogram')
             
             # Create figure with two subplots
             fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8), gridspec_kw={'height_ratios': [3, 1]})
@@ -288,10 +287,10 @@ class ReportAgent:
         """Generate chart for Bollinger Bands"""
         try:
             # Prepare data
-            dates = [value['timestamp'] for value in values]
-            upper_values = [value['upper'] for value in values]
-            middle_values = [value['middle'] for value in values]
-            lower_values = [value['lower'] for value in values]
+            dates = values.timestamps
+            upper_values = values.column('upper')
+            middle_values = values.column('middle')
+            lower_values = values.column('lower')
             
             # Create figure
             plt.figure(figsize=(10, 6))
@@ -308,7 +307,7 @@ class ReportAgent:
                 plt.plot(price_dates, prices, 'b-', label='Close Price')
             
             # Formatting
-            params = json.loads(values[0]['parameters'])
+            params = values.parameters
             plt.title(f"Bollinger Bands for {symbol} (Period: {params.get('period', 20)}, StdDev: {params.get('std_dev', 2)})")
             plt.xlabel('Date')
             plt.ylabel('Value')
@@ -386,11 +385,10 @@ class ReportAgent:
         img_str = base64.b64encode(buf.read()).decode('utf-8')
         return f"data:image/png;base64,{img_str}"
     
-    def _get_indicator_period(self, indicator):
+    def _get_indicator_period(self, series):
         """Extract period from indicator parameters"""
         try:
-            params = json.loads(indicator['parameters'])
-            return params.get('period', 'N/A')
+            return series.parameters.get('period', 'N/A')
         except:
             return 'N/A'
     
@@ -410,14 +408,14 @@ class ReportAgent:
             
         try:
             # Get the most recent MA values
-            recent_values = values[-5:]
+            recent_values = values.column('value')[-5:]
             
             # Calculate the trend
             if len(recent_values) < 2:
                 return f"Recent {indicator} data is available for {symbol}."
                 
-            first_val = recent_values[0]['value']
-            last_val = recent_values[-1]['value']
+            first_val = recent_values[0]
+            last_val = recent_values[-1]
             
             if last_val > first_val:
                 percent_change = (last_val - first_val) / first_val * 100
@@ -1,7 +1,9 @@
 import os
 import logging
 from dotenv import load_dotenv
+import numpy as np
 from flask import Flask, render_template
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
@@ -16,11 +18,22 @@ logger = logging.getLogger(__name__)
 class Base(DeclarativeBase):
     pass
 
+# JSON provider that materializes columnar results only when they are serialized
+class JSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        if hasattr(o, 'to_records'):
+            return o.to_records()
+        if isinstance(o, np.generic):
+            return o.item()
+        return DefaultJSONProvider.default(o)
+
 # Initialize SQLAlchemy
 db = SQLAlchemy(model_class=Base)
 
 # Create Flask app
 app = Flask(__name__)
+app.json = JSONProvider(app)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 
 # Configure database
@@ -43,7 +56,14 @@ register_routes(app)
 # Create database tables within app context
 with app.app_context():
     import models
+    from utils.database import (ensure_columns, ensure_indexes, dedupe_sentiment_analyses,
+                                backfill_news_symbols, backfill_news_url_hashes)
     db.create_all()
+    ensure_columns()
+    dedupe_sentiment_analyses()
+    ensure_indexes()
+    backfill_news_symbols()
+    backfill_news_url_hashes()
     logger.info("Database tables created")
 
 @app.errorhandler(404)
@@ -0,0 +1,261 @@
+"""
+Benchmark utility for the Analysis Agent
+This script generates synthetic OHLCV data of configurable size and times every
+phase of the indicator pipeline separately against a fresh SQLite database:
+converting records to a DataFrame, calculating each indicator, serializing the
+series and persisting them. Results are written to a JSON file so runs can be
+diffed between releases.
+
+Example:
+    python benchmark_analysis.py --symbols 1,100,5000 --years 1,20 --output benchmark_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDICATORS = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
+TRADING_DAYS_PER_YEAR = 252
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the Analysis Agent on synthetic OHLCV data")
+    parser.add_argument('--symbols', default='1,100', help="Comma-separated symbol counts")
+    parser.add_argument('--years', default='1,5', help="Comma-separated history lengths in years")
+    parser.add_argument('--indicators', default=','.join(INDICATORS), help="Comma-separated indicators")
+    parser.add_argument('--persist-symbols', type=int, default=100,
+                        help="Symbols per configuration to persist (persisting is the slowest phase)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the traced peak memory measurements")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the synthetic data")
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'benchmark_analysis.db'),
+                        help="SQLite database file, recreated on every run")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file to write the results to")
+    return parser.parse_args()
+
+def generate_ohlcv(symbol, bars, seed):
+    """
+    Generate a reproducible random walk of daily OHLCV records
+    
+    Args:
+        symbol (str): Stock symbol
+        bars (int): Number of daily bars
+        seed (int): Random seed
+    
+    Returns:
+        list: Market data records in the format returned by DataAgent
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = pd.bdate_range(end='2024-12-31', periods=bars)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    open_ = close * np.exp(rng.normal(0, 0.005, bars))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, bars)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, bars)))
+    volume = rng.integers(100000, 10000000, bars)
+    
+    return [
+        {
+            'symbol': symbol,
+            'timestamp': timestamp,
+            'open': float(o),
+            'high': float(h),
+            'low': float(l),
+            'close': float(c),
+            'volume': int(v)
+        }
+        for timestamp, o, h, l, c, v in zip(timestamps.to_pydatetime(), open_, high, low, close, volume)
+    ]
+
+class QueryCounter:
+    """Counts the statements sent to the database"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+class PhaseStats:
+    """Accumulates the timings of one benchmark phase over many runs"""
+    
+    def __init__(self):
+        self.seconds = 0.0
+        self.bars = 0
+        self.queries = 0
+        self.peak_memory = None
+    
+    def to_dict(self):
+        return {
+            "seconds": round(self.seconds, 6),
+            "bars": self.bars,
+            "bars_per_second": round(self.bars / self.seconds, 1) if self.seconds else None,
+            "queries": self.queries,
+            "peak_memory_mb": None if self.peak_memory is None else round(self.peak_memory / 2 ** 20, 3)
+        }
+
+def measure(stats, bars, counter, trace, fn, *args):
+    """
+    Time one run of a phase and add it to its statistics
+    
+    Args:
+        stats (PhaseStats): Statistics of the phase
+        bars (int): Bars processed by the run
+        counter (QueryCounter): Database statement counter
+        trace (bool): Whether to repeat the run under tracemalloc to record its peak memory
+        fn (callable): Phase to run
+        *args: Arguments for fn
+    
+    Returns:
+        Result of fn
+    """
+    queries = counter.count
+    start = time.perf_counter()
+    result = fn(*args)
+    stats.seconds += time.perf_counter() - start
+    stats.bars += bars
+    stats.queries += counter.count - queries
+    
+    # Tracing slows allocations down, so memory is measured in a separate run
+    if trace:
+        tracemalloc.start()
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        stats.peak_memory = max(stats.peak_memory or 0, peak)
+    
+    return result
+
+def run_configuration(agent, counter, symbols, years, indicators, args):
+    """
+    Benchmark every phase for one data size
+    
+    Args:
+        agent (AnalysisAgent): Agent to benchmark
+        counter (QueryCounter): Database statement counter
+        symbols (int): Number of symbols
+        years (int): Years of daily history per symbol
+        indicators (list): Indicators to benchmark
+        args (Namespace): Command line arguments
+    
+    Returns:
+        dict: Configuration and per-phase statistics
+    """
+    bars = years * TRADING_DAYS_PER_YEAR
+    phases = {'convert': PhaseStats(), 'calculate_all': PhaseStats()}
+    for indicator in indicators:
+        for phase in ('calculate', 'serialize', 'persist'):
+            phases[f'{phase}_{indicator}'] = PhaseStats()
+    
+    close_prices = {}
+    for i in range(symbols):
+        symbol = f'SYM{i:05d}'
+        records = generate_ohlcv(symbol, bars, args.seed + i)
+        trace = not args.no_memory and i == 0
+        
+        df = measure(phases['convert'], bars, counter, trace, agent._convert_to_dataframe, records)
+        close_prices[symbol] = df['close']
+        
+        # All indicators as one plan, sharing intermediate results
+        measure(phases['calculate_all'], bars, counter, trace, agent._calculate, df, indicators, {}, symbol)
+        
+        for indicator in indicators:
+            series = measure(
+                phases[f'calculate_{indicator}'], bars, counter, trace, agent._calculate, df, [indicator], {}, symbol
+            )[indicator]
+            measure(phases[f'serialize_{indicator}'], bars, counter, trace, series.to_records)
+            if i < args.persist_symbols:
+                measure(phases[f'persist_{indicator}'], bars, counter, trace, agent._store_indicators, [series])
+    
+    # All symbols in one vectorized pass
+    if symbols > 1:
+        phases['calculate_panel'] = PhaseStats()
+        panel = pd.DataFrame(close_prices)
+        measure(
+            phases['calculate_panel'], bars * symbols, counter, not args.no_memory,
+            agent.calculate_panel, panel, indicators
+        )
+    
+    return {
+        "symbols": symbols,
+        "years": years,
+        "bars_per_symbol": bars,
+        "phases": {name: stats.to_dict() for name, stats in phases.items()}
+    }
+
+def run_benchmarks(args):
+    """
+    Run the benchmark for every configured data size and write the results
+    
+    Args:
+        args (Namespace): Command line arguments
+    
+    Returns:
+        dict: Benchmark report
+    """
+    # The application reads its database URL on import
+    if os.path.exists(args.database):
+        os.remove(args.database)
+    os.environ['DATABASE_URL'] = f'sqlite:///{args.database}'
+    
+    from sqlalchemy import event
+    from app import app, db
+    from agents.analysis_agent import AnalysisAgent
+    from utils.cache import LRUCache
+    
+    # Keep the agents' per-call logging out of the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+    
+    indicators = [indicator.strip().upper() for indicator in args.indicators.split(',') if indicator.strip()]
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__
+        },
+        "settings": {
+            "indicators": indicators,
+            "persist_symbols": args.persist_symbols,
+            "seed": args.seed,
+            "memory": not args.no_memory
+        },
+        "results": []
+    }
+    
+    with app.app_context():
+        counter = QueryCounter()
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        
+        # A cache that keeps nothing, so every run calculates
+        agent = AnalysisAgent(cache=LRUCache(max_size=0))
+        
+        for symbols in [int(value) for value in args.symbols.split(',')]:
+            for years in [int(value) for value in args.years.split(',')]:
+                logger.info(f"Benchmarking {symbols} symbols x {years} years")
+                result = run_configuration(agent, counter, symbols, years, indicators, args)
+                report["results"].append(result)
+                
+                # Write after every configuration, so long runs leave partial results
+                with open(args.output, 'w') as f:
+                    json.dump(report, f, indent=2)
+        
+        event.remove(db.engine, 'before_cursor_execute', counter)
+    
+    logger.info(f"Benchmark results written to {args.output}")
+    return report
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    run_benchmarks(parse_args())
@@ -6,7 +6,8 @@ This script clears all data from the database tables while preserving the table
 import os
 import logging
 from app import app, db
-from models import MarketData, TechnicalIndicator, NewsArticle, SentimentAnalysis, Report
+from models import (MarketData, MarketDataCoverage, IntradayBar, TechnicalIndicator, IndicatorState,
+                    IndicatorSnapshot, NewsArticle, NewsArticleSymbol, SentimentAnalysis, Report)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,15 +20,30 @@ def clean_database():
             logger.info("Deleting all sentiment analysis records...")
             SentimentAnalysis.query.delete()
             
+            logger.info("Deleting all news article symbol records...")
+            NewsArticleSymbol.query.delete()
+            
             logger.info("Deleting all news article records...")
             NewsArticle.query.delete()
             
             logger.info("Deleting all technical indicator records...")
             TechnicalIndicator.query.delete()
             
+            # States and snapshots would otherwise keep extending and screening the deleted series
+            logger.info("Deleting all indicator state and snapshot records...")
+            IndicatorState.query.delete()
+            IndicatorSnapshot.query.delete()
+            
             logger.info("Deleting all market data records...")
             MarketData.query.delete()
             
+            # Without their bars the fetched ranges have to be fetched again
+            logger.info("Deleting all market data coverage records...")
+            MarketDataCoverage.query.delete()
+            
+            logger.info("Deleting all intraday bar records...")
+            IntradayBar.query.delete()
+            
             logger.info("Deleting all report records...")
             Report.query.delete()
             
@@ -41,4 +57,4 @@ def clean_database():
             raise
 
 if __name__ == "__main__":
-    clean_database()
\ No newline at end of file
+    clean_database()
@@ -0,0 +1,75 @@
+"""
+Background ingestion worker for the Financial AI Platform
+This script keeps the prices, indicators and news of watched symbols warm
+outside the web process: configured symbols (WATCHED_SYMBOLS and --symbols)
+and symbols recently requested through the application are refreshed on a
+schedule, so requests are served from stored data.
+
+Example:
+    python ingest_worker.py --symbols AAPL,MSFT,GOOG
+    python ingest_worker.py --once
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+
+logger = logging.getLogger(__name__)
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Refresh upstream data of watched symbols on a schedule")
+    parser.add_argument('--symbols', default='', help="Comma-separated symbols to keep warm besides WATCHED_SYMBOLS")
+    parser.add_argument('--once', action='store_true', help="Run the due jobs once and exit")
+    parser.add_argument('--poll', type=float, default=None, help="Seconds between checks for due jobs")
+    return parser.parse_args()
+
+def run_worker(args):
+    """
+    Run the ingestion scheduler until interrupted
+    
+    Args:
+        args (Namespace): Command line arguments
+    
+    Returns:
+        int: Exit status, 1 if another process runs the scheduler
+    """
+    if args.poll is not None:
+        os.environ['INGEST_POLL_INTERVAL'] = str(args.poll)
+    
+    # The application reads its configuration on import
+    from app import app
+    from orchestrator import Orchestrator
+    
+    orchestrator = Orchestrator()
+    # One scheduler per host, a web process started with INGESTION_SCHEDULER=1 may run it already
+    if not args.once and not orchestrator.scheduler_lock.acquire():
+        logger.error(f"An ingestion scheduler is already running, see {orchestrator.scheduler_lock.path}")
+        return 1
+    
+    orchestrator.watched_symbols += [
+        symbol.strip().upper() for symbol in args.symbols.split(',') if symbol.strip()
+    ]
+    scheduler = orchestrator.build_scheduler(app)
+    
+    if args.once:
+        start = time.perf_counter()
+        with app.app_context():
+            calls = scheduler.run_pending()
+        logger.info(f"Ran {calls} ingestion jobs in {time.perf_counter() - start:.1f}s: {scheduler.stats()}")
+        return 0
+    
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    logger.info(f"Ingestion worker stopped: {scheduler.stats()}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    sys.exit(run_worker(parse_args()))
@@ -1,4 +1,12 @@
+import os
 from app import app
+from routes import start_background_jobs
 
 if __name__ == "__main__":
+    # The debug reloader serves requests from a child process, the jobs run there
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_jobs(app)
     app.run(host="0.0.0.0", port=5000, debug=True)
+else:
+    # Served by a WSGI server, e.g. gunicorn main:app; with several workers one of them gets the jobs
+    start_background_jobs(app)
@@ -1,8 +1,15 @@
+import hashlib
 from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit
 from app import db
 
 class MarketData(db.Model):
     """Model for storing market price data"""
+    __table_args__ = (
+        # One bar per symbol and timestamp; target of the bulk upsert in DataAgent
+        db.Index('uq_market_data_bar', 'symbol', 'timestamp', unique=True),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(10), nullable=False, index=True)
     timestamp = db.Column(db.DateTime, nullable=False, index=True)
@@ -28,21 +35,79 @@ class MarketData(db.Model):
             "volume": self.volume
         }
 
+class IntradayBar(db.Model):
+    """Model for storing one minute price bars, the base of the intraday timeframes"""
+    __table_args__ = (
+        # One bar per symbol and minute; target of the bulk upsert in DataAgent
+        db.Index('uq_intraday_bar', 'symbol', 'timestamp', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(10), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)  # Bar start, exchange wall-clock time
+    open_price = db.Column(db.Float)
+    high_price = db.Column(db.Float)
+    low_price = db.Column(db.Float)
+    close_price = db.Column(db.Float)
+    volume = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<IntradayBar {self.symbol} @ {self.timestamp}>"
+
+class MarketDataCoverage(db.Model):
+    """Model for storing the date ranges of a symbol already requested from the market data sources"""
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(10), nullable=False, index=True)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)  # Inclusive
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.now)  # Local time end_date was last fetched
+    
+    def __repr__(self):
+        return f"<MarketDataCoverage {self.symbol} {self.start_date} - {self.end_date}>"
+
+class WatchedSymbol(db.Model):
+    """Model for storing when a symbol was last requested, so the ingestion scheduler keeps it warm"""
+    __table_args__ = (
+        db.Index('uq_watched_symbol', 'symbol', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(10), nullable=False)
+    last_requested_at = db.Column(db.DateTime, nullable=False, index=True)  # Local time
+    
+    def __repr__(self):
+        return f"<WatchedSymbol {self.symbol} @ {self.last_requested_at}>"
+
 class TechnicalIndicator(db.Model):
     """Model for storing calculated technical indicators"""
+    __table_args__ = (
+        # One row per data point; target of the bulk upsert in AnalysisAgent
+        db.Index('uq_technical_indicator_point', 'symbol', 'timestamp', 'indicator_type', 'parameters', unique=True),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(10), nullable=False, index=True)
     timestamp = db.Column(db.DateTime, nullable=False, index=True)
     indicator_type = db.Column(db.String(20), nullable=False, index=True)  # e.g., RSI, MACD, SMA
     value = db.Column(db.Float)
+    # Further outputs of multi-output indicators, NULL for the others
+    signal = db.Column(db.Float)  # MACD
+    histogram = db.Column(db.Float)  # MACD
+    upper = db.Column(db.Float)  # BBANDS
+    middle = db.Column(db.Float)  # BBANDS
+    lower = db.Column(db.Float)  # BBANDS
     parameters = db.Column(db.String(100))  # JSON string with params like period, etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Columns holding indicator output fields
+    output_fields = ('value', 'signal', 'histogram', 'upper', 'middle', 'lower')
+    
     def __repr__(self):
         return f"<TechnicalIndicator {self.indicator_type} for {self.symbol} @ {self.timestamp}>"
     
     def to_dict(self):
-        return {
+        data = {
             "id": self.id,
             "symbol": self.symbol,
             "timestamp": self.timestamp.isoformat(),
@@ -50,23 +115,152 @@ class TechnicalIndicator(db.Model):
             "value": self.value,
             "parameters": self.parameters
         }
+        for field in self.output_fields[1:]:
+            if getattr(self, field) is not None:
+                data[field] = getattr(self, field)
+        return data
+
+class IndicatorSnapshot(db.Model):
+    """Model for storing the latest point of every indicator series, for screening and dashboards"""
+    __table_args__ = (
+        db.Index('uq_indicator_snapshot_key', 'symbol', 'indicator_type', 'parameters', unique=True),
+        # Range filters such as "RSI(14) below 30" are served from this index
+        db.Index('ix_indicator_snapshot_value', 'indicator_type', 'parameters', 'value'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(10), nullable=False)
+    indicator_type = db.Column(db.String(20), nullable=False)
+    parameters = db.Column(db.String(100), nullable=False)  # JSON string, same format as TechnicalIndicator
+    timestamp = db.Column(db.DateTime, nullable=False)  # Timestamp of the latest point
+    close = db.Column(db.Float)  # Close price at that timestamp
+    value = db.Column(db.Float)
+    signal = db.Column(db.Float)
+    histogram = db.Column(db.Float)
+    upper = db.Column(db.Float)
+    middle = db.Column(db.Float)
+    lower = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<IndicatorSnapshot {self.indicator_type} for {self.symbol} @ {self.timestamp}>"
+    
+    def to_dict(self):
+        data = {
+            "symbol": self.symbol,
+            "indicator_type": self.indicator_type,
+            "parameters": self.parameters,
+            "timestamp": self.timestamp.isoformat(),
+            "close": self.close
+        }
+        for field in TechnicalIndicator.output_fields:
+            if getattr(self, field) is not None:
+                data[field] = getattr(self, field)
+        return data
+
+class IndicatorState(db.Model):
+    """Model for storing the running state of an indicator series so it can be extended bar by bar"""
+    __table_args__ = (
+        db.Index('uq_indicator_state_key', 'symbol', 'indicator_type', 'parameters', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(10), nullable=False)
+    indicator_type = db.Column(db.String(20), nullable=False)
+    parameters = db.Column(db.String(100), nullable=False)  # JSON string, same format as TechnicalIndicator
+    last_timestamp = db.Column(db.DateTime, nullable=False)  # Last bar included in the state
+    state = db.Column(db.Text, nullable=False)  # JSON string, see agents/indicator_state.py
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<IndicatorState {self.indicator_type} for {self.symbol} @ {self.last_timestamp}>"
 
 class NewsArticle(db.Model):
     """Model for storing financial news articles"""
+    __table_args__ = (
+        # One row per article; target of the bulk upsert in DataAgent
+        db.Index('uq_news_article_url_hash', 'url_hash', unique=True),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     source = db.Column(db.String(100))
     url = db.Column(db.String(512))
     published_at = db.Column(db.DateTime, index=True)
     content = db.Column(db.Text)
-    symbols = db.Column(db.String(100))  # Related symbols as comma-separated values
+    symbols = db.Column(db.String(100))  # Related symbols as comma-separated values, for display
+    url_hash = db.Column(db.String(64))  # See compute_url_hash
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @staticmethod
+    def compute_url_hash(url, source=None, title=None, content=None):
+        """
+        Compute the deduplication key of an article
+        
+        Articles with a URL are identified by the normalized URL (lower-case
+        scheme and host, no fragment or trailing slash), so the same story
+        fetched for several symbols is stored once. Articles without one are
+        identified by their source, title and content.
+        
+        Returns:
+            str: Hex SHA-256 digest
+        """
+        url = (url or '').strip()
+        if url:
+            parts = urlsplit(url)
+            identity = urlunsplit((
+                parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''
+            ))
+        else:
+            identity = '\n'.join(value or '' for value in (source, title, content))
+        return hashlib.sha256(identity.encode()).hexdigest()
+    
     def __repr__(self):
         return f"<NewsArticle {self.title[:30]}... @ {self.published_at}>"
 
+class NewsArticleSymbol(db.Model):
+    """Model associating news articles with the symbols they relate to"""
+    __table_args__ = (
+        db.Index('uq_news_article_symbol', 'article_id', 'symbol', unique=True),
+        # Per-symbol news lookups are range scans of this index
+        db.Index('ix_news_article_symbol_published', 'symbol', 'published_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('news_article.id', ondelete='CASCADE'), nullable=False)
+    symbol = db.Column(db.String(10), nullable=False)
+    published_at = db.Column(db.DateTime)  # Copy of the article's publication time for the index
+    
+    # Relationship
+    article = db.relationship(
+        'NewsArticle',
+        backref=db.backref('symbol_links', lazy=True, cascade='all, delete-orphan')
+    )
+    
+    def __repr__(self):
+        return f"<NewsArticleSymbol {self.symbol} for news {self.article_id}>"
+
+def split_symbols(symbols):
+    """
+    Split a comma-separated symbols value
+    
+    Args:
+        symbols (str): Comma-separated symbols, e.g. "AAPL, MSFT"
+    
+    Returns:
+        list: Upper-case symbols without duplicates, in order
+    """
+    if not symbols:
+        return []
+    return list(dict.fromkeys(symbol.strip().upper() for symbol in symbols.split(',') if symbol.strip()))
+
 class SentimentAnalysis(db.Model):
     """Model for storing sentiment analysis results"""
+    __table_args__ = (
+        # One score per article; target of the bulk insert in NLPAgent
+        db.Index('uq_sentiment_analysis_news', 'news_id', unique=True),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     news_id = db.Column(db.Integer, db.ForeignKey('news_article.id'), nullable=False)
     sentiment_score = db.Column(db.Float)  # Range: -1.0 (negative) to 1.0 (positive)
@@ -1,15 +1,38 @@
+import os
 import logging
+import threading
 from datetime import datetime, timedelta
-import json
-from app import db
+import numpy as np
+from app import app, db
 from agents.data_agent import DataAgent
-from agents.analysis_agent import AnalysisAgent
+from agents.analysis_agent import AnalysisAgent, check_sweep_grid
+from agents.backtest_agent import BacktestAgent
 from agents.nlp_agent import NLPAgent
+from agents.quote_agent import QuoteAgent
 from agents.report_agent import ReportAgent
-from models import MarketData, TechnicalIndicator, NewsArticle, SentimentAnalysis, Report
+from models import Report, WatchedSymbol
+from utils.database import bulk_upsert
+from utils.ohlcv import frame_to_records
+from utils.process_lock import ProcessLock
+from utils.quotes import source_from_url
+from utils.resample import BASE_TIMEFRAME
+from utils.scheduler import IngestionScheduler, PRIORITY_OBSERVED, PRIORITY_WATCHED
 
 logger = logging.getLogger(__name__)
 
+def background_lock(name):
+    """
+    Get the lock a background job takes, so it runs in one process of the host
+    
+    Args:
+        name (str): Job name, e.g. "ingestion-scheduler"
+    
+    Returns:
+        ProcessLock: Lock file in BACKGROUND_LOCK_DIR, by default the instance folder's locks directory
+    """
+    directory = os.environ.get("BACKGROUND_LOCK_DIR") or os.path.join(app.instance_path, 'locks')
+    return ProcessLock(os.path.join(directory, f"{name}.lock"))
+
 class Orchestrator:
     """
     Orchestrates the workflow between different agents to perform financial analysis tasks.
@@ -22,6 +45,23 @@ class Orchestrator:
         self.analysis_agent = AnalysisAgent()
         self.nlp_agent = NLPAgent()
         self.report_agent = ReportAgent()
+        self.backtest_agent = BacktestAgent(self.analysis_agent)
+        self.quote_agent = QuoteAgent(
+            timeframe=os.environ.get("LIVE_QUOTES_TIMEFRAME", BASE_TIMEFRAME),
+            capacity=int(os.environ.get("LIVE_QUOTES_CAPACITY", 500)),
+            history=self._live_history
+        )
+        self.scheduler = None
+        self.scheduler_lock = background_lock('ingestion-scheduler')
+        self.live_quotes_lock = background_lock('live-quotes')
+        # Symbols the ingestion scheduler always keeps warm
+        self.watched_symbols = [
+            symbol.strip().upper() for symbol in os.environ.get("WATCHED_SYMBOLS", "").split(',') if symbol.strip()
+        ]
+        # Hours a requested symbol stays on the ingestion scheduler's list
+        self.observe_hours = float(os.environ.get("INGEST_OBSERVE_HOURS", 24))
+        self._observed = {}
+        self._observed_lock = threading.Lock()
         logger.info("Orchestrator initialized with all agents")
     
     def run_technical_analysis(self, symbol, start_date=None, end_date=None, indicators=None):
@@ -53,15 +93,20 @@ class Orchestrator:
         if not indicators:
             indicators = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
         
+        self.observe_symbols([symbol])
+        
         # Step 1: Fetch market data using the data agent
-        market_data = self.data_agent.fetch_historical_data(symbol, start_date, end_date)
+        market_data = self.data_agent.fetch_historical_data(symbol, start_date, end_date, as_frame=True)
         
         # Step 2: Calculate technical indicators using the analysis agent
-        analysis_results = self.analysis_agent.calculate_indicators(market_data, indicators)
+        analysis_results = self.analysis_agent.calculate_indicators(market_data, indicators, persist=False)
+        
+        # Step 3: Extend the stored indicator series with the bars not processed yet
+        self.analysis_agent.update_indicators(symbol, market_data, indicators)
         
         # Return combined results
         return {
-            'market_data': market_data,
+            'market_data': frame_to_records(market_data),
             'analysis_results': analysis_results,
             'symbol': symbol,
             'start_date': start_date,
@@ -82,6 +127,8 @@ class Orchestrator:
         """
         logger.info(f"Running sentiment analysis for {symbol} over past {days} days")
         
+        self.observe_symbols([symbol])
+        
         # Step 1: Fetch news data using the data agent
         news_articles = self.data_agent.fetch_news(symbol, days)
         
@@ -118,23 +165,32 @@ class Orchestrator:
             'sections': []
         }
         
-        # Fetch data for all symbols
+        indicators = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
+        self.observe_symbols(symbols)
+        
+        # Fetch market data for all symbols with batched downloads
+        market_data = self.data_agent.fetch_historical_data_batch(
+            symbols,
+            datetime.now() - timedelta(days=30),
+            datetime.now(),
+            as_frame=True
+        )
+        
+        # Calculate technical indicators for all symbols in one pass
+        if report_type in ['technical', 'comprehensive']:
+            close_prices = self.analysis_agent.build_close_panel(market_data)
+            panel = self.analysis_agent.calculate_panel(close_prices, indicators)
+        
         for symbol in symbols:
-            # Get market data
-            market_data = self.data_agent.fetch_historical_data(
-                symbol, 
-                datetime.now() - timedelta(days=30), 
-                datetime.now()
-            )
-            
             # Get technical analysis
             if report_type in ['technical', 'comprehensive']:
-                indicators = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
-                analysis = self.analysis_agent.calculate_indicators(market_data, indicators)
+                # Series of the panel are reused when the symbol's bars span the whole panel
+                calculated = panel.get(symbol) if market_data[symbol].index.equals(close_prices.index) else None
+                self.analysis_agent.update_indicators(symbol, market_data[symbol], indicators, calculated=calculated)
                 report_data['sections'].append({
                     'type': 'technical_analysis',
                     'symbol': symbol,
-                    'data': analysis
+                    'data': panel.get(symbol, {indicator: [] for indicator in indicators})
                 })
             
             # Get sentiment analysis
@@ -162,71 +218,384 @@ class Orchestrator:
         
         return report.id
     
-    def get_market_data(self, symbol, days=30):
+    def get_market_data(self, symbol, days=30, as_frame=False):
         """
         Get market data for the specified symbol
         
+        Stored bars are reused; only date ranges not fetched before are
+        requested from the data sources.
+        
         Args:
             symbol (str): Stock symbol
             days (int): Number of days of data to retrieve
-            
+            as_frame (bool): Return the normalized OHLCV frame instead of records
+        
         Returns:
-            list: Market data records
+            list or DataFrame: Market data records, or the OHLCV frame
         """
+        self.observe_symbols([symbol])
+        
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        # Check if we have the data cached
-        data = MarketData.query.filter(
-            MarketData.symbol == symbol,
-            MarketData.timestamp >= start_date,
-            MarketData.timestamp <= end_date
-        ).order_by(MarketData.timestamp).all()
-        
-        # If we don't have enough data, fetch it
-        if len(data) < days/2:  # If we have less than half the data needed
-            logger.info(f"Insufficient cached data for {symbol}, fetching from source")
-            data = self.data_agent.fetch_historical_data(symbol, start_date, end_date)
-        else:
-            data = [d.to_dict() for d in data]
-            
-        return data
+        return self.data_agent.fetch_historical_data(symbol, start_date, end_date, as_frame)
     
-    def get_indicator_data(self, symbol, indicator, days=30, params=None):
+    def get_intraday_data(self, symbol, timeframe='5m', days=1, as_frame=False):
+        """
+        Get intraday market data for the specified symbol
+        
+        Args:
+            symbol (str): Stock symbol
+            timeframe (str): Bar size, one of 1m, 5m, 15m, 1h and 1d
+            days (int): Number of days of data to retrieve, counting today
+            as_frame (bool): Return the normalized OHLCV frame instead of records
+        
+        Returns:
+            list or DataFrame: Market data records, or the OHLCV frame
+        """
+        self.observe_symbols([symbol])
+        
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=max(days - 1, 0))
+        
+        return self.data_agent.fetch_intraday_data(symbol, start_date, end_date, timeframe, as_frame)
+    
+    def get_indicator_data(self, symbol, indicator, days=30, params=None, timeframe=None):
         """
         Get technical indicator data for the specified symbol
         
+        The stored series is extended with the bars not processed yet and then
+        read back from the database with all of its output fields, so up to
+        date indicators are served without recalculation. Intraday timeframes
+        are calculated from the stored one minute bars instead.
+        
         Args:
             symbol (str): Stock symbol
             indicator (str): Indicator name
             days (int): Number of days of data
             params (str): Indicator parameters as JSON string
-            
+            timeframe (str, optional): Intraday bar size, e.g. 5m or 1h; daily bars if not given
+        
         Returns:
-            list: Indicator data records
+            IndicatorSeries: Indicator series, or an empty list if it couldn't be calculated
         """
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        if timeframe is not None:
+            base = self.get_intraday_data(symbol, BASE_TIMEFRAME, days, as_frame=True)
+            data = self.analysis_agent.calculate_indicators(base, [indicator], params, timeframe=timeframe)
+            return data.get(indicator.upper(), [])
         
-        # Check if we have the indicator data cached
-        data = TechnicalIndicator.query.filter(
-            TechnicalIndicator.symbol == symbol,
-            TechnicalIndicator.indicator_type == indicator,
-            TechnicalIndicator.timestamp >= start_date,
-            TechnicalIndicator.timestamp <= end_date
-        ).order_by(TechnicalIndicator.timestamp).all()
-        
-        # If we don't have enough data, calculate it
-        if len(data) < days/2:  # If we have less than half the data needed
-            logger.info(f"Insufficient cached indicator data for {symbol}, calculating")
-            
-            # Get market data first
-            market_data = self.get_market_data(symbol, days)
-            
-            # Calculate the indicator
+        start_date = datetime.now() - timedelta(days=days)
+        
+        market_data = self.get_market_data(symbol, days, as_frame=True)
+        
+        # Extend the stored series with new bars
+        self.analysis_agent.update_indicators(symbol, market_data, [indicator], params)
+        data = self.analysis_agent.load_indicators(symbol, indicator, params, start_date)
+        
+        # Rows stored before all output fields were persisted lack some of them; recalculate those once
+        if not data or any(np.isnan(values).any() for values in data.fields.values()):
+            logger.info(f"Incomplete stored {indicator} data for {symbol}, calculating")
             data = self.analysis_agent.calculate_indicators(market_data, [indicator], params)
-            data = data.get(indicator, [])
-        else:
-            data = [d.to_dict() for d in data]
-            
+            data = data.get(indicator.upper(), [])
+        
         return data
+    
+    def run_backtest(self, strategy, symbols=None, start_date=None, end_date=None, params=None,
+                     allow_short=False, cost_bps=0.0):
+        """
+        Backtest a trading rule over stored market data of many symbols at once
+        
+        Args:
+            strategy (str): Strategy name, e.g. rsi_reversion or macd_crossover
+            symbols (list, optional): Stock symbols, defaults to every stored symbol
+            start_date (str, optional): Start date in YYYY-MM-DD format
+            end_date (str, optional): End date in YYYY-MM-DD format
+            params (dict): Indicator parameters and strategy thresholds
+            allow_short (bool): Whether exit signals open short positions
+            cost_bps (float): Trading cost per unit of turnover, in basis points
+        
+        Returns:
+            dict: Backtest statistics
+        """
+        logger.info(f"Running {strategy} backtest for {symbols or 'all symbols'}")
+        
+        if start_date:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d')
+        if end_date:
+            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+        
+        close_prices = self.backtest_agent.load_close_prices(symbols, start_date, end_date)
+        
+        return self.backtest_agent.run_backtest(close_prices, strategy, params, allow_short, cost_bps)
+    
+    def screen(self, conditions, params=None, days=None):
+        """
+        Screen all symbols by their latest indicator values
+        
+        Args:
+            conditions (list): Conditions as accepted by AnalysisAgent.screen
+            params (str): Default indicator parameters as JSON string
+            days (int, optional): Only consider indicator values from the last days
+        
+        Returns:
+            list: Matching symbols with their latest indicator values
+        """
+        since = datetime.now() - timedelta(days=days) if days else None
+        return self.analysis_agent.screen(conditions, params, since)
+    
+    def get_cache_stats(self):
+        """
+        Get the hit/miss counters of the indicator cache
+        
+        Returns:
+            dict: Cache statistics, with the counters of the timeframe views
+        """
+        return dict(self.analysis_agent.cache.stats(), resampled_views=self.analysis_agent.views.stats())
+    
+    def get_upstream_stats(self):
+        """
+        Get the request metrics of the upstream data API client and its response cache
+        
+        Returns:
+            dict: Request counters, rate limit queue wait and latency per provider,
+                and the response cache size and hit counters
+        """
+        return {
+            "providers": self.data_agent.client.stats(),
+            "response_cache": self.data_agent.response_cache.stats()
+        }
+    
+    def get_indicator_sweep(self, symbol, indicator, grid, days=365):
+        """
+        Calculate an indicator over a grid of parameters for the specified symbol
+        
+        Args:
+            symbol (str): Stock symbol
+            indicator (str): Indicator name
+            grid (dict): Parameter name to list of values, e.g. {"period": [5, 10, 20]}
+            days (int): Number of days of market data to use
+        
+        Returns:
+            list: IndicatorSeries, one per parameter combination
+        """
+        logger.info(f"Sweeping {indicator} parameters for {symbol}")
+        
+        # Reject oversized grids before fetching anything
+        check_sweep_grid(grid)
+        
+        market_data = self.get_market_data(symbol, days, as_frame=True)
+        
+        return self.analysis_agent.sweep_indicator(market_data, indicator, grid)
+    
+    def refresh_indicators(self, symbols, days=30, indicators=None):
+        """
+        Bring the stored indicator series of several symbols up to date
+        
+        Intended for scheduled (e.g. nightly) refreshes: only bars that arrived
+        since the last refresh are calculated and stored.
+        
+        Args:
+            symbols (list): Stock symbols to refresh
+            days (int): Days of market data to fetch for each symbol
+            indicators (list, optional): List of indicators to update
+        
+        Returns:
+            dict: Number of appended points per symbol and indicator
+        """
+        logger.info(f"Refreshing indicators for {len(symbols)} symbols")
+        
+        summary = {}
+        for symbol in symbols:
+            try:
+                market_data = self.get_market_data(symbol, days, as_frame=True)
+                updated = self.analysis_agent.update_indicators(symbol, market_data, indicators)
+                summary[symbol] = {indicator: len(series) for indicator, series in updated.items()}
+            except Exception as e:
+                logger.error(f"Error refreshing indicators for {symbol}: {str(e)}")
+                summary[symbol] = {}
+        
+        return summary
+    
+    def observe_symbols(self, symbols):
+        """
+        Record requests for symbols, so the ingestion scheduler keeps their data warm
+        
+        A symbol's request time is written at most once a minute per process.
+        
+        Args:
+            symbols (list): Requested stock symbols
+        """
+        now = datetime.now()
+        with self._observed_lock:
+            symbols = [
+                symbol for symbol in dict.fromkeys(symbol.upper() for symbol in symbols)
+                if symbol not in self._observed or (now - self._observed[symbol]).total_seconds() >= 60
+            ]
+            for symbol in symbols:
+                self._observed[symbol] = now
+        
+        if not symbols:
+            return
+        
+        try:
+            bulk_upsert(
+                WatchedSymbol,
+                [{"symbol": symbol, "last_requested_at": now} for symbol in symbols],
+                index_elements=['symbol'],
+                update_columns=['last_requested_at']
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recording symbol requests: {str(e)}")
+    
+    def get_ingestion_symbols(self):
+        """
+        Get the symbols the ingestion scheduler keeps warm
+        
+        Returns:
+            dict: Symbol to job priority; recently requested symbols come first,
+                by how recently, then the configured WATCHED_SYMBOLS
+        """
+        now = datetime.now()
+        window = self.observe_hours * 3600
+        priorities = {symbol: PRIORITY_WATCHED for symbol in self.watched_symbols}
+        
+        requested = db.session.query(WatchedSymbol.symbol, WatchedSymbol.last_requested_at).filter(
+            WatchedSymbol.last_requested_at >= now - timedelta(seconds=window)
+        ).all()
+        for symbol, last_requested_at in requested:
+            age = max((now - last_requested_at).total_seconds(), 0) / window
+            priorities[symbol] = min(priorities.get(symbol, PRIORITY_WATCHED), PRIORITY_OBSERVED + age)
+        
+        return priorities
+    
+    def build_scheduler(self, app=None):
+        """
+        Create an ingestion scheduler refreshing prices, indicators and news of the watched symbols
+        
+        Args:
+            app (Flask, optional): Application whose context the jobs run in
+        
+        Returns:
+            IngestionScheduler: Scheduler with the price and news jobs registered
+        """
+        price_days = int(os.environ.get("INGEST_PRICE_DAYS", 365))
+        news_days = int(os.environ.get("INGEST_NEWS_DAYS", 7))
+        
+        def ingest_prices(symbols):
+            end_date = datetime.now()
+            market_data = self.data_agent.fetch_historical_data_batch(
+                symbols, end_date - timedelta(days=price_days), end_date, as_frame=True
+            )
+            for symbol, frame in market_data.items():
+                self.analysis_agent.update_indicators(symbol, frame)
+        
+        def ingest_news(symbols):
+            for symbol in symbols:
+                self.data_agent.refresh_news(symbol, news_days)
+        
+        scheduler = IngestionScheduler(
+            self.get_ingestion_symbols,
+            app=app,
+            poll_interval=float(os.environ.get("INGEST_POLL_INTERVAL", 1))
+        )
+        # Prices are refreshed once the current day's bars go stale, in multi-ticker batches
+        scheduler.register(
+            'prices', ingest_prices,
+            interval=self.data_agent.live_data_ttl,
+            batch_size=self.data_agent.BATCH_SIZE
+        )
+        # News keeps part of the Alpha Vantage quota free for requests
+        scheduler.register(
+            'news', ingest_news,
+            interval=float(os.environ.get("INGEST_NEWS_INTERVAL", 1800)),
+            requests_per_minute=float(os.environ.get("INGEST_NEWS_PER_MINUTE", 2))
+        )
+        return scheduler
+    
+    def start_scheduler(self, app=None):
+        """
+        Start the ingestion scheduler in a background thread of this process
+        
+        One process of the host runs the scheduler: it starts only if this
+        process gets the scheduler lock, which ingest_worker.py takes as well.
+        
+        Args:
+            app (Flask, optional): Application whose context the jobs run in
+        
+        Returns:
+            bool: Whether the scheduler runs in this process
+        """
+        if not self.scheduler_lock.acquire():
+            logger.info(f"Ingestion scheduler already runs in another process, see {self.scheduler_lock.path}")
+            return False
+        
+        if self.scheduler is None:
+            self.scheduler = self.build_scheduler(app)
+        self.scheduler.start()
+        return True
+    
+    def start_live_quotes(self, app=None, source=None):
+        """
+        Start consuming live quotes in a background thread of this process
+        
+        One process of the host consumes the feed: it starts only if this
+        process gets the live quotes lock, so a feed accepting one connection
+        isn't contended for by several server workers.
+        
+        Args:
+            app (Flask, optional): Application whose context the history is loaded in
+            source (iterable, optional): Tick source, defaults to the one configured by LIVE_QUOTES_SOURCE
+        
+        Returns:
+            bool: Whether the quotes are consumed in this process
+        """
+        if not self.live_quotes_lock.acquire():
+            logger.info(f"Live quotes already consumed by another process, see {self.live_quotes_lock.path}")
+            return False
+        
+        if source is None:
+            speed = os.environ.get("LIVE_QUOTES_REPLAY_SPEED")
+            source = source_from_url(os.environ["LIVE_QUOTES_SOURCE"], float(speed) if speed else None)
+        self.quote_agent.start(source, app)
+        return True
+    
+    def get_live_quote(self, symbol):
+        """
+        Get the live price, bar and indicator values of a symbol from memory
+        
+        Args:
+            symbol (str): Stock symbol
+        
+        Returns:
+            dict: Live values, or None if no quote of the symbol arrived
+        """
+        return self.quote_agent.latest(symbol)
+    
+    def get_live_stats(self):
+        """
+        Get the counters of the live quote consumer
+        
+        Returns:
+            dict: Live quote statistics with the symbols receiving quotes
+        """
+        return dict(self.quote_agent.stats(), symbols=self.quote_agent.symbols())
+    
+    def _live_history(self, symbol, start):
+        """Load the stored bars a live symbol's indicators are seeded from"""
+        days = float(os.environ.get("LIVE_QUOTES_HISTORY_DAYS", 5))
+        return self.data_agent.load_intraday_data(
+            symbol, start - timedelta(days=days), start - timedelta(microseconds=1), self.quote_agent.timeframe
+        )
+    
+    def get_ingestion_stats(self):
+        """
+        Get the counters of the in-process ingestion scheduler
+        
+        Returns:
+            dict: Scheduler statistics, or only running=False if it wasn't started
+        """
+        if self.scheduler is None:
+            return {"running": False}
+        return self.scheduler.stats()
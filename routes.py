@@ -2,6 +2,10 @@ from flask import render_template, request, jsonify, redirect, url_for, flash
 from app import db
 from models import MarketData, TechnicalIndicator, NewsArticle, SentimentAnalysis, Report
 from orchestrator import Orchestrator
+from agents.indicators import INDICATORS
+from agents.analysis_agent import SWEEP_MAX_VALUES
+import os
+import math
 import logging
 
 logger = logging.getLogger(__name__)
@@ -98,12 +102,16 @@ def register_routes(app):
     
     @app.route('/api/market_data/<symbol>')
     def api_market_data(symbol):
-        """API endpoint for market data"""
+        """API endpoint for market data, daily or at the intraday timeframe argument"""
         symbol = symbol.upper()
-        days = request.args.get('days', 30, type=int)
+        timeframe = request.args.get('timeframe')
+        days = request.args.get('days', 1 if timeframe else 30, type=int)
         
         try:
-            data = orchestrator.get_market_data(symbol, days)
+            if timeframe:
+                data = orchestrator.get_intraday_data(symbol, timeframe, days)
+            else:
+                data = orchestrator.get_market_data(symbol, days)
             return jsonify({"success": True, "data": data})
         except Exception as e:
             logger.error(f"Market data API error: {str(e)}")
@@ -113,12 +121,185 @@ def register_routes(app):
     def api_indicator(symbol, indicator):
         """API endpoint for technical indicators"""
         symbol = symbol.upper()
-        days = request.args.get('days', 30, type=int)
+        timeframe = request.args.get('timeframe')
+        days = request.args.get('days', 5 if timeframe else 30, type=int)
         params = request.args.get('params', '')
         
         try:
-            data = orchestrator.get_indicator_data(symbol, indicator, days, params)
+            data = orchestrator.get_indicator_data(symbol, indicator, days, params, timeframe)
             return jsonify({"success": True, "data": data})
         except Exception as e:
             logger.error(f"Indicator API error: {str(e)}")
             return jsonify({"success": False, "error": str(e)})
+    
+    @app.route('/api/backtest')
+    def api_backtest():
+        """API endpoint for backtesting a trading rule over many symbols"""
+        strategy = request.args.get('strategy', 'rsi_reversion')
+        symbols = [symbol.strip().upper() for symbol in request.args.get('symbols', '').split(',') if symbol.strip()]
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        params = request.args.get('params', '')
+        allow_short = request.args.get('allow_short', 'false').lower() in ('1', 'true', 'yes')
+        cost_bps = request.args.get('cost_bps', 0.0, type=float)
+        
+        try:
+            data = orchestrator.run_backtest(
+                strategy, symbols, start_date, end_date, params, allow_short, cost_bps
+            )
+            return jsonify({"success": True, "data": data})
+        except Exception as e:
+            logger.error(f"Backtest API error: {str(e)}")
+            return jsonify({"success": False, "error": str(e)})
+    
+    @app.route('/api/screen')
+    def api_screen():
+        """
+        API endpoint for screening symbols by their latest indicator values
+        
+        Filters are query arguments such as rsi_lt=30 (RSI below 30),
+        macd_histogram_gt=0 (a field other than value) or close_gt_sma=20
+        (close above the 20-period SMA). Indicator parameters not given in a
+        filter come from the params JSON argument or the defaults.
+        """
+        params = request.args.get('params', '')
+        days = request.args.get('days', None, type=int)
+        
+        try:
+            conditions = [
+                _parse_screen_filter(name, value)
+                for name, value in request.args.items()
+                if name not in ('params', 'days')
+            ]
+            data = orchestrator.screen(conditions, params, days)
+            return jsonify({"success": True, "data": data})
+        except Exception as e:
+            logger.error(f"Screen API error: {str(e)}")
+            return jsonify({"success": False, "error": str(e)})
+    
+    @app.route('/api/indicators/cache')
+    def api_indicator_cache():
+        """API endpoint for the indicator cache statistics"""
+        return jsonify({"success": True, "data": orchestrator.get_cache_stats()})
+    
+    @app.route('/api/ingestion/stats')
+    def api_ingestion_stats():
+        """API endpoint for the in-process ingestion scheduler counters"""
+        return jsonify({"success": True, "data": orchestrator.get_ingestion_stats()})
+    
+    @app.route('/api/live/stats')
+    def api_live_stats():
+        """API endpoint for the live quote consumer counters"""
+        return jsonify({"success": True, "data": orchestrator.get_live_stats()})
+    
+    @app.route('/api/live/<symbol>')
+    def api_live_quote(symbol):
+        """API endpoint for the live price and indicator values of a symbol, served from memory"""
+        symbol = symbol.upper()
+        data = orchestrator.get_live_quote(symbol)
+        if data is None:
+            return jsonify({"success": False, "error": f"No live quotes for {symbol}"})
+        return jsonify({"success": True, "data": data})
+    
+    @app.route('/api/upstream/stats')
+    def api_upstream_stats():
+        """API endpoint for the upstream data API request metrics"""
+        return jsonify({"success": True, "data": orchestrator.get_upstream_stats()})
+    
+    @app.route('/api/indicators/<symbol>/<indicator>/sweep')
+    def api_indicator_sweep(symbol, indicator):
+        """
+        API endpoint for calculating an indicator over a parameter grid
+        
+        Every query argument other than days is a parameter of the indicator,
+        given as a comma-separated list (std_dev=1.5,2,2.5) or an inclusive
+        range start:stop[:step] (period=5:200). Invalid or oversized grids
+        are rejected with a 400.
+        """
+        symbol = symbol.upper()
+        days = request.args.get('days', 365, type=int)
+        
+        try:
+            grid = {
+                name: _parse_grid_values(values)
+                for name, values in request.args.items()
+                if name != 'days'
+            }
+            data = orchestrator.get_indicator_sweep(symbol, indicator, grid, days)
+            return jsonify({"success": True, "data": [series.to_columns() for series in data]})
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Indicator sweep API error: {str(e)}")
+            return jsonify({"success": False, "error": str(e)})
+
+def start_background_jobs(app):
+    """
+    Start the background jobs configured by the environment
+    
+    Called by the entry point serving the application (main.py) rather than
+    on import, so scripts importing the application don't start them.
+    
+    Args:
+        app (Flask): Application whose context the jobs run in
+    """
+    # Keep watched symbols warm from one process; ingest_worker.py runs the same jobs separately
+    if os.environ.get("INGESTION_SCHEDULER") == "1":
+        orchestrator.start_scheduler(app)
+    
+    # Keep live prices and indicators in memory, e.g. LIVE_QUOTES_SOURCE=tcp://localhost:9100
+    if os.environ.get("LIVE_QUOTES_SOURCE"):
+        orchestrator.start_live_quotes(app)
+
+def _parse_grid_values(values):
+    """Parse a comma-separated list or an inclusive start:stop[:step] range of numbers"""
+    def number(text):
+        value = float(text)
+        return int(value) if value.is_integer() else value
+    
+    if ':' in values:
+        bounds = [number(part) for part in values.split(':')]
+        if len(bounds) not in (2, 3) or not all(math.isfinite(bound) for bound in bounds):
+            raise ValueError(f"Invalid range {values}")
+        start, stop = bounds[0], bounds[1]
+        step = bounds[2] if len(bounds) > 2 else 1
+        if step <= 0:
+            raise ValueError(f"Range step must be positive: {values}")
+        if stop < start:
+            raise ValueError(f"Range stop is before its start: {values}")
+        # Checked before the values are built, so a huge range costs nothing
+        count = int(round((stop - start) / step)) + 1
+        if count > SWEEP_MAX_VALUES:
+            raise ValueError(f"Too many values in range {values}: {count}, at most {SWEEP_MAX_VALUES}")
+        return [number(str(start + i * step)) for i in range(count)]
+    
+    return [number(part) for part in values.split(',')]
+
+def _parse_screen_filter(name, value):
+    """Parse a screen filter like rsi_lt=30, macd_histogram_gt=0 or close_gt_sma=20 into a condition"""
+    parts = name.lower().split('_')
+    
+    # close_<op>_<indicator>[_<field>]=<period>: compare the latest close with an indicator line
+    if parts[0] == 'close' and len(parts) >= 3:
+        indicator = parts[2].upper()
+        if indicator not in INDICATORS:
+            raise ValueError(f"Unknown indicator in filter {name}")
+        period_key = INDICATORS[indicator].parameters.get('period', (None,))[0]
+        reverse = {'lt': 'gt', 'le': 'ge', 'gt': 'lt', 'ge': 'le'}
+        return {
+            "indicator": indicator,
+            "field": parts[3] if len(parts) > 3 else 'value',
+            "op": reverse.get(parts[1], parts[1]),
+            "value": 'close',
+            "parameters": {period_key: int(value)} if period_key and value else {}
+        }
+    
+    # <indicator>[_<field>]_<op>=<number>
+    if len(parts) < 2:
+        raise ValueError(f"Invalid filter {name}")
+    return {
+        "indicator": parts[0].upper(),
+        "field": parts[1] if len(parts) > 2 else 'value',
+        "op": parts[-1],
+        "value": float(value)
+    }
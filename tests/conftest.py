@@ -0,0 +1,22 @@
+import os
+import tempfile
+import pytest
+
+# Point the application at a scratch database and keep its background jobs off before it is
+# imported; empty values also take precedence over a .env file
+_scratch = tempfile.mkdtemp(prefix='finance-tests-')
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["RESPONSE_CACHE_DIR"] = os.path.join(_scratch, 'response_cache')
+for name in ("INGESTION_SCHEDULER", "LIVE_QUOTES_SOURCE", "OHLCV_STORE_DIR"):
+    os.environ[name] = ""
+
+from app import app, db
+
+@pytest.fixture
+def app_context():
+    """Application context over empty tables"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from agents.analysis_agent import AnalysisAgent
+from utils.cache import LRUCache
+from utils.ohlcv import normalize_frame
+
+INDICATORS = ['SMA', 'EMA', 'RSI', 'MACD', 'BBANDS']
+
+def _bars(symbol='TST', count=300, seed=0):
+    """Daily OHLCV frame of a random walk"""
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, count)))
+    frame = pd.DataFrame({
+        'open': close,
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': 1000
+    }, index=pd.bdate_range('2024-01-02', periods=count))
+    return normalize_frame(frame, symbol)
+
+def _agent():
+    """Agent without a series cache, so every call calculates"""
+    return AnalysisAgent(cache=LRUCache(max_size=0))
+
+def test_update_after_a_shorter_window_backfills_the_stored_series(app_context):
+    agent = _agent()
+    bars = _bars()
+    
+    agent.update_indicators('TST', bars.iloc[238:299], INDICATORS)
+    agent.update_indicators('TST', bars, INDICATORS)
+    
+    expected = agent.calculate_indicators(bars, INDICATORS, persist=False)
+    for indicator in INDICATORS:
+        stored = agent.load_indicators('TST', indicator)
+        assert len(stored) == len(expected[indicator]), indicator
+        assert stored.timestamps.equals(expected[indicator].timestamps), indicator
+        for field, values in expected[indicator].fields.items():
+            np.testing.assert_allclose(stored.fields[field], values, err_msg=indicator)
+
+def test_update_of_a_covered_series_appends_only_new_bars(app_context):
+    agent = _agent()
+    bars = _bars()
+    
+    agent.update_indicators('TST', bars.iloc[:299], INDICATORS)
+    appended = agent.update_indicators('TST', bars, INDICATORS)
+    
+    for indicator in INDICATORS:
+        assert list(appended[indicator].timestamps) == [bars.index[-1]], indicator
+        assert len(agent.load_indicators('TST', indicator)) == len(
+            agent.calculate_indicators(bars, [indicator], persist=False)[indicator]
+        ), indicator
+
+def test_backfill_from_older_bars_keeps_the_newer_state(app_context):
+    agent = _agent()
+    bars = _bars()
+    
+    agent.update_indicators('TST', bars.iloc[200:], ['SMA'])
+    agent.update_indicators('TST', bars.iloc[:250], ['SMA'])
+    appended = agent.update_indicators('TST', bars, ['SMA'])
+    
+    # The state still ends at the last bar, nothing is left to append
+    assert len(appended['SMA']) == 0
+    assert len(agent.load_indicators('TST', 'SMA')) == len(bars) - 19
+
+def test_cached_series_are_not_stored_again(app_context):
+    agent = AnalysisAgent(cache=LRUCache())
+    bars = _bars()
+    stored = []
+    store_indicators = agent._store_indicators
+    
+    def record_stored(series_list, *args, **kwargs):
+        stored.append([series.indicator_type for series in series_list])
+        return store_indicators(series_list, *args, **kwargs)
+    
+    agent._store_indicators = record_stored
+    
+    agent.calculate_indicators(bars, ['SMA', 'RSI'])
+    agent.calculate_indicators(bars, ['SMA', 'RSI'])
+    agent.calculate_indicators(bars, ['SMA', 'EMA'])
+    
+    assert stored == [['SMA', 'RSI'], ['EMA']]
+
+def test_panels_bypass_the_series_cache(app_context):
+    cache = LRUCache()
+    agent = AnalysisAgent(cache=cache)
+    close_prices = pd.DataFrame({symbol: _bars(symbol, seed=seed)['close'] for seed, symbol in enumerate(['AAA', 'BBB'])})
+    
+    panel = agent.calculate_panel(close_prices, INDICATORS)
+    
+    assert len(cache) == 0 and cache.stats()['misses'] == 0
+    expected = agent.calculate_indicators(_bars('BBB', seed=1), ['SMA'], persist=False)['SMA']
+    np.testing.assert_allclose(panel['BBB']['SMA'].fields['value'], expected.fields['value'])
+
+def test_series_cached_without_persisting_are_stored_on_a_later_hit(app_context):
+    agent = AnalysisAgent(cache=LRUCache())
+    bars = _bars()
+    
+    agent.calculate_indicators(bars, ['SMA'], persist=False)
+    assert len(agent.load_indicators('TST', 'SMA')) == 0
+    
+    agent.calculate_indicators(bars, ['SMA'])
+    assert agent.cache.stats()['hits'] == 1
+    assert len(agent.load_indicators('TST', 'SMA')) == len(bars) - 19
+
+def test_update_reuses_series_of_a_panel(app_context):
+    agent = _agent()
+    bars = {symbol: _bars(symbol, seed=seed) for seed, symbol in enumerate(['AAA', 'BBB'])}
+    panel = agent.calculate_panel(agent.build_close_panel(bars), INDICATORS)
+    
+    def calculate(*args, **kwargs):
+        raise AssertionError("recalculated a series of the panel")
+    
+    agent._calculate = calculate
+    for symbol, frame in bars.items():
+        agent.update_indicators(symbol, frame, INDICATORS, calculated=panel[symbol])
+    
+    stored = agent.load_indicators('BBB', 'RSI')
+    np.testing.assert_allclose(stored.fields['value'], panel['BBB']['RSI'].fields['value'])
@@ -0,0 +1,48 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from app import db
+from agents.backtest_agent import BacktestAgent
+from models import MarketData
+
+def _rising_prices(count=60, gap=slice(30, 33)):
+    """Steadily rising closes of two symbols, AAA without prices over the gap"""
+    index = pd.bdate_range('2024-01-02', periods=count)
+    close = pd.DataFrame({'AAA': 100 + np.arange(count, dtype=float), 'BBB': 50 + np.arange(count, dtype=float)}, index=index)
+    close.iloc[gap, 0] = np.nan
+    return close
+
+def test_positions_are_held_through_price_gaps():
+    close = _rising_prices()
+    agent = BacktestAgent(store=None)
+    
+    result = agent.run_backtest(close, 'sma_trend', {'sma_period': 5})
+    
+    # Long from the first average's close to the end: one trade, and the move across the gap counts
+    aaa = result['symbols']['AAA']
+    assert aaa['trades'] == 1
+    assert aaa['total_return'] == pytest.approx(close['AAA'].iloc[-1] / close['AAA'].iloc[4] - 1)
+    assert result['symbols']['BBB']['trades'] == 1
+
+def test_rsi_positions_are_held_through_price_gaps():
+    close = _rising_prices()
+    # A dip into oversold territory before the gap, no exit signal after it
+    close.iloc[20:25, 0] = [110, 100, 90, 80, 70]
+    agent = BacktestAgent(store=None)
+    
+    gapped = agent.run_backtest(close, 'rsi_reversion', {'rsi_period': 5, 'rsi_upper': 101})['symbols']['AAA']
+    
+    assert gapped['trades'] == 1
+    assert gapped['exposure'] > 0.5
+
+def test_no_symbols_load_no_prices(app_context):
+    db.session.add(MarketData(
+        symbol='AAA', timestamp=datetime(2024, 1, 2),
+        open_price=1, high_price=1, low_price=1, close_price=1, volume=1
+    ))
+    db.session.commit()
+    agent = BacktestAgent(store=None)
+    
+    assert agent.load_close_prices([]).empty
+    assert list(agent.load_close_prices().columns) == ['AAA']
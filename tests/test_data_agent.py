@@ -0,0 +1,137 @@
+from datetime import date, datetime
+import pandas as pd
+from agents.data_agent import DataAgent
+from models import MarketData, MarketDataCoverage
+from utils.ohlcv import normalize_frame
+from utils.resample import ResampledViews
+from utils.trading_calendar import TradingCalendar, exchange_calendar
+
+START = datetime(2024, 3, 4)
+END = datetime(2024, 3, 8)
+SESSIONS = exchange_calendar.sessions(START, END)
+
+def _history(symbol, start, end):
+    """Yahoo Finance style daily bars of a symbol for the sessions in [start, end)"""
+    days = exchange_calendar.sessions(start, end - pd.Timedelta(days=1))
+    price = float(sum(map(ord, symbol)))
+    return pd.DataFrame({
+        'Open': price,
+        'High': price + 1,
+        'Low': price - 1,
+        'Close': price,
+        'Volume': 1000
+    }, index=days.tz_localize('America/New_York'))
+
+class StubDownloader:
+    """
+    Local stand-in of yfinance.download
+    
+    Records the symbols of every call; raises for batches containing a failing
+    symbol and leaves out the symbols it has no data for.
+    """
+    
+    def __init__(self, failing=(), unknown=()):
+        self.failing = set(failing)
+        self.unknown = set(unknown)
+        self.calls = []
+    
+    def __call__(self, symbols, start, end, **kwargs):
+        self.calls.append(list(symbols))
+        if self.failing & set(symbols):
+            raise ConnectionError("upstream unavailable")
+        
+        frames = {symbol: _history(symbol, start, end) for symbol in symbols if symbol not in self.unknown}
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+def _agent(downloader, batch_size=2):
+    """Data agent with a stub downloader and the single-symbol sources stubbed as well"""
+    agent = DataAgent(downloader=downloader, store=None, views=ResampledViews())
+    agent.BATCH_SIZE = batch_size
+    agent.single_fetches = []
+    agent.single_ranges = []
+    
+    def fetch_single(symbol, start_date, end_date, interval='1d'):
+        agent.single_fetches.append(symbol)
+        agent.single_ranges.append((start_date, end_date))
+        return normalize_frame(_history(symbol, start_date, end_date).rename(columns=str.lower).tz_localize(None), symbol)
+    
+    agent._fetch_from_yfinance = fetch_single
+    agent._fetch_from_alpha_vantage = lambda symbol, start_date, end_date: None
+    return agent
+
+def test_batch_download_is_split_into_chunks(app_context):
+    downloader = StubDownloader()
+    agent = _agent(downloader, batch_size=2)
+    
+    result = agent.fetch_historical_data_batch(['AAA', 'BBB', 'CCC', 'DDD', 'EEE'], START, END, as_frame=True)
+    
+    assert downloader.calls == [['AAA', 'BBB'], ['CCC', 'DDD'], ['EEE']]
+    assert agent.single_fetches == []
+    assert all(len(frame) == len(SESSIONS) for frame in result.values())
+
+def test_batch_bars_and_coverage_are_stored(app_context):
+    downloader = StubDownloader()
+    agent = _agent(downloader)
+    symbols = ['AAA', 'BBB', 'CCC']
+    
+    agent.fetch_historical_data_batch(symbols, START, END)
+    
+    assert MarketData.query.count() == len(symbols) * len(SESSIONS)
+    for symbol in symbols:
+        coverage = MarketDataCoverage.query.filter_by(symbol=symbol).all()
+        assert [(record.start_date, record.end_date) for record in coverage] == [(date(2024, 3, 4), date(2024, 3, 8))]
+    
+    # Covered ranges are served from the database
+    downloads = len(downloader.calls)
+    result = agent.fetch_historical_data_batch(symbols, START, END)
+    assert len(downloader.calls) == downloads
+    assert [len(result[symbol]) for symbol in symbols] == [len(SESSIONS)] * len(symbols)
+    assert result['BBB'][0]['close'] == float(sum(map(ord, 'BBB')))
+
+def test_failed_batch_falls_back_to_single_symbol_fetches(app_context):
+    downloader = StubDownloader(failing=['CCC'], unknown=['BBB'])
+    agent = _agent(downloader, batch_size=2)
+    
+    result = agent.fetch_historical_data_batch(['AAA', 'BBB', 'CCC', 'DDD', 'EEE'], START, END, as_frame=True)
+    
+    # BBB is missing from its batch's download, CCC and DDD share the failed batch
+    assert sorted(agent.single_fetches) == ['BBB', 'CCC', 'DDD']
+    assert all(len(frame) == len(SESSIONS) for frame in result.values())
+    assert MarketData.query.count() == 5 * len(SESSIONS)
+    assert MarketDataCoverage.query.count() == 5
+
+class FrozenCalendar(TradingCalendar):
+    """NYSE calendar whose current exchange time is fixed"""
+    
+    def __init__(self, now):
+        super().__init__()
+        self.now = now
+    
+    def exchange_time(self, moment=None):
+        return self.now if moment is None else super().exchange_time(moment)
+
+def test_sessions_that_have_not_opened_are_not_requested(app_context):
+    downloader = StubDownloader()
+    agent = _agent(downloader)
+    # Friday before the open
+    agent.calendar = FrozenCalendar(datetime(2024, 3, 8, 8, 0))
+    
+    result = agent.fetch_historical_data('AAA', START, END, as_frame=True)
+    
+    # The range ends with Thursday's session, and is covered once fetched
+    assert agent.single_ranges == [(datetime(2024, 3, 4), datetime(2024, 3, 8))]
+    assert result.index[-1] == datetime(2024, 3, 7)
+    assert agent.fetch_historical_data('AAA', START, END, as_frame=True).equals(result)
+    assert len(agent.single_ranges) == 1
+    
+    # Nothing to fetch for a range of sessions that haven't opened, in batches neither
+    assert agent.fetch_historical_data('BBB', END, END) == []
+    assert agent.fetch_historical_data_batch(['CCC'], END, END) == {'CCC': []}
+    assert agent.single_ranges == [(datetime(2024, 3, 4), datetime(2024, 3, 8))] and downloader.calls == []
+    
+    # Once Friday's session opened its bars are requested
+    agent.calendar.now = datetime(2024, 3, 8, 9, 45)
+    agent.fetch_historical_data('AAA', START, END)
+    assert agent.single_ranges[-1] == (datetime(2024, 3, 8), datetime(2024, 3, 9))
@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import text
+from app import db
+from agents.data_agent import DataAgent
+from clean_database import clean_database
+from models import MarketData, MarketDataCoverage, IndicatorState, IndicatorSnapshot
+from utils.database import clean_old_data, ensure_indexes
+from utils.resample import ResampledViews
+
+def _store_bars(symbol, days):
+    """Daily bars and their coverage over the last days, fetched now"""
+    today = date.today()
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        db.session.add(MarketData(
+            symbol=symbol, timestamp=datetime.combine(day, datetime.min.time()),
+            open_price=1, high_price=1, low_price=1, close_price=1, volume=1
+        ))
+    db.session.add(MarketDataCoverage(symbol=symbol, start_date=today - timedelta(days=days - 1), end_date=today))
+    db.session.commit()
+
+def test_clean_old_data_trims_the_coverage_of_deleted_bars(app_context):
+    _store_bars('AAA', 60)
+    _store_bars('BBB', 10)
+    db.session.add(MarketDataCoverage(symbol='CCC', start_date=date(2020, 1, 1), end_date=date(2020, 12, 31)))
+    db.session.commit()
+    
+    clean_old_data(days=30)
+    
+    first_kept = MarketData.query.filter_by(symbol='AAA').order_by(MarketData.timestamp).first().timestamp.date()
+    coverage = {record.symbol: (record.start_date, record.end_date) for record in MarketDataCoverage.query.all()}
+    assert coverage == {
+        'AAA': (first_kept, date.today()),
+        'BBB': (date.today() - timedelta(days=9), date.today())
+    }
+    
+    # The deleted days are reported missing again
+    agent = DataAgent(store=None, views=ResampledViews())
+    start = date.today() - timedelta(days=59)
+    assert agent._missing_ranges('AAA', start, date.today()) == [(start, first_kept - timedelta(days=1))]
+
+def test_clean_database_removes_coverage_states_and_snapshots(app_context):
+    _store_bars('AAA', 5)
+    db.session.add(IndicatorState(
+        symbol='AAA', indicator_type='SMA', parameters='{"period": 20}',
+        last_timestamp=datetime.now(), state='{}'
+    ))
+    db.session.add(IndicatorSnapshot(
+        symbol='AAA', indicator_type='SMA', parameters='{"period": 20}', timestamp=datetime.now(), value=1.0
+    ))
+    db.session.commit()
+    
+    clean_database()
+    
+    for model in (MarketData, MarketDataCoverage, IndicatorState, IndicatorSnapshot):
+        assert model.query.count() == 0, model.__name__
+
+def test_ensure_indexes_fails_when_a_unique_index_cannot_be_created(app_context):
+    db.session.execute(text('DROP INDEX uq_market_data_bar'))
+    db.session.commit()
+    _store_bars('AAA', 2)
+    _store_bars('AAA', 2)
+    
+    with pytest.raises(RuntimeError, match='uq_market_data_bar'):
+        ensure_indexes()
+    
+    # Without the duplicates the index is created again
+    db.session.execute(text('DELETE FROM market_data WHERE id > (SELECT MIN(id) FROM market_data)'))
+    db.session.commit()
+    ensure_indexes()
+    assert 'uq_market_data_bar' in [index['name'] for index in db.inspect(db.engine).get_indexes('market_data')]
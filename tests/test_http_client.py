@@ -0,0 +1,98 @@
+import pytest
+import requests
+from utils import http_client
+from utils.http_client import HTTPClient, TokenBucket, RateLimitExceeded
+
+class StubSession:
+    """Session answering with queued status codes, or raising queued exceptions"""
+    
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+    
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        return response
+    
+    def close(self):
+        pass
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Seconds the client slept for, without sleeping"""
+    recorded = []
+    monkeypatch.setattr(http_client.time, 'sleep', recorded.append)
+    return recorded
+
+def test_token_bucket_paces_requests_after_the_burst():
+    bucket = TokenBucket(rate=10, capacity=2)
+    
+    waits = [bucket.reserve() for _ in range(5)]
+    
+    # Two tokens at once, then one every tenth of a second, reserved in arrival order
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2:] == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+
+def test_token_bucket_rejects_waits_over_the_limit():
+    bucket = TokenBucket(rate=1)
+    bucket.reserve()
+    
+    with pytest.raises(RateLimitExceeded):
+        bucket.reserve(max_wait=0.5)
+    # The rejected request took no token
+    assert bucket.reserve(max_wait=1.5) == pytest.approx(1.0, abs=0.01)
+
+def test_throttled_and_failed_responses_are_retried_with_backoff(sleeps):
+    session = StubSession((429, {'Retry-After': '2'}), 503, requests.ConnectionError("reset"), 200)
+    client = HTTPClient(retries=3, backoff=0.5, session=session)
+    
+    response = client.get('http://upstream.test/query', provider='test')
+    
+    assert response.status_code == 200 and session.calls == 4
+    # Retry-After is honoured, otherwise the delay is jittered within the exponential backoff
+    assert sleeps[0] == 2.0
+    assert 0 <= sleeps[1] <= 1.0 and 0 <= sleeps[2] <= 2.0
+    stats = client.stats()['test']
+    assert (stats['attempts'], stats['retries'], stats['throttled'], stats['failures']) == (4, 3, 1, 0)
+
+def test_client_errors_are_not_retried(sleeps):
+    session = StubSession(404)
+    client = HTTPClient(retries=3, session=session)
+    
+    assert client.get('http://upstream.test/query').status_code == 404
+    assert session.calls == 1 and sleeps == []
+
+def test_retries_give_up_after_the_last_attempt(sleeps):
+    session = StubSession(500)
+    client = HTTPClient(retries=2, backoff=0.5, max_backoff=0.75, session=session)
+    
+    response = client.get('http://upstream.test/query', provider='test')
+    
+    assert response.status_code == 500 and session.calls == 3
+    assert len(sleeps) == 2 and all(0 <= delay <= 0.75 for delay in sleeps)
+    assert client.stats()['test']['failures'] == 1
+    
+    # Without any response the last error is raised
+    session.outcomes = [requests.Timeout("read timed out")]
+    with pytest.raises(requests.Timeout):
+        client.get('http://upstream.test/query', provider='test')
+    assert session.calls == 6
+
+def test_rate_limited_requests_wait_for_a_token(sleeps):
+    client = HTTPClient(session=StubSession(200), max_queue_wait=5)
+    client.set_rate_limit('test', requests_per_minute=60, burst=1)
+    
+    for _ in range(3):
+        client.get('http://upstream.test/query', provider='test', key='a')
+    client.get('http://upstream.test/query', provider='test', key='b')
+    
+    # One request a second per key; the other key has its own bucket
+    assert sleeps == pytest.approx([1.0, 2.0], abs=0.01)
+    assert client.stats()['test']['queue_wait']['count'] == 4
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from agents.indicators import plan, evaluate
+from agents.indicator_state import seed_state, advance_state
+from utils.rolling import CumulativeMoments
+
+def _pandas_rsi(close, period=14):
+    """Reference RSI, as calculated before the indicator planner existed"""
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    rs = gain.rolling(window=period).mean() / loss.rolling(window=period).mean()
+    return 100 - (100 / (1 + rs))
+
+def _walk_with_flat_stretch():
+    """Random walk with 40 bars at 5.0 in the middle"""
+    walk = 5.0 + np.cumsum(np.random.default_rng(0).normal(0, 0.05, 60))
+    return pd.Series(np.concatenate([walk, np.full(40, 5.0), 5.0 + np.cumsum(np.full(20, 0.01))]))
+
+def test_rsi_over_a_flat_window_matches_pandas():
+    close = _walk_with_flat_stretch()
+    
+    rsi = evaluate(plan(['RSI'], {}), close.to_numpy())['RSI']['value']
+    expected = _pandas_rsi(close).to_numpy()
+    
+    # Undefined inside the flat stretch, exactly 100 once only gains are in the window
+    assert np.isnan(rsi[99]) and np.isnan(expected[99])
+    assert rsi[100] == expected[100] == 100.0
+    np.testing.assert_allclose(rsi, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+def test_rolling_moments_of_a_constant_window_are_exact():
+    values = np.concatenate([np.random.default_rng(1).normal(1e6, 10, 30), np.full(25, 1e6 + 0.1)])
+    
+    mean, std = CumulativeMoments(values).mean_std(20)
+    
+    assert (mean[-6:] == 1e6 + 0.1).all()
+    assert (std[-6:] == 0.0).all()
+    np.testing.assert_allclose(mean[19:], pd.Series(values).rolling(20).mean().to_numpy()[19:], rtol=1e-12)
+
+def test_rsi_advanced_from_a_short_history_matches_a_full_recompute():
+    close = 100 + np.cumsum(np.random.default_rng(2).normal(0, 1, 40))
+    parameters = {'period': 14}
+    expected = evaluate(plan(['RSI'], {}), close)['RSI']['value']
+    
+    # Histories shorter than the period, up to long enough for a value of their own
+    for length in range(0, 17):
+        state = seed_state('RSI', parameters, close[:length])
+        fields, _ = advance_state('RSI', parameters, state, close[length:])
+        np.testing.assert_allclose(fields['value'], expected[length:], rtol=1e-9, equal_nan=True, err_msg=str(length))
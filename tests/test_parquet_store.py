@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.ohlcv import normalize_frame
+
+pytest.importorskip('pyarrow')
+
+from utils.parquet_store import ParquetStore
+
+def _bars(start, count, price=100.0):
+    """Daily bars with increasing closes"""
+    close = price + np.arange(count, dtype=float)
+    frame = pd.DataFrame({
+        'open': close - 0.5,
+        'high': close + 1,
+        'low': close - 1,
+        'close': close,
+        'volume': np.arange(count) * 1000
+    }, index=pd.bdate_range(start, periods=count))
+    return normalize_frame(frame, 'TST')
+
+def test_bars_round_trip_across_years(tmp_path):
+    store = ParquetStore(str(tmp_path))
+    bars = _bars('2023-12-01', 60)
+    
+    store.write(bars, 'TST')
+    
+    assert store.years('TST') == [2023, 2024] and store.symbols() == ['TST']
+    pd.testing.assert_frame_equal(store.read('TST'), bars, check_freq=False)
+    
+    start, end = bars.index[10].to_pydatetime(), bars.index[40].to_pydatetime()
+    arrays = store.read_arrays('TST', ('close', 'volume'), start, end)
+    np.testing.assert_array_equal(arrays['timestamp'], bars.index[10:41].to_numpy(dtype='datetime64[us]'))
+    np.testing.assert_array_equal(arrays['close'], bars['close'].to_numpy()[10:41])
+
+def test_written_bars_replace_stored_ones(tmp_path):
+    store = ParquetStore(str(tmp_path))
+    store.write(_bars('2024-01-02', 20), 'TST')
+    
+    store.write(_bars('2024-01-16', 20, price=500.0), 'TST')
+    
+    stored = store.read('TST')
+    assert len(stored) == 30
+    assert stored['close'].iloc[9] == 109.0 and stored['close'].iloc[10] == 500.0
+
+@pytest.mark.parametrize('symbol', ['', '.', '..', '../TST', 'TST/..', 'A/B', 'A\\B'])
+def test_symbols_leaving_the_root_are_rejected(tmp_path, symbol):
+    store = ParquetStore(str(tmp_path / 'store'))
+    
+    with pytest.raises(ValueError):
+        store.write(_bars('2024-01-02', 5), symbol)
+    with pytest.raises(ValueError):
+        store.has(symbol)
+    assert not (tmp_path / 'TST').exists()
@@ -0,0 +1,48 @@
+import os
+from orchestrator import Orchestrator
+from utils.process_lock import ProcessLock
+
+class StubScheduler:
+    """Scheduler that only records being started"""
+    
+    def __init__(self):
+        self.started = False
+    
+    def start(self):
+        self.started = True
+
+def test_lock_is_held_by_one_holder_at_a_time(tmp_path):
+    path = str(tmp_path / 'locks' / 'job.lock')
+    first, second = ProcessLock(path), ProcessLock(path)
+    
+    assert first.acquire() and first.acquire()
+    assert not second.acquire() and not second.held
+    with open(path) as f:
+        assert f.read().strip() == str(os.getpid())
+    
+    first.release()
+    assert second.acquire() and second.held
+    second.release()
+
+def test_scheduler_starts_only_with_the_lock(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKGROUND_LOCK_DIR", str(tmp_path))
+    running, other = Orchestrator(), Orchestrator()
+    running.build_scheduler = other.build_scheduler = lambda app=None: StubScheduler()
+    
+    assert running.start_scheduler()
+    assert not other.start_scheduler() and other.scheduler is None
+    assert running.scheduler.started
+    
+    # Once the process running it stops, another one can take over
+    running.scheduler_lock.release()
+    assert other.start_scheduler()
+
+def test_live_quotes_are_consumed_by_one_process(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKGROUND_LOCK_DIR", str(tmp_path))
+    running, other = Orchestrator(), Orchestrator()
+    sources = []
+    running.quote_agent.start = other.quote_agent.start = lambda source, app=None: sources.append(source)
+    
+    assert running.start_live_quotes(source=['first'])
+    assert not other.start_live_quotes(source=['second'])
+    assert sources == [['first']]
@@ -0,0 +1,77 @@
+import csv
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from agents.indicators import plan, evaluate
+from agents.quote_agent import QuoteAgent, STREAMING_INDICATORS
+from utils.ohlcv import normalize_frame
+from utils.quotes import ReplaySource
+
+OPEN = datetime(2024, 3, 5, 9, 30)
+TICKS_PER_BAR = 3
+
+def _history(symbol, start, count=100):
+    """One minute bars of the previous session, ending before start"""
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.002, count)))
+    index = pd.date_range(datetime(2024, 3, 4, 16, 0) - timedelta(minutes=count), periods=count, freq='min')
+    frame = pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close, 'volume': 100}, index=index)
+    return normalize_frame(frame, symbol)
+
+def _record_ticks(path, bars=80):
+    """Write a replay file of TICKS_PER_BAR ticks a minute from the open"""
+    prices = 100 * np.exp(np.cumsum(np.random.default_rng(2).normal(0, 0.001, bars * TICKS_PER_BAR)))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['symbol', 'timestamp', 'price', 'size'])
+        for i, price in enumerate(prices):
+            timestamp = OPEN + timedelta(minutes=i // TICKS_PER_BAR, seconds=i % TICKS_PER_BAR * 20)
+            writer.writerow(['tst', timestamp.isoformat(), price, 10])
+    return prices
+
+def test_replayed_ticks_match_a_full_recompute(tmp_path):
+    path = str(tmp_path / 'ticks.csv')
+    prices = _record_ticks(path)
+    history = _history('TST', OPEN)
+    agent = QuoteAgent(capacity=50, history=lambda symbol, start: history)
+    indicator_plan = plan(STREAMING_INDICATORS, {})
+    closes = list(history['close'])
+    
+    for i, tick in enumerate(ReplaySource(path)):
+        assert agent.on_tick(tick.symbol, tick.timestamp, tick.price, tick.size)
+        if i % TICKS_PER_BAR < TICKS_PER_BAR - 1:
+            continue
+        
+        # At the last tick of a bar the live values are those of its close
+        closes.append(tick.price)
+        expected = evaluate(indicator_plan, np.array(closes))
+        live = agent.latest('TST')['indicators']
+        for indicator in STREAMING_INDICATORS:
+            for field, values in expected[indicator].items():
+                np.testing.assert_allclose(
+                    live[indicator][field], values[-1], rtol=1e-9, err_msg=f"{indicator} {field} at {tick.timestamp}"
+                )
+    
+    # The ring buffer keeps the last closed bars; the last bar is still being built
+    bars = agent.bars('TST')
+    assert len(bars) == 50
+    assert bars.index[-1] == OPEN + timedelta(minutes=78)
+    np.testing.assert_allclose(bars['close'], prices[TICKS_PER_BAR - 1::TICKS_PER_BAR][-51:-1])
+    np.testing.assert_allclose(bars['volume'], 10 * TICKS_PER_BAR)
+    latest = agent.latest('TST')
+    assert latest['bar']['timestamp'] == (OPEN + timedelta(minutes=79)).isoformat()
+    assert latest['previous_close'] == history['close'].iloc[-1]
+
+def test_consumed_replay_drops_late_ticks(tmp_path):
+    path = str(tmp_path / 'ticks.jsonl')
+    with open(path, 'w') as f:
+        f.write('{"symbol": "TST", "timestamp": "2024-03-05T09:31:05", "price": 10}\n')
+        f.write('{"symbol": "TST", "timestamp": "2024-03-05T09:30:59", "price": 11}\n')
+        f.write('not a tick\n')
+        f.write('{"symbol": "TST", "timestamp": "2024-03-05T09:32:00", "price": 12}\n')
+    agent = QuoteAgent()
+    
+    assert agent.consume(ReplaySource(path)) == 3
+    
+    assert agent.stats()['late'] == 1
+    assert list(agent.bars('TST')['close']) == [10]
+    assert agent.latest('TST')['price'] == 12
@@ -0,0 +1,32 @@
+import pytest
+from agents.analysis_agent import SWEEP_MAX_VALUES, SWEEP_MAX_COMBINATIONS
+from routes import _parse_grid_values, orchestrator
+
+def test_grid_ranges_are_expanded():
+    assert _parse_grid_values('5:20:5') == [5, 10, 15, 20]
+    assert _parse_grid_values('1.5,2,2.5') == [1.5, 2, 2.5]
+
+@pytest.mark.parametrize('values', ['5:20:0', '5:20:-5', '20:5', '5:inf', '1:2:3:4'])
+def test_invalid_grid_ranges_are_rejected(values):
+    with pytest.raises(ValueError):
+        _parse_grid_values(values)
+
+def test_oversized_grid_ranges_are_rejected_before_they_are_built():
+    with pytest.raises(ValueError, match='Too many values'):
+        _parse_grid_values('1:1e12')
+    assert len(_parse_grid_values(f'1:{SWEEP_MAX_VALUES}')) == SWEEP_MAX_VALUES
+
+def test_oversized_sweeps_are_rejected_with_a_400(app_context, monkeypatch):
+    def fetch(*args, **kwargs):
+        raise AssertionError("fetched market data for a rejected grid")
+    
+    monkeypatch.setattr(orchestrator, 'get_market_data', fetch)
+    client = app_context.test_client()
+    
+    # Each parameter within its limit, but together too many combinations
+    combined = f'period=1:{SWEEP_MAX_VALUES}&std_dev=1:{SWEEP_MAX_COMBINATIONS // SWEEP_MAX_VALUES + 1}'
+    
+    for query in ('period=5:20:0', 'period=1:1e12', combined):
+        response = client.get(f'/api/indicators/TST/BBANDS/sweep?{query}')
+        assert response.status_code == 400, query
+        assert response.get_json()['success'] is False
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+class LRUCache:
+    """
+    Process-local cache with least-recently-used and time-to-live eviction
+    
+    Entries expire ttl seconds after they were stored; once the cache holds
+    max_size entries, storing another one evicts the least recently used.
+    Lookups are counted so the hit rate can be monitored.
+    """
+    
+    def __init__(self, max_size=1024, ttl=3600):
+        """
+        Initialize the cache
+        
+        Args:
+            max_size (int): Maximum number of entries
+            ttl (float): Seconds an entry stays valid, or None to never expire
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """
+        Look up an entry and mark it as recently used
+        
+        Args:
+            key: Hashable cache key
+            default: Value returned when the key is missing or expired
+        
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key, value):
+        """
+        Store an entry, evicting the least recently used ones beyond max_size
+        
+        Args:
+            key: Hashable cache key
+            value: Value to cache
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def pop(self, key, default=None):
+        """
+        Remove an entry without counting a lookup
+        
+        Args:
+            key: Hashable cache key
+            default: Value returned when the key is missing
+        
+        Returns:
+            Removed value or default
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[1]
+    
+    def clear(self):
+        """Remove all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self):
+        """
+        Get the cache counters
+        
+        Returns:
+            dict: Entry count, capacity, hits, misses and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+    
+    def __len__(self):
+        return len(self._entries)
+
+def fingerprint(*arrays):
+    """
+    Hash the contents of arrays, e.g. the timestamps and prices of a market data window
+    
+    Args:
+        *arrays (array-like): Arrays to hash, in order
+    
+    Returns:
+        str: Hex digest identifying the contents
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for values in arrays:
+        values = np.ascontiguousarray(values)
+        digest.update(str(values.dtype).encode())
+        digest.update(str(values.shape).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
@@ -1,10 +1,330 @@
+import io
+import csv
 import logging
 from datetime import datetime, timedelta
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
 from app import db
-from models import MarketData, TechnicalIndicator, NewsArticle, SentimentAnalysis, Report
+from models import MarketData, MarketDataCoverage, TechnicalIndicator, NewsArticle, NewsArticleSymbol, SentimentAnalysis, Report, split_symbols
 
 logger = logging.getLogger(__name__)
 
+# Rows per INSERT statement in bulk_upsert
+UPSERT_BATCH_SIZE = 1000
+
+# Minimum number of rows bulk_upsert streams through COPY on PostgreSQL
+COPY_MIN_ROWS = 10000
+
+def bulk_upsert(model, rows, index_elements, update_columns=None, batch_size=UPSERT_BATCH_SIZE,
+                newer_column=None):
+    """
+    Write rows with the dialect-native INSERT ... ON CONFLICT statement.
+    
+    Large batches on PostgreSQL are streamed with COPY instead, see
+    copy_upsert. The statements are added to the current session; the caller commits,
+    so a whole batch is written in a single transaction.
+    
+    Args:
+        model: SQLAlchemy model to write to
+        rows (list): List of column dictionaries, all with the same keys
+        index_elements (list): Columns of the unique index resolving conflicts
+        update_columns (list): Columns to overwrite on conflict, or None to keep existing rows
+        batch_size (int): Rows per executemany batch
+        newer_column (str): Only overwrite existing rows whose value in this column is not newer
+        
+    Returns:
+        int: Number of rows sent to the database
+    """
+    if not rows:
+        return 0
+    
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql' and len(rows) >= COPY_MIN_ROWS:
+        return copy_upsert(model, rows, index_elements, update_columns, newer_column)
+    
+    if dialect == 'postgresql':
+        insert = postgresql.insert
+    elif dialect == 'sqlite':
+        insert = sqlite.insert
+    else:
+        raise ValueError(f"Bulk upsert is not supported for the {dialect} dialect")
+    
+    stmt = insert(model.__table__)
+    if update_columns:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: stmt.excluded[column] for column in update_columns},
+            where=model.__table__.c[newer_column] <= stmt.excluded[newer_column] if newer_column else None
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(stmt, rows[start:start + batch_size])
+    
+    return len(rows)
+
+def copy_upsert(model, rows, index_elements, update_columns=None, newer_column=None):
+    """
+    Write rows to PostgreSQL with COPY into a temporary table and one INSERT ... SELECT.
+    
+    Parses far faster than multi-row INSERT statements for large batches.
+    Runs on the session's connection, so the caller commits as with
+    bulk_upsert, which dispatches here for batches of COPY_MIN_ROWS rows.
+    
+    Args:
+        model: SQLAlchemy model to write to
+        rows (list): List of column dictionaries, all with the same keys
+        index_elements (list): Columns of the unique index resolving conflicts
+        update_columns (list): Columns to overwrite on conflict, or None to keep existing rows
+        newer_column (str): Only overwrite existing rows whose value in this column is not newer
+        
+    Returns:
+        int: Number of rows sent to the database
+    """
+    if not rows:
+        return 0
+    
+    table = model.__table__.name
+    staging = f"{table}_copy"
+    columns = list(rows[0].keys())
+    column_list = ', '.join(columns)
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # Unquoted empty fields are read as NULL
+        writer.writerow(['' if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+    
+    if update_columns:
+        conflict = (
+            f"DO UPDATE SET {', '.join(f'{column} = EXCLUDED.{column}' for column in update_columns)}"
+            + (f" WHERE {table}.{newer_column} <= EXCLUDED.{newer_column}" if newer_column else '')
+        )
+    else:
+        conflict = "DO NOTHING"
+    
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+        cursor.execute(f"TRUNCATE {staging}")
+        cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} "
+            f"ON CONFLICT ({', '.join(index_elements)}) {conflict}"
+        )
+    finally:
+        cursor.close()
+    
+    return len(rows)
+
+def ensure_columns():
+    """
+    Add nullable columns declared on the models that are missing in the database.
+    
+    db.create_all() never alters existing tables, so databases created by an
+    earlier version would otherwise lack columns added to existing models.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            
+            try:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logger.info(f"Added column {table.name}.{column.name}")
+            except Exception as e:
+                logger.error(f"Error adding column {table.name}.{column.name}: {str(e)}")
+
+def ensure_indexes():
+    """
+    Create indexes declared on the models that are missing in the database.
+    
+    db.create_all() only creates indexes together with new tables, so
+    databases created by an earlier version would otherwise lack the unique
+    keys the bulk upserts rely on.
+    
+    Raises:
+        RuntimeError: If a unique index can't be created, e.g. because of
+            duplicate rows; upserts targeting it would fail on every write
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except Exception as e:
+                if index.unique:
+                    raise RuntimeError(
+                        f"Can't create unique index {index.name} on {table.name}, "
+                        f"remove its duplicate rows first: {str(e)}"
+                    ) from e
+                logger.error(f"Error creating index {index.name}: {str(e)}")
+
+def backfill_news_symbols(batch_size=1000):
+    """
+    Create the symbol associations of news articles stored before they existed.
+    
+    Articles without any association are read in id order, batch by batch,
+    and linked to the symbols of their comma-separated symbols column.
+    Already linked articles are skipped, so the backfill can run on every start.
+    
+    Args:
+        batch_size (int): Articles per transaction
+        
+    Returns:
+        int: Number of associations created
+    """
+    created = 0
+    last_id = 0
+    try:
+        linked = db.session.query(NewsArticleSymbol.id).filter(NewsArticleSymbol.article_id == NewsArticle.id).exists()
+        while True:
+            articles = db.session.query(NewsArticle.id, NewsArticle.symbols, NewsArticle.published_at).filter(
+                NewsArticle.id > last_id,
+                NewsArticle.symbols.isnot(None),
+                ~linked
+            ).order_by(NewsArticle.id).limit(batch_size).all()
+            if not articles:
+                break
+            
+            rows = [
+                {"article_id": article_id, "symbol": symbol, "published_at": published_at}
+                for article_id, symbols, published_at in articles
+                for symbol in split_symbols(symbols)
+            ]
+            bulk_upsert(NewsArticleSymbol, rows, index_elements=['article_id', 'symbol'])
+            db.session.commit()
+            
+            created += len(rows)
+            last_id = articles[-1][0]
+        
+        if created:
+            logger.info(f"Backfilled {created} news article symbol associations")
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error backfilling news article symbols: {str(e)}")
+    
+    return created
+
+def backfill_news_url_hashes(batch_size=1000):
+    """
+    Key news articles stored before the URL hash existed and merge their duplicates.
+    
+    Articles without a hash are read in id order. The first article of each
+    hash keeps its row; later copies hand their symbol associations to it
+    and are deleted together with their sentiment rows, so repeated fetches
+    no longer inflate the news and sentiment tables.
+    
+    Args:
+        batch_size (int): Articles per transaction
+        
+    Returns:
+        int: Number of duplicate articles removed
+    """
+    removed = 0
+    last_id = 0
+    try:
+        while True:
+            articles = db.session.query(
+                NewsArticle.id, NewsArticle.url, NewsArticle.source, NewsArticle.title, NewsArticle.content
+            ).filter(
+                NewsArticle.id > last_id,
+                NewsArticle.url_hash.is_(None)
+            ).order_by(NewsArticle.id).limit(batch_size).all()
+            if not articles:
+                break
+            
+            hashes = {
+                article.id: NewsArticle.compute_url_hash(article.url, article.source, article.title, article.content)
+                for article in articles
+            }
+            canonical = dict(
+                db.session.query(NewsArticle.url_hash, NewsArticle.id)
+                .filter(NewsArticle.url_hash.in_(set(hashes.values()))).all()
+            )
+            
+            keyed = []
+            duplicates = {}
+            for article_id, url_hash in hashes.items():
+                if url_hash in canonical:
+                    duplicates[article_id] = canonical[url_hash]
+                else:
+                    canonical[url_hash] = article_id
+                    keyed.append({"id": article_id, "url_hash": url_hash})
+            
+            db.session.bulk_update_mappings(NewsArticle, keyed)
+            
+            if duplicates:
+                links = db.session.query(NewsArticleSymbol).filter(
+                    NewsArticleSymbol.article_id.in_(list(duplicates))
+                ).all()
+                bulk_upsert(
+                    NewsArticleSymbol,
+                    [
+                        {"article_id": duplicates[link.article_id], "symbol": link.symbol, "published_at": link.published_at}
+                        for link in links
+                    ],
+                    index_elements=['article_id', 'symbol']
+                )
+                for model, column in ((NewsArticleSymbol, NewsArticleSymbol.article_id),
+                                      (SentimentAnalysis, SentimentAnalysis.news_id),
+                                      (NewsArticle, NewsArticle.id)):
+                    db.session.query(model).filter(column.in_(list(duplicates))).delete(synchronize_session=False)
+            
+            db.session.commit()
+            removed += len(duplicates)
+            last_id = articles[-1].id
+        
+        if removed:
+            logger.info(f"Merged {removed} duplicate news articles")
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error backfilling news article URL hashes: {str(e)}")
+    
+    return removed
+
+def dedupe_sentiment_analyses():
+    """
+    Remove repeated sentiment rows of an article, keeping the first one.
+    
+    Databases written before sentiment rows were keyed by article may hold
+    several per article, which would keep the unique index on news_id from
+    being created. Runs before ensure_indexes; a no-op once the index exists.
+    
+    Returns:
+        int: Number of sentiment rows removed
+    """
+    removed = 0
+    try:
+        first = db.session.query(db.func.min(SentimentAnalysis.id)).group_by(SentimentAnalysis.news_id)
+        removed = db.session.query(SentimentAnalysis).filter(
+            SentimentAnalysis.id.notin_(first.scalar_subquery())
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        
+        if removed:
+            logger.info(f"Removed {removed} duplicate sentiment analyses")
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error removing duplicate sentiment analyses: {str(e)}")
+    
+    return removed
+
 def clean_old_data(days=30):
     """
     Clean up old data from the database that's older than specified days
@@ -20,6 +340,15 @@ def clean_old_data(days=30):
         for data in old_market_data:
             db.session.delete(data)
         
+        # Trim the fetched ranges to the kept bars, or the deleted ones would never be fetched again
+        first_kept_day = (cutoff_date - timedelta(microseconds=1)).date() + timedelta(days=1)
+        MarketDataCoverage.query.filter(
+            MarketDataCoverage.end_date < first_kept_day
+        ).delete(synchronize_session=False)
+        MarketDataCoverage.query.filter(
+            MarketDataCoverage.start_date < first_kept_day
+        ).update({MarketDataCoverage.start_date: first_kept_day}, synchronize_session=False)
+        
         # Delete old technical indicators
         old_indicators = TechnicalIndicator.query.filter(TechnicalIndicator.timestamp < cutoff_date).all()
         for indicator in old_indicators:
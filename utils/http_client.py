@@ -0,0 +1,309 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth another attempt: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would wait longer than allowed for a rate limit token"""
+
+class TokenBucket:
+    """
+    Token bucket rate limiter
+    
+    Holds up to capacity tokens and refills at rate tokens per second; every
+    request takes one token, waiting for the next one when the bucket is empty.
+    Waiting requests reserve their token, so they are served in arrival order.
+    """
+    
+    def __init__(self, rate, capacity=None):
+        """
+        Initialize the bucket, full
+        
+        Args:
+            rate (float): Tokens added per second
+            capacity (float, optional): Maximum burst, defaults to one second of tokens (at least 1)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, max_wait=None):
+        """
+        Take a token
+        
+        Args:
+            max_wait (float, optional): Maximum seconds to wait, or None to wait as long as needed
+        
+        Returns:
+            float: Seconds until the token is available
+        
+        Raises:
+            RateLimitExceeded: If the token is not available within max_wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                raise RateLimitExceeded(f"Rate limit token not available within {max_wait} seconds")
+            
+            self._tokens -= 1
+            return wait
+    
+    def acquire(self, max_wait=None):
+        """
+        Take a token, sleeping until it is available
+        
+        Args:
+            max_wait (float, optional): Maximum seconds to wait, or None to wait as long as needed
+        
+        Returns:
+            float: Seconds waited
+        """
+        wait = self.reserve(max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+class _ProviderMetrics:
+    """Request counters and recent timings of one provider"""
+    
+    def __init__(self, samples):
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.queue_wait = deque(maxlen=samples)
+        self.latency = deque(maxlen=samples)
+    
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "queue_wait": _summarize(self.queue_wait),
+            "latency": _summarize(self.latency)
+        }
+
+def _summarize(samples):
+    """Summarize timing samples in seconds"""
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    
+    values = np.fromiter(samples, dtype=float)
+    p50, p95 = np.percentile(values, [50, 95])
+    return {
+        "count": len(values),
+        "mean": float(values.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "max": float(values.max())
+    }
+
+class HTTPClient:
+    """
+    Shared client for upstream data APIs
+    
+    Requests go through one pooled keep-alive session with connect and read
+    timeouts. Throttled responses (429), transient server errors and
+    connection failures are retried with jittered exponential backoff.
+    Each provider, or provider and API key, can be given a token bucket
+    limiting its request rate; the time requests spend waiting for a token
+    and the latency of every attempt are recorded per provider.
+    """
+    
+    def __init__(self, timeout=(5, 30), retries=3, backoff=0.5, max_backoff=30.0,
+                 max_queue_wait=60.0, pool_size=10, samples=1000, session=None):
+        """
+        Initialize the client
+        
+        Args:
+            timeout (float or tuple): Seconds to wait for the connection and the response
+            retries (int): Attempts after the first one
+            backoff (float): Base of the exponential backoff in seconds
+            max_backoff (float): Maximum backoff in seconds
+            max_queue_wait (float): Maximum seconds a request waits for a rate limit token, or None
+            pool_size (int): Connections kept alive per host
+            samples (int): Recent timings kept per provider for the metrics
+            session (Session, optional): Session to send the requests with
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_queue_wait = max_queue_wait
+        self.samples = samples
+        
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        
+        self._limits = {}
+        self._buckets = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def set_rate_limit(self, provider, requests_per_minute, burst=None):
+        """
+        Limit the request rate of a provider
+        
+        Every API key of the provider gets its own bucket with this limit.
+        
+        Args:
+            provider (str): Provider name, e.g. "alpha_vantage"
+            requests_per_minute (float): Sustained requests per minute
+            burst (int, optional): Requests allowed at once, defaults to 1
+        """
+        with self._lock:
+            self._limits[provider] = (requests_per_minute / 60.0, burst if burst is not None else 1)
+            self._buckets = {key: bucket for key, bucket in self._buckets.items() if key[0] != provider}
+    
+    def get(self, url, params=None, provider='default', key=None, **kwargs):
+        """
+        Send a GET request
+        
+        Args:
+            url (str): Request URL
+            params (dict, optional): Query parameters
+            provider (str): Provider the request counts against
+            key (str, optional): API key the request counts against, when the limit is per key
+            **kwargs: Further arguments for Session.request, e.g. headers or verify
+        
+        Returns:
+            Response: The last response received
+        
+        Raises:
+            RateLimitExceeded: If no rate limit token became available within max_queue_wait
+            RequestException: If the request failed on every attempt without a response
+        """
+        return self.request('GET', url, params=params, provider=provider, key=key, **kwargs)
+    
+    def request(self, method, url, provider='default', key=None, **kwargs):
+        """
+        Send a request, waiting for the provider's rate limit and retrying transient failures
+        
+        Args:
+            method (str): HTTP method
+            url (str): Request URL
+            provider (str): Provider the request counts against
+            key (str, optional): API key the request counts against, when the limit is per key
+            **kwargs: Further arguments for Session.request
+        
+        Returns:
+            Response: The last response received
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        metrics = self._provider_metrics(provider)
+        bucket = self._bucket(provider, key)
+        
+        with self._lock:
+            metrics.requests += 1
+        
+        for attempt in range(self.retries + 1):
+            if bucket is not None:
+                try:
+                    waited = bucket.acquire(self.max_queue_wait)
+                except RateLimitExceeded:
+                    with self._lock:
+                        metrics.rejected += 1
+                    raise
+                with self._lock:
+                    metrics.queue_wait.append(waited)
+            
+            start = time.perf_counter()
+            response = error = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            
+            with self._lock:
+                metrics.attempts += 1
+                metrics.latency.append(time.perf_counter() - start)
+                if response is not None and response.status_code == 429:
+                    metrics.throttled += 1
+            
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not retryable or attempt == self.retries:
+                break
+            
+            delay = self._retry_delay(attempt, response)
+            logger.warning(
+                f"{provider} request failed ({error or response.status_code}), retrying in {delay:.2f}s"
+            )
+            with self._lock:
+                metrics.retries += 1
+            time.sleep(delay)
+        
+        if error is not None or response.status_code >= 400:
+            with self._lock:
+                metrics.failures += 1
+        if error is not None:
+            raise error
+        return response
+    
+    def stats(self):
+        """
+        Get the request metrics
+        
+        Returns:
+            dict: Provider name to request counters and queue wait and latency summaries in seconds
+        """
+        with self._lock:
+            return {provider: metrics.to_dict() for provider, metrics in self._metrics.items()}
+    
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
+    
+    def _retry_delay(self, attempt, response):
+        """Seconds to wait before the next attempt: Retry-After if given, full-jitter backoff otherwise"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+    
+    def _bucket(self, provider, key):
+        """Get the token bucket of a provider and API key, if the provider is limited"""
+        with self._lock:
+            limit = self._limits.get(provider)
+            if limit is None:
+                return None
+            
+            bucket = self._buckets.get((provider, key))
+            if bucket is None:
+                bucket = self._buckets[(provider, key)] = TokenBucket(*limit)
+            return bucket
+    
+    def _provider_metrics(self, provider):
+        """Get the metrics of a provider"""
+        with self._lock:
+            metrics = self._metrics.get(provider)
+            if metrics is None:
+                metrics = self._metrics[provider] = _ProviderMetrics(self.samples)
+            return metrics
@@ -0,0 +1,170 @@
+"""
+Normalization of upstream market data payloads.
+
+Both sources are turned into the same typed columnar OHLCV frame:
+a sorted, duplicate-free DatetimeIndex named ``timestamp`` in exchange
+wall-clock time, float64 ``open``/``high``/``low``/``close`` columns, a
+nullable Int64 ``volume`` column and the ``symbol``. The frame is what
+DataAgent stores and what AnalysisAgent calculates on; frame_to_records()
+builds the list of dictionaries the templates and the JSON API use.
+"""
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+OHLCV_COLUMNS = PRICE_COLUMNS + ['volume']
+
+ALPHA_VANTAGE_COLUMNS = {
+    "1. open": "open",
+    "2. high": "high",
+    "3. low": "low",
+    "4. close": "close",
+    "5. volume": "volume"
+}
+
+def empty_frame(symbol=None):
+    """
+    Build an OHLCV frame without bars
+    
+    Args:
+        symbol (str, optional): Stock symbol
+    
+    Returns:
+        DataFrame: Empty frame with the normalized columns and dtypes
+    """
+    frame = pd.DataFrame(
+        {column: pd.Series(dtype='float64') for column in PRICE_COLUMNS},
+        index=pd.DatetimeIndex([], name='timestamp')
+    )
+    frame['volume'] = pd.Series(dtype='Int64')
+    frame['symbol'] = pd.Series(dtype='object')
+    return frame
+
+def _finish(frame, symbol):
+    """Apply the normalized dtypes, ordering and symbol column"""
+    frame = frame[OHLCV_COLUMNS].copy()
+    frame[PRICE_COLUMNS] = frame[PRICE_COLUMNS].apply(pd.to_numeric, errors='coerce').astype('float64')
+    frame['volume'] = pd.to_numeric(frame['volume'], errors='coerce').round().astype('Int64')
+    frame = frame[frame['close'].notna()]
+    
+    if not frame.index.is_monotonic_increasing:
+        frame = frame.sort_index()
+    frame = frame[~frame.index.duplicated(keep='last')]
+    frame.index.name = 'timestamp'
+    frame['symbol'] = symbol
+    return frame
+
+def normalize_yfinance(df, symbol):
+    """
+    Normalize a Yahoo Finance history frame
+    
+    Args:
+        df (DataFrame): Frame with Open, High, Low, Close and Volume columns
+        symbol (str): Stock symbol
+    
+    Returns:
+        DataFrame: Normalized OHLCV frame
+    """
+    if df is None or df.empty:
+        return empty_frame(symbol)
+    
+    frame = df.rename(columns=str.lower)
+    index = pd.DatetimeIndex(frame.index)
+    # Keep the exchange wall-clock time, as stored in MarketData
+    frame.index = index.tz_localize(None) if index.tz is not None else index
+    return _finish(frame, symbol)
+
+def normalize_alpha_vantage(time_series, symbol, start_date=None, end_date=None):
+    """
+    Normalize an Alpha Vantage daily time series payload
+    
+    The full history is parsed once, vectorized, and cut to the requested
+    range by slicing the sorted index.
+    
+    Args:
+        time_series (dict): The "Time Series (Daily)" object, date string to values
+        symbol (str): Stock symbol
+        start_date (datetime, optional): First timestamp to keep
+        end_date (datetime, optional): Last timestamp to keep
+    
+    Returns:
+        DataFrame: Normalized OHLCV frame
+    """
+    if not time_series:
+        return empty_frame(symbol)
+    
+    frame = pd.DataFrame.from_dict(time_series, orient='index').rename(columns=ALPHA_VANTAGE_COLUMNS)
+    frame.index = pd.to_datetime(frame.index, format='%Y-%m-%d')
+    frame = frame.sort_index().loc[start_date:end_date]
+    return _finish(frame, symbol)
+
+def normalize_rows(rows, symbol):
+    """
+    Normalize stored bars
+    
+    Args:
+        rows (list): (timestamp, open, high, low, close, volume) tuples
+        symbol (str): Stock symbol
+    
+    Returns:
+        DataFrame: Normalized OHLCV frame
+    """
+    if not rows:
+        return empty_frame(symbol)
+    
+    frame = pd.DataFrame(rows, columns=['timestamp'] + OHLCV_COLUMNS).set_index('timestamp')
+    frame.index = pd.DatetimeIndex(frame.index)
+    return _finish(frame, symbol)
+
+def normalize_frame(frame, symbol):
+    """
+    Normalize a frame with lowercase OHLCV columns and a timestamp index
+    
+    Args:
+        frame (DataFrame): Frame with open, high, low, close and volume columns
+        symbol (str): Stock symbol
+    
+    Returns:
+        DataFrame: Normalized OHLCV frame
+    """
+    if frame is None or frame.empty:
+        return empty_frame(symbol)
+    
+    return _finish(frame.set_axis(pd.DatetimeIndex(frame.index), axis=0), symbol)
+
+def frame_to_records(frame):
+    """
+    Build market data records from a normalized frame, column by column
+    
+    Args:
+        frame (DataFrame): Normalized OHLCV frame
+    
+    Returns:
+        list: Dictionaries with symbol, timestamp, open, high, low, close and volume
+    """
+    if frame is None or frame.empty:
+        return []
+    
+    volume = frame['volume'].to_numpy(dtype='float64', na_value=np.nan)
+    volume = [None if np.isnan(value) else int(value) for value in volume]
+    
+    return [
+        {
+            "symbol": symbol,
+            "timestamp": timestamp,
+            "open": open_price,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": bar_volume
+        }
+        for symbol, timestamp, open_price, high, low, close, bar_volume in zip(
+            frame['symbol'].tolist(),
+            frame.index.to_pydatetime(),
+            frame['open'].tolist(),
+            frame['high'].tolist(),
+            frame['low'].tolist(),
+            frame['close'].tolist(),
+            volume
+        )
+    ]
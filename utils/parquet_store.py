@@ -0,0 +1,243 @@
+"""
+Columnar OHLCV storage in Parquet files.
+
+Bars are kept in one file per symbol and calendar year,
+``<root>/<symbol>/<year>.parquet``, next to the MarketData table. Reads
+open only the years a range touches, memory-mapped, and hand the columns
+to NumPy without building a Python object per bar, so multi-year scans run
+at disk speed. The store needs the optional pyarrow package.
+"""
+import logging
+import os
+import re
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from utils.ohlcv import OHLCV_COLUMNS, empty_frame, normalize_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+def pyarrow_available():
+    """Check whether the optional pyarrow dependency is installed"""
+    return pa is not None
+
+class ParquetStore:
+    """
+    OHLCV bars partitioned by symbol and year
+    
+    Writes merge the new bars into the partitions they fall in, replacing
+    bars with the same timestamp, and swap every rewritten file in
+    atomically.
+    """
+    
+    def __init__(self, root, compression='snappy'):
+        """
+        Initialize the store
+        
+        Args:
+            root (str): Directory holding the partitions, created if missing
+            compression (str): Parquet compression codec
+        
+        Raises:
+            ImportError: If pyarrow is not installed
+        """
+        if not pyarrow_available():
+            raise ImportError("The Parquet OHLCV store requires pyarrow (pip install pyarrow)")
+        
+        self.root = root
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._schema = pa.schema([
+            ('timestamp', pa.timestamp('us')),
+            ('open', pa.float64()),
+            ('high', pa.float64()),
+            ('low', pa.float64()),
+            ('close', pa.float64()),
+            ('volume', pa.int64())
+        ])
+    
+    @classmethod
+    def from_environment(cls):
+        """
+        Create the store configured by OHLCV_STORE_DIR
+        
+        Returns:
+            ParquetStore: The store, or None if it is not configured or pyarrow is missing
+        """
+        root = os.environ.get("OHLCV_STORE_DIR")
+        if not root:
+            return None
+        if not pyarrow_available():
+            logger.warning("OHLCV_STORE_DIR is set but pyarrow is not installed; using the database only")
+            return None
+        return cls(root)
+    
+    def has(self, symbol):
+        """
+        Check whether any bars of a symbol are stored
+        
+        Args:
+            symbol (str): Stock symbol
+        
+        Returns:
+            bool: Whether the symbol has partitions
+        """
+        return bool(self.years(symbol))
+    
+    def symbols(self):
+        """
+        List the stored symbols
+        
+        Returns:
+            list: Symbols with at least one partition
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir() and self.has(entry.name))
+    
+    def years(self, symbol):
+        """
+        List the stored years of a symbol
+        
+        Args:
+            symbol (str): Stock symbol
+        
+        Returns:
+            list: Years with a partition, ascending
+        """
+        directory = self._directory(symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            int(match.group(1)) for match in
+            (re.fullmatch(r'(\d{4})\.parquet', name) for name in os.listdir(directory))
+            if match
+        )
+    
+    def write(self, frame, symbol):
+        """
+        Merge bars into the partitions of a symbol
+        
+        Args:
+            frame (DataFrame): Normalized OHLCV frame (see utils/ohlcv.py)
+            symbol (str): Stock symbol
+        """
+        if frame is None or frame.empty:
+            return
+        
+        with self._lock:
+            os.makedirs(self._directory(symbol), exist_ok=True)
+            for year, bars in frame.groupby(frame.index.year):
+                path = self._path(symbol, year)
+                if os.path.exists(path):
+                    existing = self._table_to_frame(pq.read_table(path, memory_map=True), symbol)
+                    # The new bars replace stored ones with the same timestamp
+                    bars = pd.concat([existing, bars])
+                    bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+                self._write_partition(path, bars)
+    
+    def read(self, symbol, start_date=None, end_date=None):
+        """
+        Read the bars of a symbol
+        
+        Args:
+            symbol (str): Stock symbol
+            start_date (datetime, optional): First timestamp to read
+            end_date (datetime, optional): Last timestamp to read
+        
+        Returns:
+            DataFrame: Normalized OHLCV frame
+        """
+        table = self._read_table(symbol, OHLCV_COLUMNS, start_date, end_date)
+        if table is None:
+            return empty_frame(symbol)
+        return self._table_to_frame(table, symbol)
+    
+    def read_arrays(self, symbol, columns=('close',), start_date=None, end_date=None):
+        """
+        Read columns of a symbol as NumPy arrays
+        
+        Args:
+            symbol (str): Stock symbol
+            columns (tuple): OHLCV columns to read
+            start_date (datetime, optional): First timestamp to read
+            end_date (datetime, optional): Last timestamp to read
+        
+        Returns:
+            dict: 'timestamp' (datetime64 array) and each requested column to its array
+        """
+        table = self._read_table(symbol, list(columns), start_date, end_date)
+        if table is None:
+            arrays = {'timestamp': np.array([], dtype='datetime64[us]')}
+            arrays.update({column: np.array([], dtype='float64') for column in columns})
+            return arrays
+        
+        arrays = {'timestamp': table.column('timestamp').to_numpy()}
+        for column in columns:
+            values = table.column(column)
+            arrays[column] = values.to_numpy() if values.null_count == 0 else values.to_numpy(zero_copy_only=False).astype('float64')
+        return arrays
+    
+    def _read_table(self, symbol, columns, start_date, end_date):
+        """Read the partitions a range touches as one table cut to the range"""
+        years = [
+            year for year in self.years(symbol)
+            if (start_date is None or year >= start_date.year) and (end_date is None or year <= end_date.year)
+        ]
+        if not years:
+            return None
+        
+        read_columns = ['timestamp'] + [column for column in columns if column != 'timestamp']
+        table = pa.concat_tables([
+            pq.read_table(self._path(symbol, year), columns=read_columns, memory_map=True)
+            for year in years
+        ])
+        
+        # Partitions are sorted and disjoint, so the range is one slice
+        timestamps = table.column('timestamp').to_numpy()
+        first = 0 if start_date is None else np.searchsorted(timestamps, np.datetime64(start_date, 'us'), side='left')
+        last = len(timestamps) if end_date is None else np.searchsorted(timestamps, np.datetime64(end_date, 'us'), side='right')
+        return table.slice(first, last - first)
+    
+    def _table_to_frame(self, table, symbol):
+        """Convert a partition table to a normalized OHLCV frame"""
+        frame = table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get).set_index('timestamp')
+        return normalize_frame(frame, symbol)
+    
+    def _write_partition(self, path, frame):
+        """Write the bars of one partition to a temporary file and swap it in"""
+        volume = frame['volume'].to_numpy(dtype='float64', na_value=np.nan)
+        table = pa.table({
+            'timestamp': frame.index.to_numpy(dtype='datetime64[us]'),
+            'open': frame['open'].to_numpy(dtype='float64'),
+            'high': frame['high'].to_numpy(dtype='float64'),
+            'low': frame['low'].to_numpy(dtype='float64'),
+            'close': frame['close'].to_numpy(dtype='float64'),
+            'volume': pa.array(volume, mask=np.isnan(volume)).cast(pa.int64())
+        }, schema=self._schema)
+        
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, temporary, compression=self.compression)
+            os.replace(temporary, path)
+        except Exception:
+            os.remove(temporary)
+            raise
+    
+    def _directory(self, symbol):
+        """Directory holding the partitions of a symbol, refusing symbols that would leave the root"""
+        if symbol in ('', '.') or '..' in symbol or '/' in symbol or '\\' in symbol or '\0' in symbol:
+            raise ValueError(f"Invalid symbol for the OHLCV store: {symbol!r}")
+        return os.path.join(self.root, symbol)
+    
+    def _path(self, symbol, year):
+        """Path of the partition of a symbol and year"""
+        return os.path.join(self._directory(symbol), f'{year}.parquet')
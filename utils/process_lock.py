@@ -0,0 +1,83 @@
+"""
+Locks keeping background jobs to one process of the host.
+
+A web server started with several workers imports the application once
+per worker; jobs like the ingestion scheduler take a lock file first, so
+only the worker (or separate process) that gets it runs them. The lock is
+an advisory flock(), released by the operating system when its holder
+exits, even when it is killed, so no stale lock is left behind.
+"""
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class ProcessLock:
+    """
+    Exclusive lock on a file, held by at most one process at a time
+    
+    Without fcntl (Windows) the lock is always granted, so every process
+    runs the jobs guarded by it.
+    """
+    
+    def __init__(self, path):
+        """
+        Initialize the lock, not held
+        
+        Args:
+            path (str): Lock file, created with its directory when first acquired
+        """
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """
+        Take the lock without waiting
+        
+        Returns:
+            bool: Whether this process holds the lock
+        """
+        with self._lock:
+            if self._file is not None:
+                return True
+            
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            lock_file = open(self.path, 'a+')
+            if fcntl is None:
+                logger.warning(f"File locks are not supported here, not locking {self.path}")
+            else:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    return False
+            
+            # The holder's process id, for whoever wonders which process runs the jobs
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(f"{os.getpid()}\n")
+            lock_file.flush()
+            self._file = lock_file
+            return True
+    
+    def release(self):
+        """Release the lock if this process holds it"""
+        with self._lock:
+            if self._file is None:
+                return
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+    
+    @property
+    def held(self):
+        """Whether this process holds the lock"""
+        return self._file is not None
@@ -0,0 +1,159 @@
+"""
+Sources of live quotes.
+
+A source is an iterable of Tick tuples, optionally with a close() method
+that makes a running iteration end. ReplaySource plays back a recorded
+file and SocketSource reads newline-delimited JSON ticks from a TCP
+connection, e.g. a local replayer or a feed handler.
+"""
+import csv
+import json
+import logging
+import socket
+import time
+from collections import namedtuple
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# A trade or quote update; timestamp is naive exchange wall-clock time
+Tick = namedtuple('Tick', ['symbol', 'timestamp', 'price', 'size'])
+
+def parse_tick(record):
+    """
+    Build a tick from a decoded record
+    
+    Args:
+        record (dict): symbol, timestamp (ISO 8601 string), price and optionally size
+    
+    Returns:
+        Tick: The tick
+    
+    Raises:
+        KeyError: If a required field is missing
+        ValueError: If a field can't be parsed
+    """
+    timestamp = record['timestamp']
+    if not isinstance(timestamp, datetime):
+        timestamp = datetime.fromisoformat(timestamp)
+    return Tick(
+        str(record['symbol']).upper(),
+        timestamp.replace(tzinfo=None),
+        float(record['price']),
+        float(record.get('size') or 0)
+    )
+
+class ReplaySource:
+    """
+    Ticks replayed from a file
+    
+    CSV files need a header with symbol, timestamp, price and optionally
+    size columns; any other file is read as JSON lines with the same
+    fields. Without a speed the ticks are replayed as fast as they are
+    consumed, otherwise the gaps between their timestamps are kept, divided
+    by the speed.
+    """
+    
+    def __init__(self, path, speed=None):
+        """
+        Initialize the source
+        
+        Args:
+            path (str): Recorded ticks
+            speed (float, optional): Replay speed relative to the recording
+        """
+        self.path = path
+        self.speed = speed
+        self._closed = False
+    
+    def __iter__(self):
+        self._closed = False
+        previous = None
+        with open(self.path, newline='') as f:
+            records = csv.DictReader(f) if self.path.endswith('.csv') else (line for line in f if line.strip())
+            for record in records:
+                if self._closed:
+                    return
+                try:
+                    tick = parse_tick(record if isinstance(record, dict) else json.loads(record))
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.warning(f"Skipping malformed tick in {self.path}: {str(e)}")
+                    continue
+                
+                if self.speed and previous is not None:
+                    delay = (tick.timestamp - previous).total_seconds() / self.speed
+                    if delay > 0:
+                        time.sleep(delay)
+                previous = tick.timestamp
+                yield tick
+    
+    def close(self):
+        """End a running replay before the next tick"""
+        self._closed = True
+
+class SocketSource:
+    """
+    Ticks read from a TCP connection as newline-delimited JSON
+    
+    The iteration ends when the peer closes the connection or close() is
+    called; reads time out periodically so close() takes effect while the
+    feed is idle.
+    """
+    
+    def __init__(self, host, port, timeout=1.0):
+        """
+        Initialize the source
+        
+        Args:
+            host (str): Host of the feed
+            port (int): Port of the feed
+            timeout (float): Seconds a read waits before checking whether the source was closed
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._closed = False
+    
+    def __iter__(self):
+        self._closed = False
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as connection:
+            buffer = b''
+            while not self._closed:
+                try:
+                    chunk = connection.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield parse_tick(json.loads(line))
+                    except (KeyError, TypeError, ValueError) as e:
+                        logger.warning(f"Skipping malformed tick from {self.host}:{self.port}: {str(e)}")
+    
+    def close(self):
+        """End a running iteration within the read timeout"""
+        self._closed = True
+
+def source_from_url(url, speed=None):
+    """
+    Create a source from its configuration, e.g. LIVE_QUOTES_SOURCE
+    
+    Args:
+        url (str): tcp://host:port for a SocketSource, a file path (optionally file://) for a ReplaySource
+        speed (float, optional): Replay speed of a ReplaySource
+    
+    Returns:
+        ReplaySource or SocketSource: The source
+    """
+    if url.startswith('tcp://'):
+        host, _, port = url[len('tcp://'):].rpartition(':')
+        return SocketSource(host, int(port))
+    if url.startswith('file://'):
+        url = url[len('file://'):]
+    return ReplaySource(url, speed)
@@ -0,0 +1,179 @@
+"""
+Aggregation of OHLCV bars to higher timeframes.
+
+Intraday bars are stored at the one minute base resolution and every
+other timeframe is built from them: the bars of a bucket are reduced with
+NumPy ufuncs over the sorted index (first open, highest high, lowest low,
+last close, summed volume) without grouping in Python. Buckets shorter
+than a day are aligned to the session open, so hourly bars start at 9:30
+like the exchange's.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from utils.cache import LRUCache
+from utils.ohlcv import normalize_frame
+from utils.trading_calendar import SESSION_OPEN
+
+BASE_TIMEFRAME = '1m'
+
+# Timeframe to bucket width in minutes
+TIMEFRAMES = {
+    '1m': 1,
+    '5m': 5,
+    '15m': 15,
+    '1h': 60,
+    '1d': 24 * 60
+}
+
+def _origin(width):
+    """Minute of the day buckets of a width are aligned to"""
+    return 0 if width >= TIMEFRAMES['1d'] else (SESSION_OPEN.hour * 60 + SESSION_OPEN.minute) % width
+
+def bucket_start(timestamp, timeframe):
+    """
+    Compute the start of the bucket a single timestamp falls in
+    
+    Args:
+        timestamp (datetime): Naive timestamp
+        timeframe (str): One of TIMEFRAMES
+    
+    Returns:
+        datetime: Bucket start
+    """
+    width = TIMEFRAMES[timeframe]
+    minutes = (timestamp - datetime.min) // timedelta(minutes=1)
+    origin = _origin(width)
+    return datetime.min + timedelta(minutes=(minutes - origin) // width * width + origin)
+
+def bucket_starts(index, timeframe):
+    """
+    Compute the start of the bucket every bar falls in
+    
+    Args:
+        index (DatetimeIndex): Bar timestamps
+        timeframe (str): One of TIMEFRAMES
+    
+    Returns:
+        ndarray: Bucket starts as datetime64[m]
+    """
+    width = TIMEFRAMES[timeframe]
+    minutes = index.to_numpy(dtype='datetime64[m]').astype(np.int64)
+    origin = _origin(width)
+    return ((minutes - origin) // width * width + origin).astype('datetime64[m]')
+
+def resample_ohlcv(frame, timeframe):
+    """
+    Aggregate OHLCV bars to a higher timeframe
+    
+    Args:
+        frame (DataFrame): Normalized OHLCV frame (see utils/ohlcv.py) of base bars
+        timeframe (str): One of TIMEFRAMES
+    
+    Returns:
+        DataFrame: Normalized OHLCV frame with one bar per bucket, indexed by the bucket start
+    
+    Raises:
+        ValueError: If the timeframe is unknown
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+    if frame is None or frame.empty or timeframe == BASE_TIMEFRAME:
+        return frame
+    
+    buckets = bucket_starts(frame.index, timeframe)
+    # The index is sorted, so every bucket is one run of bars
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    
+    volume = frame['volume'].to_numpy(dtype='float64', na_value=np.nan)
+    resampled = pd.DataFrame({
+        'open': frame['open'].to_numpy(dtype='float64')[starts],
+        # fmax/fmin skip missing values instead of propagating them
+        'high': np.fmax.reduceat(frame['high'].to_numpy(dtype='float64'), starts),
+        'low': np.fmin.reduceat(frame['low'].to_numpy(dtype='float64'), starts),
+        'close': frame['close'].to_numpy(dtype='float64')[ends],
+        'volume': np.add.reduceat(np.nan_to_num(volume), starts)
+    }, index=pd.DatetimeIndex(buckets[starts]))
+    return normalize_frame(resampled, frame['symbol'].iloc[0])
+
+class ResampledViews:
+    """
+    Cache of the higher timeframe views of symbols' base bars
+    
+    A view is kept with the start of the base window it was built from.
+    When that window is requested again with newer bars, only the last
+    bucket of the view, which may still have been open, and the buckets
+    after it are aggregated again; the closed buckets are reused.
+    """
+    
+    def __init__(self, max_size=256):
+        """
+        Initialize the cache
+        
+        Args:
+            max_size (int): Maximum number of views kept
+        """
+        self._views = LRUCache(max_size=max_size, ttl=None)
+        self._lock = threading.Lock()
+        self.full = 0
+        self.incremental = 0
+    
+    def get(self, symbol, base, timeframe):
+        """
+        Get the view of base bars at a timeframe
+        
+        Args:
+            symbol (str): Stock symbol
+            base (DataFrame): Normalized OHLCV frame of base bars, starting at the same time on every call
+            timeframe (str): One of TIMEFRAMES
+        
+        Returns:
+            DataFrame: Normalized OHLCV frame at the timeframe
+        """
+        if timeframe == BASE_TIMEFRAME or base is None or base.empty:
+            return resample_ohlcv(base, timeframe)
+        
+        key = (symbol, timeframe)
+        entry = self._views.get(key)
+        if entry is not None and entry['base_start'] == base.index[0] and base.index[-1] >= entry['open_bucket']:
+            tail = resample_ohlcv(base.loc[entry['open_bucket']:], timeframe)
+            view = pd.concat([entry['view'].iloc[:-1], tail])
+            with self._lock:
+                self.incremental += 1
+        else:
+            view = resample_ohlcv(base, timeframe)
+            with self._lock:
+                self.full += 1
+        
+        self._views.set(key, {'view': view, 'base_start': base.index[0], 'open_bucket': view.index[-1]})
+        return view
+    
+    def invalidate(self, symbol, since):
+        """
+        Drop the views of a symbol whose closed buckets changed
+        
+        Args:
+            symbol (str): Stock symbol
+            since (datetime): Timestamp of the first base bar that was stored or replaced
+        """
+        for timeframe in TIMEFRAMES:
+            entry = self._views.pop((symbol, timeframe))
+            # Bars in or after the last bucket are picked up by the next incremental update
+            if entry is not None and since >= entry['open_bucket']:
+                self._views.set((symbol, timeframe), entry)
+    
+    def stats(self):
+        """
+        Get the cache counters
+        
+        Returns:
+            dict: Cached views, full aggregations and incremental updates
+        """
+        with self._lock:
+            return {"size": len(self._views), "full": self.full, "incremental": self.incremental}
+
+# Views shared by all agents of the process
+resampled_views = ResampledViews(int(os.environ.get("RESAMPLE_CACHE_SIZE", 256)))
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+class CachedResponse:
+    """A stored upstream response payload with its age and HTTP validators"""
+    
+    def __init__(self, payload, stored_at, ttl, etag=None, last_modified=None):
+        self.payload = payload
+        self.stored_at = stored_at
+        self.ttl = ttl
+        self.etag = etag
+        self.last_modified = last_modified
+    
+    @property
+    def age(self):
+        """Seconds since the response was stored or last revalidated"""
+        return time.time() - self.stored_at
+    
+    @property
+    def fresh(self):
+        """Whether the response can be served without asking the upstream API"""
+        return self.ttl is None or self.age <= self.ttl
+    
+    def validators(self):
+        """
+        Get the conditional request headers revalidating this response
+        
+        Returns:
+            dict: If-None-Match and If-Modified-Since headers, where known
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class ResponseCache:
+    """
+    Persistent cache of raw upstream API responses
+    
+    Entries are keyed by endpoint and request parameters and stored as
+    zlib-compressed JSON in files named after the SHA-256 of the key, so
+    any process sharing the directory can serve them. Every endpoint has
+    its own time-to-live; expired entries are kept for revalidation and as
+    a fallback when the upstream API fails. Once the files exceed max_bytes
+    the least recently used ones are removed.
+    """
+    
+    def __init__(self, directory, max_bytes=256 * 2 ** 20, ttls=None, default_ttl=3600,
+                 ignore_params=('apikey',), level=6):
+        """
+        Initialize the cache
+        
+        Args:
+            directory (str): Directory to store the responses in, created if missing
+            max_bytes (int): Maximum total size of the stored files
+            ttls (dict, optional): Endpoint to seconds its responses stay fresh
+            default_ttl (float): Seconds responses of other endpoints stay fresh, or None to never expire
+            ignore_params (tuple): Parameters not part of the key, e.g. credentials
+            level (int): zlib compression level
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.ignore_params = set(ignore_params)
+        self.level = level
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+    
+    def key(self, endpoint, params=None):
+        """
+        Get the content address of a request
+        
+        Args:
+            endpoint (str): API endpoint or function name
+            params (dict, optional): Request parameters
+        
+        Returns:
+            str: Hex SHA-256 of the endpoint and the relevant parameters
+        """
+        params = {
+            name: str(value) for name, value in (params or {}).items()
+            if name not in self.ignore_params
+        }
+        identity = json.dumps([endpoint, params], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(identity.encode()).hexdigest()
+    
+    def get(self, endpoint, params=None):
+        """
+        Look up a stored response, fresh or expired
+        
+        Args:
+            endpoint (str): API endpoint or function name
+            params (dict, optional): Request parameters
+        
+        Returns:
+            CachedResponse: The stored response, or None if there is none
+        """
+        path = self._path(self.key(endpoint, params))
+        try:
+            with open(path, 'rb') as f:
+                entry = json.loads(zlib.decompress(f.read()))
+            # Mark the file as recently used for the eviction
+            os.utime(path)
+        except FileNotFoundError:
+            entry = None
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Discarding unreadable cached response {path}: {str(e)}")
+            self._remove(path)
+            entry = None
+        
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            response = CachedResponse(
+                entry['payload'], entry['stored_at'], self.ttls.get(endpoint, self.default_ttl),
+                entry.get('etag'), entry.get('last_modified')
+            )
+            if response.fresh:
+                self.hits += 1
+            else:
+                self.stale += 1
+            return response
+    
+    def set(self, endpoint, params, payload, etag=None, last_modified=None):
+        """
+        Store a response, evicting the least recently used ones beyond max_bytes
+        
+        Args:
+            endpoint (str): API endpoint or function name
+            params (dict): Request parameters
+            payload: JSON-serializable response body
+            etag (str, optional): ETag header of the response
+            last_modified (str, optional): Last-Modified header of the response
+        """
+        path = self._path(self.key(endpoint, params))
+        data = zlib.compress(json.dumps({
+            "endpoint": endpoint,
+            "stored_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "payload": payload
+        }, separators=(',', ':')).encode(), self.level)
+        
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            
+            # Write to a temporary file first, so readers never see partial entries
+            fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Could not cache response of {endpoint}: {str(e)}")
+            return
+        
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data) - previous
+        self._evict()
+    
+    def refresh(self, endpoint, params, response):
+        """
+        Restart the time-to-live of a response the upstream API confirmed unchanged
+        
+        Args:
+            endpoint (str): API endpoint or function name
+            params (dict): Request parameters
+            response (CachedResponse): The revalidated response
+        """
+        self.set(endpoint, params, response.payload, response.etag, response.last_modified)
+    
+    def clear(self):
+        """Remove all stored responses and reset the counters"""
+        for path, _, _ in list(self._entries()):
+            self._remove(path)
+        with self._lock:
+            self._size = 0
+            self.hits = self.stale = self.misses = 0
+    
+    def stats(self):
+        """
+        Get the cache counters
+        
+        Returns:
+            dict: Stored bytes, capacity, fresh hits, stale hits, misses and hit rate
+        """
+        size = self._current_size()
+        with self._lock:
+            lookups = self.hits + self.stale + self.misses
+            return {
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "stale": self.stale,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+    
+    def _path(self, key):
+        """Path of the file storing a key, fanned out over subdirectories"""
+        return os.path.join(self.directory, key[:2], key + '.json.z')
+    
+    def _entries(self):
+        """Yield (path, size, last use) of every stored file"""
+        if not os.path.isdir(self.directory):
+            return
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+            for entry in os.scandir(subdirectory.path):
+                if entry.name.endswith('.json.z'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime
+    
+    def _current_size(self):
+        """Total size of the stored files, scanned once and then tracked"""
+        with self._lock:
+            if self._size is not None:
+                return self._size
+        size = sum(entry_size for _, entry_size, _ in self._entries())
+        with self._lock:
+            self._size = size
+            return size
+    
+    def _evict(self):
+        """Remove the least recently used files until the cache fits max_bytes"""
+        if self._current_size() <= self.max_bytes:
+            return
+        
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for path, entry_size, _ in entries:
+            if size <= self.max_bytes:
+                break
+            self._remove(path)
+            size -= entry_size
+        
+        with self._lock:
+            self._size = size
+    
+    def _remove(self, path):
+        """Delete a stored file, ignoring files already removed"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from utils.ohlcv import OHLCV_COLUMNS, empty_frame, normalize_frame
+
+class OHLCVRingBuffer:
+    """
+    Fixed-size in-memory buffer of the latest OHLCV bars
+    
+    Bars are written into preallocated NumPy arrays at a wrapping position,
+    so appending never allocates and the oldest bar is overwritten once the
+    buffer is full.
+    """
+    
+    def __init__(self, capacity):
+        """
+        Initialize an empty buffer
+        
+        Args:
+            capacity (int): Maximum number of bars kept
+        """
+        self.capacity = capacity
+        self.timestamps = np.empty(capacity, dtype='datetime64[us]')
+        self.values = np.empty((capacity, len(OHLCV_COLUMNS)), dtype='float64')
+        self._next = 0
+        self._size = 0
+    
+    def append(self, timestamp, open_price, high, low, close, volume):
+        """
+        Add a bar, overwriting the oldest one when the buffer is full
+        
+        Args:
+            timestamp (datetime): Bar start
+            open_price (float): Open price
+            high (float): High price
+            low (float): Low price
+            close (float): Close price
+            volume (float): Volume
+        """
+        self.timestamps[self._next] = np.datetime64(timestamp, 'us')
+        self.values[self._next] = (open_price, high, low, close, volume)
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+    
+    def extend(self, frame):
+        """
+        Add the bars of a frame, keeping the last capacity of them
+        
+        Args:
+            frame (DataFrame): Normalized OHLCV frame (see utils/ohlcv.py)
+        """
+        if frame is None or frame.empty:
+            return
+        
+        frame = frame.iloc[-self.capacity:]
+        values = np.column_stack([
+            frame[column].to_numpy(dtype='float64', na_value=np.nan) for column in OHLCV_COLUMNS
+        ])
+        positions = (self._next + np.arange(len(frame))) % self.capacity
+        self.timestamps[positions] = frame.index.to_numpy(dtype='datetime64[us]')
+        self.values[positions] = values
+        self._next = (self._next + len(frame)) % self.capacity
+        self._size = min(self._size + len(frame), self.capacity)
+    
+    def to_frame(self, symbol):
+        """
+        Build a normalized OHLCV frame of the stored bars
+        
+        Args:
+            symbol (str): Stock symbol
+        
+        Returns:
+            DataFrame: Normalized OHLCV frame, oldest bar first
+        """
+        if not self._size:
+            return empty_frame(symbol)
+        
+        order = self._order()
+        frame = pd.DataFrame(self.values[order], columns=OHLCV_COLUMNS, index=pd.DatetimeIndex(self.timestamps[order]))
+        return normalize_frame(frame, symbol)
+    
+    def _order(self):
+        """Positions of the stored bars, oldest first"""
+        return (self._next - self._size + np.arange(self._size)) % self.capacity
+    
+    def __len__(self):
+        return self._size
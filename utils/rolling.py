@@ -0,0 +1,90 @@
+import numpy as np
+
+def _window_differences(cumsum, window):
+    """Turn a cumulative sum into trailing window sums"""
+    sums = cumsum.copy()
+    sums[window:] = cumsum[window:] - cumsum[:-window]
+    return sums
+
+class CumulativeMoments:
+    """
+    Cumulative sums of a series, shared by rolling windows of any length
+    
+    The cumulative count, sum and sum of squares are computed once; the mean
+    or standard deviation over any window is then a single difference of
+    two shifted arrays. Missing values (NaN) are handled like pandas with
+    min_periods=window: any window containing one yields NaN. Values are
+    shifted by their column mean before accumulating, which keeps the sums
+    small and the variance numerically stable. Windows of one repeated value
+    are exact, so e.g. the gains of a flat price stretch average to 0 rather
+    than to the rounding residue of the differences.
+    """
+    
+    def __init__(self, values):
+        """
+        Initialize the cumulative sums
+        
+        Args:
+            values (array-like): 1-D array or 2-D array with one column per series
+        """
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        counts = np.maximum(valid.sum(axis=0), 1)
+        self.offset = np.where(valid, values, 0.0).sum(axis=0) / counts
+        self._shifted = np.where(valid, values - self.offset, 0.0)
+        self._count = np.cumsum(valid, axis=0)
+        self._sum = np.cumsum(self._shifted, axis=0)
+        self._squares = None
+        self._values = values
+        # Number of values differing from their predecessor, to find the constant windows
+        changed = np.zeros(values.shape, dtype=bool)
+        changed[1:] = values[1:] != values[:-1]
+        self._changes = np.cumsum(changed, axis=0)
+    
+    def _constant(self, window):
+        """Whether every trailing window holds a single repeated value"""
+        constant = np.zeros(self._changes.shape, dtype=bool)
+        if window <= len(self._changes):
+            constant[window - 1:] = self._changes[window - 1:] == self._changes[:len(self._changes) - window + 1]
+        return constant
+    
+    def mean(self, window):
+        """
+        Mean of every trailing window along the first axis
+        
+        Args:
+            window (int): Window length
+        
+        Returns:
+            ndarray: Window means, NaN until a window is complete
+        """
+        complete = _window_differences(self._count, window) == window
+        sums = _window_differences(self._sum, window)
+        mean = np.where(self._constant(window), self._values, sums / window + self.offset)
+        return np.where(complete, mean, np.nan)
+    
+    def mean_std(self, window, ddof=1):
+        """
+        Mean and standard deviation of every trailing window along the first axis
+        
+        Args:
+            window (int): Window length
+            ddof (int): Delta degrees of freedom, 1 for the sample standard deviation
+        
+        Returns:
+            tuple: (window means, window standard deviations), NaN until a window is complete
+        """
+        if self._squares is None:
+            self._squares = np.cumsum(self._shifted * self._shifted, axis=0)
+        
+        complete = _window_differences(self._count, window) == window
+        sums = _window_differences(self._sum, window)
+        squares = _window_differences(self._squares, window)
+        
+        constant = self._constant(window)
+        mean = np.where(complete, np.where(constant, self._values, sums / window + self.offset), np.nan)
+        if window - ddof <= 0:
+            return mean, np.full_like(mean, np.nan)
+        
+        variance = np.where(constant, 0.0, np.maximum(squares - sums * sums / window, 0.0) / (window - ddof))
+        return mean, np.where(complete, np.sqrt(variance), np.nan)
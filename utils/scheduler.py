@@ -0,0 +1,237 @@
+import logging
+import threading
+import time
+from utils.http_client import TokenBucket, RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+# Job priorities, lower runs first
+PRIORITY_REQUESTED = 0  # Asked for explicitly, e.g. a symbol without warm data
+PRIORITY_OBSERVED = 1   # Recently requested symbols, 1 to 2 by age
+PRIORITY_WATCHED = 2    # Configured symbols
+
+class _JobKind:
+    """A kind of ingestion job and its schedule"""
+    
+    def __init__(self, name, handler, interval, batch_size, requests_per_minute):
+        self.name = name
+        self.handler = handler
+        self.interval = interval
+        self.batch_size = batch_size
+        self.bucket = TokenBucket(requests_per_minute / 60.0, 1) if requests_per_minute else None
+        self.runs = 0
+        self.symbols = 0
+        self.failures = 0
+        self.deferred = 0
+        self.seconds = 0.0
+
+class IngestionScheduler:
+    """
+    Background scheduler refreshing upstream data of a set of symbols
+    
+    Each registered job kind (e.g. prices, news) is run for every symbol
+    of the symbol source once per interval. The queue holds at most one
+    job per kind and symbol; the most urgent ready job runs first, together
+    with the next most urgent ready jobs of its kind up to the kind's batch
+    size, and a kind with a request quota defers its jobs instead of
+    exceeding it.
+    """
+    
+    def __init__(self, symbol_source, app=None, poll_interval=1.0, source_interval=60.0):
+        """
+        Initialize the scheduler
+        
+        Args:
+            symbol_source (callable): Returns the symbols to keep warm as a dict of symbol to priority
+            app (Flask, optional): Application whose context the jobs run in
+            poll_interval (float): Seconds between checks for due jobs
+            source_interval (float): Seconds between calls of the symbol source
+        """
+        self.symbol_source = symbol_source
+        self.app = app
+        self.poll_interval = poll_interval
+        self.source_interval = source_interval
+        self._kinds = {}
+        self._pending = {}
+        self._last_run = {}
+        self._source_checked = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def register(self, name, handler, interval, batch_size=1, requests_per_minute=None):
+        """
+        Register a kind of job
+        
+        Args:
+            name (str): Job kind, e.g. "prices"
+            handler (callable): Called with a list of symbols to refresh
+            interval (float): Seconds between refreshes of a symbol
+            batch_size (int): Maximum symbols per handler call
+            requests_per_minute (float, optional): Maximum handler calls per minute
+        """
+        self._kinds[name] = _JobKind(name, handler, interval, batch_size, requests_per_minute)
+    
+    def request(self, name, symbol, priority=PRIORITY_REQUESTED, due=None):
+        """
+        Queue a job, unless one for the same kind and symbol is queued with the same or higher priority
+        
+        Args:
+            name (str): Job kind
+            symbol (str): Stock symbol
+            priority (float): Job priority, lower runs first
+            due (float, optional): time.monotonic() value before which the job doesn't run
+        
+        Returns:
+            bool: Whether the job was queued
+        """
+        key = (name, symbol)
+        due = time.monotonic() if due is None else due
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and pending <= (priority, due):
+                return False
+            self._pending[key] = (priority, due)
+            return True
+    
+    def run_pending(self):
+        """
+        Queue the refreshes that are due and run the queued jobs that are ready
+        
+        Returns:
+            int: Number of handler calls made
+        """
+        now = time.monotonic()
+        if self._source_checked is None or now - self._source_checked >= self.source_interval:
+            self._schedule_refreshes(now)
+            self._source_checked = now
+        
+        calls = 0
+        deferred = set()
+        while True:
+            batch = self._next_batch(time.monotonic(), deferred)
+            if batch is None:
+                break
+            
+            kind, jobs = batch
+            if kind.bucket is not None:
+                try:
+                    kind.bucket.reserve(max_wait=0)
+                except RateLimitExceeded:
+                    # Over the quota: leave the kind's jobs for a later poll
+                    kind.deferred += 1
+                    deferred.add(kind.name)
+                    for symbol, priority in jobs:
+                        self.request(kind.name, symbol, priority, time.monotonic() + 1.0 / kind.bucket.rate)
+                    continue
+            
+            self._run(kind, [symbol for symbol, _ in jobs])
+            calls += 1
+        
+        return calls
+    
+    def run_forever(self):
+        """Run due jobs until stop() is called"""
+        logger.info(f"Ingestion scheduler running jobs: {', '.join(self._kinds)}")
+        while not self._stop.is_set():
+            try:
+                if self.app is not None:
+                    with self.app.app_context():
+                        self.run_pending()
+                else:
+                    self.run_pending()
+            except Exception as e:
+                logger.error(f"Error running ingestion jobs: {str(e)}")
+            self._stop.wait(self.poll_interval)
+    
+    def start(self):
+        """Run the scheduler in a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name='ingestion-scheduler', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        """
+        Stop the scheduler thread after the running job
+        
+        Args:
+            timeout (float, optional): Seconds to wait for the thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def stats(self):
+        """
+        Get the scheduler counters
+        
+        Returns:
+            dict: Queued job count and per kind handler calls, symbols, failures, quota deferrals and run time
+        """
+        with self._lock:
+            queued = len(self._pending)
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "queued": queued,
+            "jobs": {
+                name: {
+                    "runs": kind.runs,
+                    "symbols": kind.symbols,
+                    "failures": kind.failures,
+                    "deferred": kind.deferred,
+                    "seconds": round(kind.seconds, 3)
+                }
+                for name, kind in self._kinds.items()
+            }
+        }
+    
+    def _schedule_refreshes(self, now):
+        """Queue every job kind for the symbols of the source not refreshed within the kind's interval"""
+        try:
+            symbols = self.symbol_source()
+        except Exception as e:
+            logger.error(f"Error loading the symbols to ingest: {str(e)}")
+            return
+        
+        for name, kind in self._kinds.items():
+            for symbol, priority in symbols.items():
+                last_run = self._last_run.get((name, symbol))
+                due = now if last_run is None else last_run + kind.interval
+                self.request(name, symbol, priority, due)
+    
+    def _next_batch(self, now, deferred):
+        """Take the most urgent ready job with the next most urgent ready jobs of its kind"""
+        with self._lock:
+            ready = sorted(
+                (priority, due, name, symbol)
+                for (name, symbol), (priority, due) in self._pending.items()
+                if due <= now and name in self._kinds and name not in deferred
+            )
+            if not ready:
+                return None
+            
+            kind = self._kinds[ready[0][2]]
+            jobs = [(symbol, priority) for priority, _, name, symbol in ready if name == kind.name][:kind.batch_size]
+            for symbol, _ in jobs:
+                del self._pending[(kind.name, symbol)]
+            return kind, jobs
+    
+    def _run(self, kind, symbols):
+        """Call a kind's handler and record when its symbols were refreshed"""
+        start = time.perf_counter()
+        try:
+            kind.handler(symbols)
+        except Exception as e:
+            kind.failures += 1
+            logger.error(f"Error running {kind.name} ingestion for {symbols}: {str(e)}")
+        finally:
+            kind.runs += 1
+            kind.symbols += len(symbols)
+            kind.seconds += time.perf_counter() - start
+        
+        # Failed symbols wait for the next interval too, rather than retrying in a tight loop
+        finished = time.monotonic()
+        for symbol in symbols:
+            self._last_run[(kind.name, symbol)] = finished
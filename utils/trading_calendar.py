@@ -0,0 +1,203 @@
+"""
+Exchange trading calendar.
+
+Knows which days the exchange holds a regular session, so the number of
+daily bars a date range can have is known without asking a data source.
+The NYSE holidays are generated from their rules, plus the one-off
+closures, and indexed once in a NumPy business day calendar, so counting
+the sessions of any range needs no date arithmetic in Python.
+"""
+import threading
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, Holiday, GoodFriday, USPresidentsDay, USMemorialDay,
+    USLaborDay, USThanksgivingDay, nearest_workday, sunday_to_monday
+)
+from pandas.tseries.offsets import DateOffset
+from dateutil.relativedelta import MO
+
+# Regular NYSE session hours, exchange wall-clock time
+SESSION_OPEN = time(9, 30)
+SESSION_CLOSE = time(16, 0)
+EXCHANGE_TIMEZONE = 'America/New_York'
+
+# Unscheduled full-day NYSE closures
+NYSE_SPECIAL_CLOSURES = [
+    '1994-04-27',  # Nixon funeral
+    '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14',  # September 11
+    '2004-06-11',  # Reagan funeral
+    '2007-01-02',  # Ford funeral
+    '2012-10-29', '2012-10-30',  # Hurricane Sandy
+    '2018-12-05',  # G. H. W. Bush funeral
+    '2025-01-09'   # Carter funeral
+]
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """Regular NYSE holidays, with the exchange's weekend observance rules"""
+    
+    rules = [
+        # A Saturday New Year's Day is not observed on the Friday before
+        Holiday('New Years Day', month=1, day=1, observance=sunday_to_monday),
+        Holiday('Martin Luther King Jr. Day', start_date=datetime(1998, 1, 1), month=1, day=1,
+                offset=DateOffset(weekday=MO(3))),
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', start_date=datetime(2022, 1, 1), month=6, day=19, observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas Day', month=12, day=25, observance=nearest_workday)
+    ]
+
+def _to_day(value):
+    """Convert a date, datetime or string to a NumPy day"""
+    if isinstance(value, datetime):
+        value = value.date()
+    elif not isinstance(value, date):
+        value = pd.Timestamp(value).date()
+    return np.datetime64(value, 'D')
+
+class TradingCalendar:
+    """
+    Trading sessions of an exchange
+    
+    Sessions are the weekdays that are not holidays. Holidays are indexed
+    for the years first_year to last_year; outside them only weekends count
+    as closed.
+    """
+    
+    def __init__(self, holiday_calendar=None, special_closures=None, first_year=1990, last_year=None,
+                 timezone=EXCHANGE_TIMEZONE):
+        """
+        Initialize the calendar
+        
+        Args:
+            holiday_calendar (AbstractHolidayCalendar, optional): Holiday rules, defaults to the NYSE ones
+            special_closures (list, optional): Further closed days, defaults to the NYSE ones
+            first_year (int): First year to generate holidays for
+            last_year (int, optional): Last year to generate holidays for, defaults to ten years ahead
+            timezone (str): IANA time zone of the exchange's wall clock
+        """
+        self.timezone = ZoneInfo(timezone)
+        self.holiday_calendar = holiday_calendar or NYSEHolidayCalendar()
+        self.special_closures = NYSE_SPECIAL_CLOSURES if special_closures is None else special_closures
+        self.first_year = first_year
+        self.last_year = last_year or date.today().year + 10
+        self._index = None
+        self._lock = threading.Lock()
+    
+    def holidays(self):
+        """
+        List the weekday closures of the indexed years
+        
+        Returns:
+            ndarray: Closed days as datetime64[D], ascending
+        """
+        return self._calendar().holidays
+    
+    def is_session(self, day):
+        """
+        Check whether the exchange holds a session on a day
+        
+        Args:
+            day (date or datetime): Day to check
+        
+        Returns:
+            bool: Whether the day is a trading day
+        """
+        return bool(np.is_busday(_to_day(day), busdaycal=self._calendar()))
+    
+    def session_count(self, start_day, end_day):
+        """
+        Count the sessions of a date range
+        
+        Args:
+            start_day (date or datetime): First day of the range
+            end_day (date or datetime): Last day of the range (inclusive)
+        
+        Returns:
+            int: Number of trading days, 0 for an empty range
+        """
+        start, end = _to_day(start_day), _to_day(end_day) + 1
+        if end <= start:
+            return 0
+        return int(np.busday_count(start, end, busdaycal=self._calendar()))
+    
+    def sessions(self, start_day, end_day):
+        """
+        List the sessions of a date range
+        
+        Args:
+            start_day (date or datetime): First day of the range
+            end_day (date or datetime): Last day of the range (inclusive)
+        
+        Returns:
+            DatetimeIndex: Trading days, ascending
+        """
+        days = np.arange(_to_day(start_day), _to_day(end_day) + 1, dtype='datetime64[D]')
+        return pd.DatetimeIndex(days[np.is_busday(days, busdaycal=self._calendar())])
+    
+    def exchange_time(self, moment=None):
+        """
+        Convert a local time to the exchange's wall-clock time
+        
+        Args:
+            moment (datetime, optional): Naive local time of the server, defaults to now
+        
+        Returns:
+            datetime: Naive exchange wall-clock time
+        """
+        return (moment or datetime.now()).astimezone(self.timezone).replace(tzinfo=None)
+    
+    def is_session_open(self, moment):
+        """
+        Check whether a moment falls on a session day before its close
+        
+        Bars of such a session may still change, the ones of a closed session won't.
+        
+        Args:
+            moment (datetime): Naive exchange wall-clock time
+        
+        Returns:
+            bool: Whether the session of the moment's day had not closed yet
+        """
+        return self.is_session(moment) and moment.time() < SESSION_CLOSE
+    
+    def last_session(self, moment=None):
+        """
+        Find the latest session that has opened by a moment
+        
+        Args:
+            moment (datetime, optional): Naive exchange wall-clock time, defaults to now
+        
+        Returns:
+            date: Day of the session; sessions opening later have no bars yet
+        """
+        moment = moment or self.exchange_time()
+        day = np.datetime64(moment.date(), 'D')
+        if moment.time() < SESSION_OPEN:
+            day -= 1
+        return np.busday_offset(day, 0, roll='backward', busdaycal=self._calendar()).astype(object)
+    
+    def _calendar(self):
+        """Build the business day calendar of the indexed years once"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    holidays = self.holiday_calendar.holidays(
+                        start=f'{self.first_year}-01-01', end=f'{self.last_year}-12-31'
+                    )
+                    days = np.union1d(
+                        holidays.values.astype('datetime64[D]'),
+                        np.array(self.special_closures, dtype='datetime64[D]')
+                    )
+                    # Observed holidays always fall on weekdays; weekend ones close nothing extra
+                    self._index = np.busdaycalendar(weekmask='1111100', holidays=days)
+        return self._index
+
+# Calendar of the US listings the data sources serve
+exchange_calendar = TradingCalendar()